@@ -126,6 +126,9 @@ def process_automation_tasks(env):
                         # Processar feeds RSS
                         process_rss_feeds(env, settings.user_id)
                         
+                        # Extrair o texto completo das notícias novas
+                        process_news_extractions(env, settings.user_id)
+                        
                         # Gerar artigos baseados em temas
                         generate_theme_articles(env, settings.user_id, settings)
                         
@@ -145,62 +148,98 @@ def process_rss_feeds(env, user_id):
         # Buscar feeds RSS ativos do usuário
         rss_feeds = env['db'].session.query(env['models']['RSSFeed']).filter(
             env['models']['RSSFeed'].user_id == user_id,
-            env['models']['RSSFeed'].is_active == True
+            env['models']['RSSFeed'].is_active == True,
+            (env['models']['RSSFeed'].next_poll_at == None) |
+            (env['models']['RSSFeed'].next_poll_at <= datetime.utcnow())
         ).all()
         
-        import feedparser
+        from services.feed_reader import (
+            fetch_feed, apply_fetch_state, scan_new_entries, apply_watermark, stop_before_for, FEED_MODIFIED
+        )
+        from services.news_store import store_new_items
+        from services.feed_scheduling import compute_next_poll, apply_poll_schedule
+        from services.feed_health import fetch_allowed, health_after_success, health_after_failure, apply_health
+        
+        unchanged_count = 0
         
         for feed in rss_feeds:
+            if not fetch_allowed([feed]):
+                # Circuito aberto: feed com falhas seguidas, aguardar o fim da suspensão
+                continue
+            
             try:
-                # Buscar novas notícias usando feedparser
-                parsed_feed = feedparser.parse(feed.url)
-                new_items = []
+                # Buscar novas notícias com GET condicional
+                started = time.monotonic()
+                try:
+                    fetch_result = fetch_feed(
+                        feed.url, feed.etag, feed.last_modified, feed.content_hash,
+                        stop_before=stop_before_for([feed])
+                    )
+                    if fetch_result['bozo']:
+                        raise ValueError(f"Feed inválido: {fetch_result['bozo_exception']}")
+                except Exception as e:
+                    apply_health(feed, health_after_failure(feed, e))
+                    env['db'].session.commit()
+                    raise
+                apply_health(feed, health_after_success(feed, time.monotonic() - started))
                 
-                for entry in parsed_feed.entries:
-                    # Verificar se é um item novo (após last_fetch)
-                    published_date = None
-                    if hasattr(entry, 'published_parsed') and entry.published_parsed:
-                        published_date = datetime(*entry.published_parsed[:6])
-                    
-                    if not feed.last_fetch or not published_date or published_date > feed.last_fetch:
-                        new_items.append({
-                            'title': entry.get('title', ''),
-                            'description': entry.get('description', ''),
-                            'content': entry.get('content', [{}])[0].get('value', '') if entry.get('content') else '',
-                            'link': entry.get('link', ''),
-                            'guid': entry.get('id', entry.get('link', '')),
-                            'published_date': published_date
-                        })
+                if fetch_result['status'] != FEED_MODIFIED:
+                    # 304 ou conteúdo idêntico: pular o parse
+                    apply_fetch_state(feed, fetch_result)
+                    apply_poll_schedule(feed, compute_next_poll(env['db'].session, feed.id))
+                    feed.last_fetch = datetime.utcnow()
+                    env['db'].session.commit()
+                    unchanged_count += 1
+                    logger.info(f"Feed {feed.name} sem alterações ({fetch_result['status']})")
+                    continue
                 
-                for item in new_items:
-                    # Criar item de notícia no banco
-                    news_item = env['models']['NewsItem'](
-                        title=item.get('title', ''),
-                        description=item.get('description', ''),
-                        content=item.get('content', ''),
-                        link=item.get('link', ''),
-                        guid=item.get('guid', item.get('link', '')),
-                        published_date=item.get('published_date'),
-                        rss_feed_id=feed.id,
-                        user_id=user_id
-                    )
-                    env['db'].session.add(news_item)
-                    
-                # Atualizar última busca
+                # Ler apenas as entradas acima da marca d'água do feed
+                new_items, watermark = scan_new_entries(
+                    fetch_result['entries'], feed.watermark_published_at, feed.watermark_guid, feed.full_scan
+                )
+                
+                # Verificar os GUIDs em uma consulta e inserir os novos em lote
+                inserted = store_new_items(env['db'].session, new_items, feed.id, user_id)
+                
+                # Atualizar última busca, validadores HTTP, marca d'água e próxima busca
+                apply_fetch_state(feed, fetch_result)
+                apply_watermark(feed, watermark)
+                apply_poll_schedule(feed, compute_next_poll(env['db'].session, feed.id))
                 feed.last_fetch = datetime.utcnow()
                 env['db'].session.commit()
                 
-                logger.info(f"Feed {feed.name} processado: {len(new_items)} novos itens")
+                logger.info(f"Feed {feed.name} processado: {inserted} novos itens")
                 
             except Exception as e:
+                env['db'].session.rollback()
                 logger.error(f"Erro ao processar feed {feed.name}: {e}")
+        
+        if unchanged_count:
+            logger.info(f"{unchanged_count} feeds do usuário {user_id} sem alterações")
                 
     except Exception as e:
         logger.error(f"Erro no processamento de feeds RSS: {e}")
 
+def process_news_extractions(env, user_id):
+    """Extrai o texto completo das notícias pendentes de um usuário"""
+    try:
+        from services.extraction_worker import process_pending_extractions
+        
+        stats = process_pending_extractions(env['db'].session, user_id=user_id)
+        if stats['selected']:
+            logger.info(f"Extração do usuário {user_id}: {stats['done'] + stats['fallback']} notícias prontas, "
+                        f"{stats['failed']} sem conteúdo")
+            
+    except Exception as e:
+        env['db'].session.rollback()
+        logger.error(f"Erro na extração de conteúdo das notícias: {e}")
+
 def generate_theme_articles(env, user_id, settings):
     """Gera artigos baseados em temas configurados"""
     try:
+        from services.news_store import EXTRACTION_DONE
+        from services.story_clusters import one_per_story, mark_story_processed
+        
         # Buscar temas ativos do usuário
         themes = env['db'].session.query(env['models']['AutomationTheme']).filter(
             env['models']['AutomationTheme'].user_id == user_id,
@@ -212,10 +251,12 @@ def generate_theme_articles(env, user_id, settings):
             return
             
         # Verificar se há artigos não processados para gerar
-        unprocessed_news = env['db'].session.query(env['models']['NewsItem']).filter(
+        # Uma notícia por história: versões da mesma matéria em outros feeds não são reescritas
+        unprocessed_news = one_per_story(env['db'].session.query(env['models']['NewsItem']).filter(
             env['models']['NewsItem'].user_id == user_id,
-            env['models']['NewsItem'].is_processed == False
-        ).limit(5).all()  # Processar até 5 notícias por execução
+            env['models']['NewsItem'].is_processed == False,
+            env['models']['NewsItem'].extraction_status == EXTRACTION_DONE
+        ).limit(5).all())  # Processar até 5 notícias por execução
         
         ai_model = settings.user.api_keys.filter_by(type='claude').first() or settings.user.api_keys.filter_by(type='gpt').first()
         if not ai_model:
@@ -241,6 +282,7 @@ def generate_theme_articles(env, user_id, settings):
                         article.status = env['models']['ArticleStatus'].SCHEDULED
                     
                     news_item.is_processed = True
+                    mark_story_processed(env['db'].session, news_item)
                     env['db'].session.commit()
                     
                     logger.info(f"Artigo gerado a partir da notícia: {news_item.title}")
@@ -312,6 +354,13 @@ def cleanup_old_data(env):
                 ).delete()
                 env['db'].session.commit()
                 logger.info(f"Removidas {old_news} notícias antigas processadas")
+            
+            # Remover textos compartilhados sem nenhuma notícia que os referencie
+            from services.news_store import delete_orphan_contents
+            removed = delete_orphan_contents(env['db'].session, older_than=cutoff_date)
+            env['db'].session.commit()
+            if removed > 0:
+                logger.info(f"Removidos {removed} textos de notícias sem referência")
                 
         except Exception as e:
             logger.error(f"Erro na limpeza de dados: {e}")
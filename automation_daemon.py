@@ -40,6 +40,7 @@ class BlogAutoAIDaemon:
     def __init__(self):
         self.running = False
         self.threads = []
+        self.seen_filter = None
         
     def start(self):
         """Inicia o daemon de automação"""
@@ -51,6 +52,9 @@ class BlogAutoAIDaemon:
         signal.signal(signal.SIGINT, self._signal_handler)
         
         try:
+            # Carregar o filtro dos GUIDs já gravados antes da primeira busca de feeds
+            self._load_seen_filter()
+            
             # Configurar tarefas agendadas
             self._setup_scheduled_tasks()
             
@@ -77,6 +81,8 @@ class BlogAutoAIDaemon:
         for thread in self.threads:
             if thread.is_alive():
                 thread.join(timeout=5)
+        
+        self._save_seen_filter()
                 
     def _signal_handler(self, signum, frame):
         """Handler para sinais do sistema"""
@@ -85,18 +91,34 @@ class BlogAutoAIDaemon:
         
     def _setup_scheduled_tasks(self):
         """Configura tarefas agendadas"""
+        from config import Config
+        
         # Processar artigos agendados - a cada 5 minutos
         schedule.every(5).minutes.do(self._process_scheduled_articles)
         
-        # Buscar feeds RSS - a cada 30 minutos
-        schedule.every(30).minutes.do(self._fetch_rss_feeds)
+        # Buscar feeds RSS vencidos - cada feed tem seu próprio intervalo (RSSFeed.next_poll_at)
+        schedule.every(Config.FEED_POLL_MIN_MINUTES).minutes.do(self._fetch_rss_feeds)
+        
+        # Extrair o texto completo das notícias pendentes - a cada 5 minutos
+        schedule.every(5).minutes.do(self._extract_news_content)
+        
+        # Assinar os feeds com hub WebSub e renovar as assinaturas perto do fim - a cada 15 minutos
+        if Config.WEBSUB_ENABLED:
+            schedule.every(15).minutes.do(self._renew_websub_subscriptions)
         
         # Gerar novos artigos - a cada 2 horas
         schedule.every(2).hours.do(self._generate_new_articles)
         
+        # Enviar os artigos agendados em modo lote às Batch APIs e gravar os lotes concluídos
+        schedule.every(Config.GENERATION_BATCH_POLL_MINUTES).minutes.do(self._process_generation_batches)
+        
         # Limpeza de dados - diariamente às 2h
         schedule.every().day.at("02:00").do(self._cleanup_data)
         
+        # Gravar o filtro de GUIDs em disco para a próxima partida
+        if self.seen_filter is not None:
+            schedule.every(Config.SEEN_FILTER_SAVE_MINUTES).minutes.do(self._save_seen_filter)
+        
         logger.info("📋 Tarefas agendadas configuradas")
         
     def _main_loop(self):
@@ -109,6 +131,47 @@ class BlogAutoAIDaemon:
                 logger.error(f"Erro no loop principal: {e}")
                 time.sleep(60)
                 
+    def _load_seen_filter(self, rebuild=False):
+        """Carrega o filtro Bloom dos GUIDs já gravados (do arquivo ou do banco)"""
+        from config import Config
+        if not Config.SEEN_FILTER_ENABLED:
+            return
+        try:
+            from app import app, db
+            from services.seen_filter import SeenGuidFilter, load_seen_filter
+            
+            with app.app_context():
+                if rebuild:
+                    # Notícias removidas: recomeçar só com as que continuam no banco
+                    seen_filter = SeenGuidFilter()
+                    seen_filter.refresh(db.session)
+                    self.seen_filter = seen_filter
+                    logger.info(f"Filtro de GUIDs recriado com {seen_filter.count} GUIDs")
+                else:
+                    self.seen_filter = load_seen_filter(db.session)
+            self._save_seen_filter()
+        except Exception as e:
+            # Sem filtro, todos os GUIDs são verificados no banco
+            logger.error(f"Erro ao carregar o filtro de GUIDs: {e}")
+            
+    def _save_seen_filter(self):
+        """Grava o filtro de GUIDs em disco"""
+        if self.seen_filter is None:
+            return
+        try:
+            from config import Config
+            self.seen_filter.save(Config.SEEN_FILTER_PATH)
+            
+            false_positive_rate = self.seen_filter.observed_false_positive_rate()
+            if false_positive_rate is not None:
+                logger.info(
+                    f"Filtro de GUIDs: {self.seen_filter.count} GUIDs, "
+                    f"{self.seen_filter.counters['definitely_new']} consultas dispensadas, "
+                    f"falsos positivos {false_positive_rate:.2%} (meta {Config.SEEN_FILTER_FALSE_POSITIVE_RATE:.2%})"
+                )
+        except Exception as e:
+            logger.error(f"Erro ao gravar o filtro de GUIDs: {e}")
+            
     def _process_scheduled_articles(self):
         """Processa artigos agendados para publicação"""
         try:
@@ -151,100 +214,178 @@ class BlogAutoAIDaemon:
             logger.error(f"Erro no processamento de artigos agendados: {e}")
             
     def _fetch_rss_feeds(self):
-        """Busca novos itens de feeds RSS"""
+        """Busca novos itens de feeds RSS (um download por URL, repartido entre os assinantes)"""
         try:
             logger.info("📡 Buscando feeds RSS...")
             
             from app import app, db
-            from models import RSSFeed, NewsItem, AutomationTheme
-            import feedparser
+            from models import RSSFeed, AutomationTheme
+            from services.feed_reader import (
+                fetch_feed, apply_fetch_state, scan_new_entries, apply_watermark,
+                group_feeds_by_url, shared_validators, stop_before_for, FEED_MODIFIED
+            )
+            from services.news_store import store_new_items
+            from services.feed_scheduling import compute_next_poll, apply_poll_schedule
+            from services.feed_health import fetch_allowed, health_after_success, health_after_failure, apply_health
             
             with app.app_context():
-                # Buscar feeds ativos
-                feeds = db.session.query(RSSFeed).join(AutomationTheme).filter(
+                active = db.session.query(RSSFeed).join(AutomationTheme).filter(
                     RSSFeed.is_active == True,
                     AutomationTheme.is_active == True
-                ).all()
+                )
                 
-                logger.info(f"Processando {len(feeds)} feeds RSS")
+                # URLs com pelo menos uma assinatura cujo horário de busca já chegou
+                due_urls = {
+                    url for (url,) in active.with_entities(RSSFeed.url).filter(
+                        (RSSFeed.next_poll_at == None) | (RSSFeed.next_poll_at <= datetime.utcnow())
+                    ).distinct()
+                }
+                if not due_urls:
+                    logger.info("Nenhum feed RSS com busca pendente")
+                    return
                 
-                for feed in feeds:
+                # Todas as assinaturas dessas URLs aproveitam o mesmo download
+                feeds = active.filter(RSSFeed.url.in_(due_urls)).all()
+                groups = group_feeds_by_url(feeds)
+                
+                logger.info(f"Processando {len(feeds)} feeds RSS ({len(groups)} URLs distintas)")
+                unchanged_count = 0
+                
+                if self.seen_filter is not None:
+                    # Incluir no filtro os itens gravados desde a última busca (inclusive por outros processos)
+                    self.seen_filter.refresh(db.session)
+                
+                for url, subscriptions in groups.items():
+                    if not fetch_allowed(subscriptions):
+                        # Circuito aberto: feed com falhas seguidas, aguardar o fim da suspensão
+                        continue
+                    
+                    started = time.monotonic()
                     try:
-                        # Parse do feed
-                        parsed_feed = feedparser.parse(feed.url)
-                        new_items_count = 0
-                        
-                        for entry in parsed_feed.entries:
-                            try:
-                                # Verificar se já existe
-                                guid = entry.get('id', entry.get('link', ''))
-                                existing = NewsItem.query.filter_by(guid=guid).first()
-                                
-                                if not existing:
-                                    # Processar data
-                                    published_date = None
-                                    if hasattr(entry, 'published_parsed') and entry.published_parsed:
-                                        try:
-                                            published_date = datetime(*entry.published_parsed[:6])
-                                        except:
-                                            pass
-                                    
-                                    # Verificar se é recente
-                                    if not feed.last_fetch or not published_date or published_date > feed.last_fetch:
-                                        # Extrair conteúdo
-                                        content = ""
-                                        if hasattr(entry, 'content') and entry.content:
-                                            content = entry.content[0].value
-                                        elif hasattr(entry, 'summary'):
-                                            content = entry.summary
-                                        
-                                        # Criar item de notícia
-                                        news_item = NewsItem(
-                                            title=entry.get('title', 'Sem título')[:255],
-                                            description=entry.get('summary', '')[:500],
-                                            content=content,
-                                            link=entry.get('link', '')[:500],
-                                            guid=guid[:500],
-                                            published_date=published_date,
-                                            rss_feed_id=feed.id,
-                                            user_id=feed.user_id,
-                                            is_processed=False
-                                        )
-                                        
-                                        db.session.add(news_item)
-                                        new_items_count += 1
-                                        
-                            except Exception as e:
-                                logger.error(f"Erro ao processar entrada do feed: {e}")
+                        # Download condicional do feed, uma única vez por URL
+                        etag, last_modified, content_hash = shared_validators(subscriptions)
+                        fetch_result = fetch_feed(
+                            url, etag, last_modified, content_hash, stop_before=stop_before_for(subscriptions)
+                        )
+                        if fetch_result['bozo']:
+                            raise ValueError(f"Feed inválido: {fetch_result['bozo_exception']}")
+                    except Exception as e:
+                        logger.error(f"Erro ao baixar feed {url}: {e}")
+                        for feed in subscriptions:
+                            apply_health(feed, health_after_failure(feed, e))
+                        db.session.commit()
+                        continue
+                    elapsed = time.monotonic() - started
+                    
+                    # Um commit por assinatura: um erro em uma não desfaz as outras
+                    for feed in subscriptions:
+                        try:
+                            apply_health(feed, health_after_success(feed, elapsed))
+                            if fetch_result['status'] != FEED_MODIFIED:
+                                # 304 ou conteúdo idêntico: pular o parse
+                                apply_fetch_state(feed, fetch_result)
+                                apply_poll_schedule(feed, compute_next_poll(db.session, feed.id))
+                                feed.last_fetch = datetime.utcnow()
+                                db.session.commit()
+                                unchanged_count += 1
                                 continue
-                        
-                        # Atualizar última busca
-                        feed.last_fetch = datetime.utcnow()
-                        
-                        if new_items_count > 0:
-                            logger.info(f"📰 Feed '{feed.name}': {new_items_count} novos itens")
                             
-                    except Exception as e:
-                        logger.error(f"Erro ao processar feed '{feed.name}': {e}")
-                        
-                db.session.commit()
+                            # Ler apenas as entradas acima da marca d'água de cada assinatura
+                            items, watermark = scan_new_entries(
+                                fetch_result['entries'], feed.watermark_published_at,
+                                feed.watermark_guid, feed.full_scan
+                            )
+                            
+                            # Consultar só os GUIDs que o filtro talvez conheça e inserir os novos em lote
+                            new_items_count = store_new_items(
+                                db.session, items, feed.id, feed.user_id, seen_filter=self.seen_filter
+                            )
+                            
+                            # Atualizar última busca, validadores HTTP, marca d'água e próxima busca
+                            apply_fetch_state(feed, fetch_result)
+                            apply_watermark(feed, watermark)
+                            apply_poll_schedule(feed, compute_next_poll(db.session, feed.id))
+                            feed.last_fetch = datetime.utcnow()
+                            db.session.commit()
+                            
+                            if new_items_count > 0:
+                                logger.info(f"📰 Feed '{feed.name}': {new_items_count} novos itens")
+                                
+                        except Exception as e:
+                            db.session.rollback()
+                            logger.error(f"Erro ao processar feed '{feed.name}': {e}")
+                
+                if unchanged_count:
+                    logger.info(f"{unchanged_count} feeds sem alterações desde a última busca")
                 
         except Exception as e:
             logger.error(f"Erro na busca de feeds RSS: {e}")
             
+    def _extract_news_content(self):
+        """Extrai o texto completo das notícias gravadas com extração pendente"""
+        try:
+            from app import app, db
+            from services.extraction_worker import process_pending_extractions
+            
+            with app.app_context():
+                stats = process_pending_extractions(db.session)
+                
+                if stats['selected']:
+                    logger.info(
+                        f"🔎 Extração: {stats['done'] + stats['fallback']} prontas, "
+                        f"{stats['failed']} sem conteúdo, {stats['retrying'] + stats['timed_out']} pendentes"
+                    )
+                    
+        except Exception as e:
+            logger.error(f"Erro na extração de conteúdo das notícias: {e}")
+            
+    def _renew_websub_subscriptions(self):
+        """Pede ou renova as assinaturas WebSub dos feeds que anunciam um hub"""
+        try:
+            from app import app
+            from services.websub import renew_subscriptions
+            
+            with app.app_context():
+                renew_subscriptions()
+                
+        except Exception as e:
+            logger.error(f"Erro na renovação das assinaturas WebSub: {e}")
+            
+    def _process_generation_batches(self):
+        """Envia os artigos na fila de geração em lote e grava os lotes concluídos"""
+        try:
+            from app import app
+            from services.generation_batches import process_generation_batches
+            
+            with app.app_context():
+                stats = process_generation_batches()
+                
+                if stats['poll']['completed'] or stats['submit']['submitted']:
+                    logger.info(
+                        f"📦 Geração em lote: {stats['submit']['submitted']} artigos enviados, "
+                        f"{stats['poll']['succeeded']} gerados pelos lotes concluídos"
+                    )
+                    
+        except Exception as e:
+            logger.error(f"Erro na geração em lote: {e}")
+            
     def _generate_new_articles(self):
-        """Gera novos artigos automaticamente"""
+        """Gera novos artigos automaticamente (todos os usuários em um único lote)"""
         try:
             logger.info("📝 Gerando novos artigos...")
             
             from app import app, db
             from models import (AutomationSettings, NewsItem, AutomationTheme, 
-                              Article, ArticleStatus, AIModel, APIKey, APIType)
-            from services.ai_service import generate_article_from_news, generate_article_from_theme
+                              Article, ArticleStatus, AIModel, APIType)
+            from services.api_key_cache import get_generation_keys
+            from services.generation_engine import GenerationJob, generate_articles
+            from services.news_store import EXTRACTION_DONE
+            from services.story_clusters import one_per_story, mark_story_processed
             
             with app.app_context():
                 # Buscar usuários com automação ativa
                 active_settings = AutomationSettings.query.filter_by(is_active=True).all()
+                jobs = []
                 
                 for settings in active_settings:
                     try:
@@ -257,53 +398,30 @@ class BlogAutoAIDaemon:
                         if settings.next_scheduled_run and settings.next_scheduled_run > datetime.utcnow():
                             continue
                         
-                        # Buscar notícias não processadas
-                        unprocessed_news = NewsItem.query.filter_by(
-                            user_id=settings.user_id,
-                            is_processed=False
-                        ).limit(3).all()
-                        
-                        # Determinar modelo de IA
-                        api_key = APIKey.query.filter_by(
+                        # Buscar notícias não processadas (uma por história)
+                        unprocessed_news = one_per_story(NewsItem.query.filter_by(
                             user_id=settings.user_id,
-                            type=APIType.CLAUDE
-                        ).first()
+                            is_processed=False,
+                            extraction_status=EXTRACTION_DONE
+                        ).limit(3).all())
                         
-                        if not api_key:
-                            api_key = APIKey.query.filter_by(
-                                user_id=settings.user_id,
-                                type=APIType.GPT
-                            ).first()
+                        # Determinar modelo de IA (chaves em cache, ver services/api_key_cache.py)
+                        api_keys = get_generation_keys(settings.user_id)
                             
-                        if not api_key:
+                        if not api_keys:
                             logger.warning(f"Usuário {settings.user_id} sem chaves de API")
                             continue
                             
-                        ai_model = AIModel.CLAUDE if api_key.type == APIType.CLAUDE else AIModel.GPT
+                        ai_model = AIModel.CLAUDE if APIType.CLAUDE in api_keys else AIModel.GPT
                         
-                        # Gerar artigos a partir de notícias
+                        # Artigos a partir de notícias
                         for news_item in unprocessed_news:
-                            try:
-                                article = generate_article_from_news(
-                                    news_item,
-                                    ai_model,
-                                    settings.user_id,
-                                    settings.wordpress_config_id
-                                )
-                                
-                                if article:
-                                    # Agendar para publicação
-                                    article.scheduled_date = datetime.utcnow() + timedelta(
-                                        minutes=self._random_delay()
-                                    )
-                                    article.status = ArticleStatus.SCHEDULED
-                                    
-                                    news_item.is_processed = True
-                                    
-                                    logger.info(f"📰 Artigo gerado a partir de: {news_item.title[:50]}...")
-                                    
-                            except Exception as e:
-                                logger.error(f"Erro ao gerar artigo da notícia {news_item.id}: {e}")
+                            jobs.append(GenerationJob(
+                                ai_model,
+                                settings.user_id,
+                                settings.wordpress_config_id,
+                                news_item=news_item
+                            ))
                         
                         # Se poucas notícias, gerar por temas
                         if len(unprocessed_news) < 2:
@@ -313,24 +431,12 @@ class BlogAutoAIDaemon:
                             ).order_by(AutomationTheme.priority.desc()).limit(2).all()
                             
                             for theme in themes:
-                                try:
-                                    article = generate_article_from_theme(
-                                        theme,
-                                        ai_model,
-                                        settings.user_id,
-                                        settings.wordpress_config_id
-                                    )
-                                    
-                                    if article:
-                                        article.scheduled_date = datetime.utcnow() + timedelta(
-                                            minutes=self._random_delay()
-                                        )
-                                        article.status = ArticleStatus.SCHEDULED
-                                        
-                                        logger.info(f"🎯 Artigo gerado para tema: {theme.name}")
-                                        
-                                except Exception as e:
-                                    logger.error(f"Erro ao gerar artigo do tema {theme.name}: {e}")
+                                jobs.append(GenerationJob(
+                                    ai_model,
+                                    settings.user_id,
+                                    settings.wordpress_config_id,
+                                    theme=theme
+                                ))
                         
                         # Atualizar próxima execução
                         settings.next_scheduled_run = datetime.utcnow() + timedelta(
@@ -339,6 +445,30 @@ class BlogAutoAIDaemon:
                         
                     except Exception as e:
                         logger.error(f"Erro ao processar automação do usuário {settings.user_id}: {e}")
+                
+                # Chamadas aos provedores em paralelo; cada artigo é gravado assim que fica pronto
+                generate_articles(jobs)
+                
+                for job in jobs:
+                    if not job.article:
+                        if job.news_item is not None:
+                            logger.error(f"Erro ao gerar artigo da notícia {job.news_item.id}: {job.error}")
+                        else:
+                            logger.error(f"Erro ao gerar artigo do tema {job.theme.name}: {job.error}")
+                        continue
+                    
+                    # Agendar para publicação
+                    job.article.scheduled_date = datetime.utcnow() + timedelta(
+                        minutes=self._random_delay()
+                    )
+                    job.article.status = ArticleStatus.SCHEDULED
+                    
+                    if job.news_item is not None:
+                        job.news_item.is_processed = True
+                        mark_story_processed(db.session, job.news_item)
+                        logger.info(f"📰 Artigo gerado a partir de: {job.news_item.title[:50]}...")
+                    else:
+                        logger.info(f"🎯 Artigo gerado para tema: {job.theme.name}")
                         
                 db.session.commit()
                 
@@ -368,6 +498,7 @@ class BlogAutoAIDaemon:
             
             from app import app, db
             from models import Article, ArticleStatus, NewsItem
+            from services.news_store import delete_orphan_contents
             
             with app.app_context():
                 cutoff_date = datetime.utcnow() - timedelta(days=30)
@@ -399,7 +530,16 @@ class BlogAutoAIDaemon:
                     ).delete()
                     logger.info(f"Removidas {news_count} notícias antigas")
                 
+                # Remover textos compartilhados sem nenhuma notícia que os referencie
+                removed = delete_orphan_contents(db.session, older_than=cutoff_date)
+                if removed > 0:
+                    logger.info(f"Removidos {removed} textos de notícias sem referência")
+                
                 db.session.commit()
+            
+            if news_count > 0 and self.seen_filter is not None:
+                # GUIDs removidos só gerariam consultas desnecessárias: recriar o filtro
+                self._load_seen_filter(rebuild=True)
                 
         except Exception as e:
             logger.error(f"Erro na limpeza de dados: {e}")
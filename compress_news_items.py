@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+"""
+Migração única: comprime os textos de notícias já gravados
+Converte as colunas news_item.description, news_item.content e
+news_content.content (texto completo extraído) para binário (se ainda forem
+texto) e regrava as linhas existentes no formato de services/compressed_text.py,
+em lotes com um commit por lote. Pode ser interrompido e executado de novo:
+linhas já comprimidas são puladas.
+
+Uso:
+    python compress_news_items.py
+
+Variáveis de ambiente:
+    DATABASE_URL: Banco a migrar (padrão: Config.SQLALCHEMY_DATABASE_URI)
+    COMPRESS_BATCH_SIZE: Linhas por lote (padrão: 500)
+    COMPRESS_DRY_RUN: 'true' para apenas medir a economia, sem alterar nada
+"""
+
+import os
+import sys
+import time
+from sqlalchemy import create_engine, inspect, table, column, select, update, bindparam, text, Integer, String
+from config import Config
+from services.compressed_text import CompressedText, compress_text, decompress_text, is_compressed
+
+# Colunas comprimidas de cada tabela
+TABLES = {
+    'news_item': ('description', 'content'),
+    'news_content': ('content',),
+}
+
+
+def convert_columns(engine, table_name, columns, dry_run):
+    """Altera as colunas de texto para binário, preservando os bytes UTF-8 já gravados"""
+    text_columns = [
+        info['name'] for info in inspect(engine).get_columns(table_name)
+        if info['name'] in columns and isinstance(info['type'], String)
+    ]
+    if not text_columns:
+        print(f"✅ Colunas de {table_name} já são binárias")
+        return
+
+    dialect = engine.dialect.name
+    if dialect == 'mysql':
+        statements = [
+            f"ALTER TABLE {table_name} " + ", ".join(f"MODIFY {name} BLOB" for name in text_columns)
+        ]
+    elif dialect == 'postgresql':
+        statements = [
+            f"ALTER TABLE {table_name} ALTER COLUMN {name} TYPE BYTEA USING convert_to({name}, 'UTF8')"
+            for name in text_columns
+        ]
+    else:
+        # SQLite aceita bytes em colunas declaradas como texto
+        print(f"ℹ️ Banco {dialect}: colunas mantidas, apenas os valores serão comprimidos")
+        return
+
+    for statement in statements:
+        print(f"🔧 {statement}")
+        if not dry_run:
+            with engine.begin() as connection:
+                connection.execute(text(statement))
+
+
+def compress_rows(engine, table_name, columns, batch_size, dry_run):
+    """Regrava em lotes as linhas que ainda não estão comprimidas"""
+    # Colunas lidas sem conversão, para saber o que já está comprimido
+    raw_table = table(table_name, column('id', Integer), *(column(name) for name in columns))
+    # Colunas gravadas pelo mesmo tipo usado pelo modelo
+    compressed_table = table(table_name, column('id', Integer), *(column(name, CompressedText) for name in columns))
+
+    last_id = 0
+    stats = {'rows': 0, 'updated': 0, 'bytes_before': 0, 'bytes_after': 0}
+    started = time.monotonic()
+
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(
+                select(raw_table)
+                .where(raw_table.c.id > last_id)
+                .order_by(raw_table.c.id)
+                .limit(batch_size)
+            ).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            changes = []
+            for row in rows:
+                stats['rows'] += 1
+                changed = False
+                for name in columns:
+                    raw = getattr(row, name)
+                    if raw is None or is_compressed(raw):
+                        continue
+                    stored = compress_text(decompress_text(raw))
+                    stats['bytes_before'] += len(raw.encode('utf-8') if isinstance(raw, str) else raw)
+                    stats['bytes_after'] += len(stored)
+                    # Valores curtos ficam iguais; texto devolvido como str ainda precisa virar binário
+                    changed = changed or isinstance(raw, str) or stored != bytes(raw)
+                if changed:
+                    # O tipo CompressedText comprime as colunas na gravação
+                    changes.append({'row_id': row.id, **{
+                        name: decompress_text(getattr(row, name)) for name in columns
+                    }})
+
+            if changes and not dry_run:
+                connection.execute(
+                    update(compressed_table)
+                    .where(compressed_table.c.id == bindparam('row_id'))
+                    .values({name: bindparam(name) for name in columns}),
+                    changes
+                )
+            stats['updated'] += len(changes)
+
+        print(f"… {table_name}: {stats['rows']} linhas lidas, {stats['updated']} regravadas (até id {last_id})")
+
+    stats['elapsed_seconds'] = round(time.monotonic() - started, 1)
+    return stats
+
+
+def main():
+    database_url = os.environ.get('DATABASE_URL') or Config.SQLALCHEMY_DATABASE_URI
+    batch_size = int(os.environ.get('COMPRESS_BATCH_SIZE', '500'))
+    dry_run = os.environ.get('COMPRESS_DRY_RUN', 'false').lower() == 'true'
+
+    engine = create_engine(database_url)
+    print(f"✅ Conectado ao banco de dados ({engine.dialect.name}){' - simulação' if dry_run else ''}")
+
+    results = {}
+    try:
+        for table_name, columns in TABLES.items():
+            convert_columns(engine, table_name, columns, dry_run)
+            results[table_name] = compress_rows(engine, table_name, columns, batch_size, dry_run)
+    except Exception as e:
+        print(f"❌ Erro na migração: {e}")
+        return False
+
+    print()
+    for table_name, stats in results.items():
+        saved = stats['bytes_before'] - stats['bytes_after']
+        print(
+            f"✨ {table_name}: {stats['updated']} de {stats['rows']} linhas regravadas em {stats['elapsed_seconds']}s. "
+            f"Texto: {stats['bytes_before'] / 1048576:.1f} MB -> {stats['bytes_after'] / 1048576:.1f} MB "
+            f"({saved / 1048576:.1f} MB a menos)"
+        )
+    return True
+
+
+if __name__ == "__main__":
+    print("🗜️ Comprimindo os textos dos itens de notícia e o texto completo extraído\n")
+    sys.exit(0 if main() else 1)
@@ -29,6 +29,29 @@ class Config:
     DEFAULT_CLAUDE_MODEL = "claude-3-opus-20240229"  # Using Claude 3 Opus (versão disponível na API)
     DEFAULT_GPT_MODEL = "gpt-4o-mini"  # Using GPT-4o-mini as requested
     
+    # Clientes das APIs de geração reaproveitados entre chamadas (services/llm_clients.py)
+    LLM_CLIENT_REGISTRY_SIZE = int(os.environ.get('LLM_CLIENT_REGISTRY_SIZE', '64'))  # Clientes mantidos (um por provedor e chave)
+    LLM_CLIENT_MAX_CONNECTIONS = int(os.environ.get('LLM_CLIENT_MAX_CONNECTIONS', '10'))  # Conexões simultâneas por cliente
+    LLM_CLIENT_MAX_KEEPALIVE = int(os.environ.get('LLM_CLIENT_MAX_KEEPALIVE', '5'))  # Conexões ociosas mantidas abertas por cliente
+    LLM_CLIENT_KEEPALIVE_SECONDS = float(os.environ.get('LLM_CLIENT_KEEPALIVE_SECONDS', '60'))  # Tempo até fechar uma conexão ociosa
+    LLM_CLIENT_TIMEOUT_SECONDS = float(os.environ.get('LLM_CLIENT_TIMEOUT_SECONDS', '120'))  # Timeout de cada chamada
+    LLM_CLIENT_MAX_RETRIES = int(os.environ.get('LLM_CLIENT_MAX_RETRIES', '2'))  # Novas tentativas do SDK em erros temporários
+    LLM_ANTHROPIC_BASE_URL = os.environ.get('LLM_ANTHROPIC_BASE_URL') or None  # Endereço alternativo da API (ex.: llm_batch_local_server.py)
+    LLM_OPENAI_BASE_URL = os.environ.get('LLM_OPENAI_BASE_URL') or None  # Endereço alternativo da API, terminando em /v1
+    
+    # Geração de artigos em lote (services/generation_engine.py)
+    GENERATION_CONCURRENCY_CLAUDE = int(os.environ.get('GENERATION_CONCURRENCY_CLAUDE', '4'))  # Chamadas simultâneas à Anthropic
+    GENERATION_CONCURRENCY_GPT = int(os.environ.get('GENERATION_CONCURRENCY_GPT', '4'))  # Chamadas simultâneas à OpenAI
+    GENERATION_CONCURRENCY_PER_KEY = int(os.environ.get('GENERATION_CONCURRENCY_PER_KEY', '2'))  # Chamadas simultâneas com a mesma chave de API
+    
+    # Geração dos artigos agendados pelas Batch APIs dos provedores (services/generation_batches.py)
+    GENERATION_BATCH_POLL_MINUTES = int(os.environ.get('GENERATION_BATCH_POLL_MINUTES', '10'))  # Envio dos pendentes e consulta dos lotes
+    GENERATION_BATCH_MAX_REQUESTS = int(os.environ.get('GENERATION_BATCH_MAX_REQUESTS', '1000'))  # Prompts por lote
+    GENERATION_BATCH_MIN_LEAD_MINUTES = int(os.environ.get('GENERATION_BATCH_MIN_LEAD_MINUTES', '180'))  # Agendados para antes disso são gerados na hora
+    
+    # Cache em memória das chaves de API (services/api_key_cache.py)
+    API_KEY_CACHE_TTL_SECONDS = int(os.environ.get('API_KEY_CACHE_TTL_SECONDS', '300'))  # Validade de uma chave lida do banco
+    
     # Unsplash API
     UNSPLASH_API_URL = "https://api.unsplash.com"
     
@@ -38,6 +61,84 @@ class Config:
     # Scheduler check interval (in seconds)
     DEFAULT_SCHEDULER_INTERVAL = 900  # 15 minutes
     
+    # Ingestão de feeds RSS
+    RSS_FETCH_WORKERS = int(os.environ.get('RSS_FETCH_WORKERS', '8'))  # Workers de rede simultâneos
+    RSS_CYCLE_DEADLINE_SECONDS = int(os.environ.get('RSS_CYCLE_DEADLINE_SECONDS', '1500'))  # Prazo de um ciclo (25 min)
+    RSS_FEED_TIMEOUT_SECONDS = int(os.environ.get('RSS_FEED_TIMEOUT_SECONDS', '30'))  # Timeout do download de um feed
+    RSS_FORCE_FULL_SCAN = os.environ.get('RSS_FORCE_FULL_SCAN', 'false').lower() == 'true'  # Ignorar a marca d'água de todos os feeds
+    RSS_STREAM_THRESHOLD_BYTES = int(os.environ.get('RSS_STREAM_THRESHOLD_BYTES', str(1024 * 1024)))  # Acima disso o feed é lido em streaming
+    RSS_MAX_FEED_BYTES = int(os.environ.get('RSS_MAX_FEED_BYTES', str(20 * 1024 * 1024)))  # Bytes lidos no máximo de um feed (o resto é ignorado)
+    RSS_MAX_FEED_ENTRIES = int(os.environ.get('RSS_MAX_FEED_ENTRIES', '500'))  # Entradas lidas no máximo de um feed
+    
+    # Intervalo adaptativo de busca dos feeds (aprendido com as datas de publicação)
+    FEED_POLL_MIN_MINUTES = int(os.environ.get('FEED_POLL_MIN_MINUTES', '15'))  # Feed mais ativo
+    FEED_POLL_MAX_MINUTES = int(os.environ.get('FEED_POLL_MAX_MINUTES', '1440'))  # Feed parado (1 dia)
+    FEED_POLL_GAP_FACTOR = float(os.environ.get('FEED_POLL_GAP_FACTOR', '0.5'))  # Fração do espaço médio entre publicações
+    FEED_POLL_HISTORY_ITEMS = int(os.environ.get('FEED_POLL_HISTORY_ITEMS', '20'))  # Itens usados na estimativa
+    FEED_POLL_HISTORY_DAYS = int(os.environ.get('FEED_POLL_HISTORY_DAYS', '14'))  # Janela do histórico
+    
+    # Filtro Bloom dos GUIDs já gravados, mantido pelo daemon (services/seen_filter.py)
+    SEEN_FILTER_ENABLED = os.environ.get('SEEN_FILTER_ENABLED', 'true').lower() == 'true'
+    SEEN_FILTER_FALSE_POSITIVE_RATE = float(os.environ.get('SEEN_FILTER_FALSE_POSITIVE_RATE', '0.01'))  # Fração de GUIDs novos consultados à toa
+    SEEN_FILTER_INITIAL_CAPACITY = int(os.environ.get('SEEN_FILTER_INITIAL_CAPACITY', '100000'))  # GUIDs da primeira camada (cresce em dobro)
+    SEEN_FILTER_PATH = os.environ.get('SEEN_FILTER_PATH', os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'instance', 'seen_guids.bloom'))
+    SEEN_FILTER_SAVE_MINUTES = int(os.environ.get('SEEN_FILTER_SAVE_MINUTES', '30'))  # Intervalo da gravação em disco
+    
+    # Filtro das notícias pelas palavras-chave do tema (services/keyword_filter.py)
+    THEME_KEYWORD_FILTER_ENABLED = os.environ.get('THEME_KEYWORD_FILTER_ENABLED', 'true').lower() == 'true'
+    THEME_KEYWORD_MIN_SCORE = int(os.environ.get('THEME_KEYWORD_MIN_SCORE', '1'))  # Pontos mínimos (título vale 2, descrição 1)
+    
+    # Recebimento dos feeds por push (WebSub) quando o feed anuncia um hub - services/websub.py
+    WEBSUB_ENABLED = os.environ.get('WEBSUB_ENABLED', 'false').lower() == 'true'
+    WEBSUB_CALLBACK_BASE_URL = os.environ.get('WEBSUB_CALLBACK_BASE_URL', '').rstrip('/')  # Endereço público da aplicação (ex.: https://blog.exemplo.com)
+    WEBSUB_LEASE_SECONDS = int(os.environ.get('WEBSUB_LEASE_SECONDS', str(7 * 24 * 3600)))  # Duração pedida ao hub
+    WEBSUB_RENEW_BEFORE_SECONDS = int(os.environ.get('WEBSUB_RENEW_BEFORE_SECONDS', str(12 * 3600)))  # Renovar quando faltar menos que isso
+    WEBSUB_RETRY_MINUTES = int(os.environ.get('WEBSUB_RETRY_MINUTES', '60'))  # Espera antes de pedir de novo uma assinatura sem resposta
+    WEBSUB_FALLBACK_POLL_MINUTES = int(os.environ.get('WEBSUB_FALLBACK_POLL_MINUTES', '720'))  # Busca de segurança dos feeds com push ativo
+    
+    # Importação de feeds em lote por OPML (services/opml_import.py)
+    OPML_IMPORT_WORKERS = int(os.environ.get('OPML_IMPORT_WORKERS', '16'))  # Feeds validados em paralelo
+    OPML_IMPORT_FEED_TIMEOUT_SECONDS = int(os.environ.get('OPML_IMPORT_FEED_TIMEOUT_SECONDS', '15'))  # Timeout do download de cada feed
+    OPML_IMPORT_DEADLINE_SECONDS = int(os.environ.get('OPML_IMPORT_DEADLINE_SECONDS', '120'))  # Prazo total da validação
+    
+    # Circuit breaker dos feeds com falhas seguidas
+    FEED_CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('FEED_CIRCUIT_FAILURE_THRESHOLD', '3'))  # Falhas seguidas para suspender o feed
+    FEED_CIRCUIT_BASE_MINUTES = int(os.environ.get('FEED_CIRCUIT_BASE_MINUTES', '30'))  # Primeira suspensão (dobra a cada nova falha)
+    FEED_CIRCUIT_MAX_MINUTES = int(os.environ.get('FEED_CIRCUIT_MAX_MINUTES', '10080'))  # Suspensão máxima (7 dias)
+    
+    # Downloads de conteúdo da web (feeds, páginas e imagens) - services/http_client.py
+    HTTP_USER_AGENT = os.environ.get('HTTP_USER_AGENT', 'Mozilla/5.0 (compatible; BlogAutoAI/1.0)')
+    HTTP_POOL_HOSTS = int(os.environ.get('HTTP_POOL_HOSTS', '100'))  # Hosts com pool keep-alive mantido
+    HTTP_PER_HOST_CONCURRENCY = int(os.environ.get('HTTP_PER_HOST_CONCURRENCY', '2'))  # Requisições simultâneas por host
+    HTTP_HOST_MIN_INTERVAL_SECONDS = float(os.environ.get('HTTP_HOST_MIN_INTERVAL_SECONDS', '1.0'))  # Espaço entre requisições ao mesmo host
+    HTTP_MAX_RESPONSE_BYTES = int(os.environ.get('HTTP_MAX_RESPONSE_BYTES', str(10 * 1024 * 1024)))  # Tamanho máximo de uma resposta
+    HTTP_MAX_RESPONSE_SECONDS = int(os.environ.get('HTTP_MAX_RESPONSE_SECONDS', '60'))  # Tempo total máximo de uma resposta
+    
+    # Extração do texto completo das notícias (etapa separada da leitura dos feeds)
+    EXTRACTION_WORKERS = int(os.environ.get('EXTRACTION_WORKERS', '8'))  # Downloads de artigos simultâneos
+    EXTRACTION_BATCH_SIZE = int(os.environ.get('EXTRACTION_BATCH_SIZE', '100'))  # Itens pendentes por ciclo
+    EXTRACTION_TIMEOUT_SECONDS = int(os.environ.get('EXTRACTION_TIMEOUT_SECONDS', '20'))  # Timeout por artigo
+    EXTRACTION_MAX_ATTEMPTS = int(os.environ.get('EXTRACTION_MAX_ATTEMPTS', '3'))  # Tentativas antes de desistir
+    EXTRACTION_CYCLE_DEADLINE_SECONDS = int(os.environ.get('EXTRACTION_CYCLE_DEADLINE_SECONDS', '600'))  # Prazo de um ciclo
+    
+    # Pool de processos para o parse do HTML (BeautifulSoup, trafilatura, html2text)
+    EXTRACTION_PROCESS_WORKERS = int(os.environ.get('EXTRACTION_PROCESS_WORKERS', str(max(1, (os.cpu_count() or 2) - 1))))  # 0 = no próprio processo
+    EXTRACTION_TASK_TIMEOUT_SECONDS = int(os.environ.get('EXTRACTION_TASK_TIMEOUT_SECONDS', '30'))  # Tempo máximo por página
+    
+    # Cache em disco das páginas baixadas e do texto extraído (por URL canônica)
+    EXTRACTION_CACHE_ENABLED = os.environ.get('EXTRACTION_CACHE_ENABLED', 'true').lower() == 'true'
+    EXTRACTION_CACHE_DIR = os.environ.get('EXTRACTION_CACHE_DIR', os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'instance', 'extraction_cache'))
+    EXTRACTION_CACHE_TTL_HOURS = int(os.environ.get('EXTRACTION_CACHE_TTL_HOURS', '72'))  # Validade de uma entrada
+    EXTRACTION_CACHE_MAX_MB = int(os.environ.get('EXTRACTION_CACHE_MAX_MB', '500'))  # Tamanho máximo (remove as menos usadas)
+    
+    # Agrupamento de notícias quase duplicadas (mesma história em feeds diferentes)
+    STORY_SIMHASH_MAX_DISTANCE = int(os.environ.get('STORY_SIMHASH_MAX_DISTANCE', '6'))  # Bits diferentes aceitos (até 7)
+    STORY_CLUSTER_WINDOW_DAYS = int(os.environ.get('STORY_CLUSTER_WINDOW_DAYS', '3'))  # Janela de busca de candidatos
+    STORY_SHINGLE_SIZE = int(os.environ.get('STORY_SHINGLE_SIZE', '3'))  # Palavras por shingle do SimHash
+    STORY_MIN_SHINGLES = int(os.environ.get('STORY_MIN_SHINGLES', '8'))  # Textos mais curtos não são agrupados
+    
     # Application defaults
     DEFAULT_ARTICLE_META_LENGTH = 155
     DEFAULT_ARTICLE_TAGS_COUNT = 5
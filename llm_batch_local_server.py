@@ -0,0 +1,316 @@
+#!/usr/bin/env python
+"""
+Servidor local que imita as APIs de geração da Anthropic e da OpenAI para testar
+a geração em lote (services/generation_batches.py) sem chamar os provedores
+Responde às chamadas diretas (Messages e Chat Completions) e às Batch APIs: a
+Message Batches da Anthropic e o fluxo de arquivo + lote da OpenAI. Cada lote
+termina LLM_BATCH_DELAY_SECONDS depois de criado e devolve, para cada custom_id,
+um artigo no formato TITULO/META/TAGS/CONTEUDO. Para usar, a aplicação deve
+rodar com LLM_ANTHROPIC_BASE_URL=http://127.0.0.1:8095 e
+LLM_OPENAI_BASE_URL=http://127.0.0.1:8095/v1 (as chaves de API podem ser
+quaisquer).
+
+Uso:
+    python llm_batch_local_server.py
+
+Variáveis de ambiente:
+    LLM_BATCH_SERVER_PORT: Porta do servidor (padrão: 8095)
+    LLM_BATCH_DELAY_SECONDS: Tempo até cada lote terminar (padrão: 5)
+    LLM_BATCH_ERRORED_IDS: custom_ids que o lote devolve com erro, separados por vírgula
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import threading
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+DELAY_SECONDS = float(os.environ.get('LLM_BATCH_DELAY_SECONDS', '5'))
+ERRORED_IDS = {value.strip() for value in os.environ.get('LLM_BATCH_ERRORED_IDS', '').split(',') if value.strip()}
+
+# Lotes e arquivos criados: ID -> dados
+batches = {}
+files = {}
+# Prefixos estáticos (system) já vistos, para simular o cache de prompt dos provedores
+cached_prefixes = set()
+lock = threading.RLock()
+
+
+def article_text(label):
+    """Resposta no formato pedido pelos prompts de services/ai_service.py"""
+    return (
+        f"TITULO: Artigo gerado localmente ({label})\n\n"
+        f"META: Artigo de teste gerado pelo servidor local de lotes.\n\n"
+        f"TAGS: teste, lote, local\n\n"
+        f"CONTEUDO:\n<h2>Introdução</h2>\n<p>Conteúdo de teste para {label}.</p>"
+    )
+
+
+def prefix_tokens(system):
+    """Tokens do prefixo estático (aproximados) e se ele já estava em cache"""
+    if not system:
+        return 0, False
+    text = json.dumps(system, ensure_ascii=False)
+    with lock:
+        cached = text in cached_prefixes
+        cached_prefixes.add(text)
+    return len(text) // 4, cached
+
+
+def claude_message(params, label):
+    prefix, cached = prefix_tokens(params.get('system'))
+    return {
+        'id': f"msg_{uuid.uuid4().hex[:24]}",
+        'type': 'message',
+        'role': 'assistant',
+        'model': params.get('model'),
+        'content': [{'type': 'text', 'text': article_text(label)}],
+        'stop_reason': 'end_turn',
+        'stop_sequence': None,
+        'usage': {
+            'input_tokens': 100,
+            'cache_creation_input_tokens': 0 if cached else prefix,
+            'cache_read_input_tokens': prefix if cached else 0,
+            'output_tokens': 200
+        }
+    }
+
+
+def chat_completion(body, label):
+    # Cache automático da OpenAI: o prefixo só é lido do cache a partir da segunda chamada
+    system = body['messages'][0]['content'] if body.get('messages') and body['messages'][0]['role'] == 'system' else None
+    prefix, cached = prefix_tokens(system)
+    return {
+        'id': f"chatcmpl-{uuid.uuid4().hex[:24]}",
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': body.get('model'),
+        'choices': [{
+            'index': 0,
+            'finish_reason': 'stop',
+            'message': {'role': 'assistant', 'content': article_text(label)}
+        }],
+        'usage': {
+            'prompt_tokens': 100 + prefix,
+            'completion_tokens': 200,
+            'total_tokens': 300 + prefix,
+            'prompt_tokens_details': {'cached_tokens': prefix if cached else 0}
+        }
+    }
+
+
+def iso(timestamp):
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(timestamp)) if timestamp else None
+
+
+def ended(batch):
+    return time.time() - batch['created_at'] >= DELAY_SECONDS
+
+
+def claude_batch(batch, base_url):
+    done = ended(batch)
+    errored = sum(1 for request in batch['requests'] if request['custom_id'] in ERRORED_IDS)
+    return {
+        'id': batch['id'],
+        'type': 'message_batch',
+        'processing_status': 'ended' if done else 'in_progress',
+        'request_counts': {
+            'processing': 0 if done else len(batch['requests']),
+            'succeeded': len(batch['requests']) - errored if done else 0,
+            'errored': errored if done else 0,
+            'canceled': 0,
+            'expired': 0
+        },
+        'created_at': iso(batch['created_at']),
+        'expires_at': iso(batch['created_at'] + 86400),
+        'ended_at': iso(batch['created_at'] + DELAY_SECONDS) if done else None,
+        'archived_at': None,
+        'cancel_initiated_at': None,
+        'results_url': f"{base_url}/v1/messages/batches/{batch['id']}/results" if done else None
+    }
+
+
+def openai_batch(batch):
+    done = ended(batch)
+    if done and batch['output_file_id'] is None:
+        # Arquivo de saída gerado quando o lote termina, como na API real
+        lines = []
+        for request in batch['requests']:
+            if request['custom_id'] in ERRORED_IDS:
+                response = {'status_code': 500, 'request_id': uuid.uuid4().hex, 'body': {'error': {'message': 'erro simulado'}}}
+            else:
+                response = {
+                    'status_code': 200,
+                    'request_id': uuid.uuid4().hex,
+                    'body': chat_completion(request['body'], request['custom_id'])
+                }
+            lines.append(json.dumps({'id': f"batch_req_{uuid.uuid4().hex[:16]}", 'custom_id': request['custom_id'],
+                                     'response': response, 'error': None}))
+        output = new_file('\n'.join(lines).encode('utf-8'), 'batch_output.jsonl', 'batch_output')
+        batch['output_file_id'] = output['id']
+    return {
+        'id': batch['id'],
+        'object': 'batch',
+        'endpoint': batch['endpoint'],
+        'input_file_id': batch['input_file_id'],
+        'completion_window': '24h',
+        'status': 'completed' if done else 'in_progress',
+        'created_at': int(batch['created_at']),
+        'output_file_id': batch['output_file_id'],
+        'error_file_id': None,
+        'request_counts': {'total': len(batch['requests']), 'completed': len(batch['requests']) if done else 0, 'failed': 0}
+    }
+
+
+def new_file(content, filename, purpose):
+    file_id = f"file-{uuid.uuid4().hex[:24]}"
+    files[file_id] = {
+        'id': file_id,
+        'object': 'file',
+        'bytes': len(content),
+        'created_at': int(time.time()),
+        'filename': filename,
+        'purpose': purpose,
+        'status': 'processed',
+        'content': content
+    }
+    return files[file_id]
+
+
+def multipart_file(content_type, body):
+    """Arquivo enviado em multipart/form-data (campo file) e o campo purpose"""
+    message = BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode('utf-8') + body
+    )
+    content, filename, purpose = b'', 'input.jsonl', 'batch'
+    for part in message.iter_parts():
+        name = part.get_param('name', header='content-disposition')
+        if name == 'file':
+            content = part.get_payload(decode=True) or b''
+            filename = part.get_filename() or filename
+        elif name == 'purpose':
+            purpose = part.get_content().strip()
+    return content, filename, purpose
+
+
+class LLMHandler(BaseHTTPRequestHandler):
+    def send_json(self, status, data):
+        payload = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def send_text(self, content, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def not_found(self):
+        self.send_json(404, {'error': {'type': 'not_found_error', 'message': f"{self.path} não encontrado"}})
+
+    def base_url(self):
+        return f"http://{self.headers.get('Host') or '127.0.0.1'}"
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+        path = self.path.split('?')[0].rstrip('/')
+
+        if path == '/v1/messages':
+            params = json.loads(body)
+            self.send_json(200, claude_message(params, params.get('model')))
+        elif path == '/v1/chat/completions':
+            data = json.loads(body)
+            self.send_json(200, chat_completion(data, data.get('model')))
+        elif path == '/v1/messages/batches':
+            requests = json.loads(body).get('requests') or []
+            batch = {'id': f"msgbatch_{uuid.uuid4().hex[:24]}", 'created_at': time.time(), 'requests': requests}
+            with lock:
+                batches[batch['id']] = batch
+            print(f"📦 Lote Anthropic {batch['id']} criado com {len(requests)} pedidos")
+            self.send_json(200, claude_batch(batch, self.base_url()))
+        elif path == '/v1/files':
+            content, filename, purpose = multipart_file(self.headers.get('Content-Type', ''), body)
+            with lock:
+                file = new_file(content, filename, purpose)
+            self.send_json(200, {name: value for name, value in file.items() if name != 'content'})
+        elif path == '/v1/batches':
+            data = json.loads(body)
+            with lock:
+                input_file = files.get(data.get('input_file_id'))
+                if input_file is None:
+                    return self.send_json(400, {'error': {'message': 'input_file_id inválido'}})
+                requests = [json.loads(line) for line in input_file['content'].decode('utf-8').splitlines() if line.strip()]
+                batch = {
+                    'id': f"batch_{uuid.uuid4().hex[:24]}",
+                    'created_at': time.time(),
+                    'endpoint': data.get('endpoint'),
+                    'input_file_id': input_file['id'],
+                    'output_file_id': None,
+                    'requests': requests
+                }
+                batches[batch['id']] = batch
+                print(f"📦 Lote OpenAI {batch['id']} criado com {len(requests)} pedidos")
+                self.send_json(200, openai_batch(batch))
+        else:
+            self.not_found()
+
+    def do_GET(self):
+        parts = self.path.split('?')[0].strip('/').split('/')
+
+        with lock:
+            # /v1/messages/batches/{id}[/results]
+            if parts[:3] == ['v1', 'messages', 'batches'] and len(parts) in (4, 5):
+                batch = batches.get(parts[3])
+                if batch is None:
+                    return self.not_found()
+                if len(parts) == 4:
+                    return self.send_json(200, claude_batch(batch, self.base_url()))
+                if parts[4] != 'results' or not ended(batch):
+                    return self.not_found()
+                lines = []
+                for request in batch['requests']:
+                    if request['custom_id'] in ERRORED_IDS:
+                        result = {'type': 'errored', 'error': {'type': 'error', 'error': {'type': 'api_error', 'message': 'erro simulado'}}}
+                    else:
+                        result = {'type': 'succeeded', 'message': claude_message(request['params'], request['custom_id'])}
+                    lines.append(json.dumps({'custom_id': request['custom_id'], 'result': result}))
+                return self.send_text('\n'.join(lines).encode('utf-8'), 'application/binary')
+
+            # /v1/batches/{id}
+            if parts[:2] == ['v1', 'batches'] and len(parts) == 3:
+                batch = batches.get(parts[2])
+                return self.send_json(200, openai_batch(batch)) if batch else self.not_found()
+
+            # /v1/files/{id}/content
+            if parts[:2] == ['v1', 'files'] and len(parts) == 4 and parts[3] == 'content':
+                file = files.get(parts[2])
+                return self.send_text(file['content'], 'application/octet-stream') if file else self.not_found()
+
+        self.not_found()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    port = int(os.environ.get('LLM_BATCH_SERVER_PORT', '8095'))
+    server = ThreadingHTTPServer(('127.0.0.1', port), LLMHandler)
+    print(f"🧪 Servidor local de geração em http://127.0.0.1:{port}/ (lotes terminam em {DELAY_SECONDS:g}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
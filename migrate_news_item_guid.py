@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+"""
+Migração única: GUID de NewsItem único por feed em vez de único no banco todo
+Bancos criados antes do compartilhamento de feeds entre assinantes têm um índice
+único só em news_item.guid; com ele, a inserção que ignora duplicados
+(services/news_store.py) descarta a notícia para todos os assinantes depois do
+primeiro. O script remove esse índice e cria a restrição uq_news_item_feed_guid
+(rss_feed_id, guid) do modelo. Pode ser executado de novo: se a restrição já
+existe e o índice antigo não, nada é alterado.
+
+No SQLite a restrição antiga faz parte da definição da tabela, então a tabela é
+recriada (com os mesmos dados e índices) sem ela.
+
+Uso:
+    python migrate_news_item_guid.py
+
+Variáveis de ambiente:
+    DATABASE_URL: Banco a migrar (padrão: Config.SQLALCHEMY_DATABASE_URI)
+    MIGRATE_DRY_RUN: 'true' para apenas mostrar os comandos, sem alterar nada
+"""
+
+import os
+import re
+import sys
+from sqlalchemy import create_engine, inspect, text
+from config import Config
+
+CONSTRAINT_NAME = 'uq_news_item_feed_guid'
+
+
+def find_guid_unique(engine):
+    """
+    Restrições e índices únicos que cobrem apenas news_item.guid
+
+    Returns:
+        tuple: (nomes das restrições, nomes dos índices, restrição composta já existe)
+    """
+    inspector = inspect(engine)
+    constraints = inspector.get_unique_constraints('news_item')
+    indexes = inspector.get_indexes('news_item')
+
+    guid_constraints = [c['name'] for c in constraints if c['column_names'] == ['guid']]
+    guid_indexes = [
+        i['name'] for i in indexes
+        if i.get('unique') and i['column_names'] == ['guid'] and i['name'] not in guid_constraints
+    ]
+    has_composite = any(
+        sorted(c['column_names']) == ['guid', 'rss_feed_id'] for c in constraints
+    ) or any(
+        i.get('unique') and sorted(i['column_names']) == ['guid', 'rss_feed_id'] for i in indexes
+    )
+    return guid_constraints, guid_indexes, has_composite
+
+
+def migrate_server(engine, guid_constraints, guid_indexes, has_composite, dry_run):
+    """PostgreSQL e MySQL: remove o índice antigo e cria a restrição composta"""
+    dialect = engine.dialect.name
+    statements = []
+    for name in guid_constraints:
+        if dialect == 'postgresql':
+            statements.append(f'ALTER TABLE news_item DROP CONSTRAINT "{name}"')
+        else:
+            # No MySQL a restrição única é um índice
+            statements.append(f"ALTER TABLE news_item DROP INDEX `{name}`")
+    for name in guid_indexes:
+        if dialect == 'postgresql':
+            statements.append(f'DROP INDEX "{name}"')
+        else:
+            statements.append(f"ALTER TABLE news_item DROP INDEX `{name}`")
+    if not has_composite:
+        statements.append(f"ALTER TABLE news_item ADD CONSTRAINT {CONSTRAINT_NAME} UNIQUE (rss_feed_id, guid)")
+
+    # A restrição nova entra na mesma transação (PostgreSQL) para não haver janela sem nenhuma
+    with engine.begin() as connection:
+        for statement in statements:
+            print(f"🔧 {statement}")
+            if not dry_run:
+                connection.execute(text(statement))
+
+
+def migrate_sqlite(engine, has_composite, dry_run):
+    """SQLite: recria a tabela sem o UNIQUE de guid, copiando linhas e índices"""
+    with engine.connect() as connection:
+        table_sql = connection.execute(text(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'news_item'"
+        )).scalar()
+        index_sql = [row[0] for row in connection.execute(text(
+            "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = 'news_item' AND sql IS NOT NULL"
+        ))]
+
+    # UNIQUE (guid) como restrição da tabela ou "guid VARCHAR(512) NOT NULL UNIQUE" na coluna
+    new_sql = re.sub(r',\s*(CONSTRAINT\s+\S+\s+)?UNIQUE\s*\(\s*"?guid"?\s*\)', '', table_sql, flags=re.IGNORECASE)
+    new_sql = re.sub(r'(\bguid\b[^,]*?)\s+UNIQUE\b', r'\1', new_sql, flags=re.IGNORECASE)
+    if not has_composite:
+        new_sql = new_sql.rstrip().rstrip(')').rstrip() + f",\n\tCONSTRAINT {CONSTRAINT_NAME} UNIQUE (rss_feed_id, guid)\n)"
+    new_sql = re.sub(r'CREATE TABLE\s+"?news_item"?', 'CREATE TABLE news_item_migration', new_sql, count=1)
+
+    statements = [
+        new_sql,
+        "INSERT INTO news_item_migration SELECT * FROM news_item",
+        "DROP TABLE news_item",
+        "ALTER TABLE news_item_migration RENAME TO news_item",
+    ] + index_sql
+    for statement in statements:
+        print(f"🔧 {statement.splitlines()[0]}{' …' if len(statement.splitlines()) > 1 else ''}")
+    if dry_run:
+        return
+
+    with engine.connect() as connection:
+        # Sem verificação de chaves estrangeiras enquanto news_item não existe (fora da transação)
+        connection.execute(text("PRAGMA foreign_keys = OFF"))
+        connection.commit()
+        try:
+            with connection.begin():
+                for statement in statements:
+                    connection.execute(text(statement))
+        finally:
+            connection.execute(text("PRAGMA foreign_keys = ON"))
+            connection.commit()
+
+
+def main():
+    database_url = os.environ.get('DATABASE_URL') or Config.SQLALCHEMY_DATABASE_URI
+    dry_run = os.environ.get('MIGRATE_DRY_RUN', 'false').lower() == 'true'
+
+    engine = create_engine(database_url)
+    print(f"✅ Conectado ao banco de dados ({engine.dialect.name}){' - simulação' if dry_run else ''}")
+
+    try:
+        guid_constraints, guid_indexes, has_composite = find_guid_unique(engine)
+        if engine.dialect.name == 'sqlite':
+            # Índices automáticos do SQLite (sqlite_autoindex_*) vêm de restrições da tabela
+            guid_constraints += [name for name in guid_indexes if name and name.startswith('sqlite_autoindex')]
+            guid_indexes = [name for name in guid_indexes if not (name and name.startswith('sqlite_autoindex'))]
+
+        if not guid_constraints and not guid_indexes and has_composite:
+            print("✅ GUID já é único por feed, nada a alterar")
+            return True
+
+        if engine.dialect.name == 'sqlite':
+            if guid_indexes:
+                # Índice único criado à parte: basta removê-lo
+                for name in guid_indexes:
+                    print(f'🔧 DROP INDEX "{name}"')
+                    if not dry_run:
+                        with engine.begin() as connection:
+                            connection.execute(text(f'DROP INDEX "{name}"'))
+            if guid_constraints or not has_composite:
+                migrate_sqlite(engine, has_composite, dry_run)
+        elif engine.dialect.name in ('postgresql', 'mysql', 'mariadb'):
+            migrate_server(engine, guid_constraints, guid_indexes, has_composite, dry_run)
+        else:
+            print(f"❌ Banco {engine.dialect.name} sem suporte nesta migração")
+            return False
+    except Exception as e:
+        print(f"❌ Erro na migração: {e}")
+        return False
+
+    print("\n✨ news_item.guid agora é único por feed (uq_news_item_feed_guid)")
+    return True
+
+
+if __name__ == "__main__":
+    print("🔑 Migrando a restrição única de news_item.guid\n")
+    sys.exit(0 if main() else 1)
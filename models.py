@@ -2,6 +2,7 @@ import enum
 from datetime import datetime
 from app import db
 from flask_login import UserMixin
+from services.compressed_text import CompressedText
 
 
 class User(UserMixin, db.Model):
@@ -132,6 +133,15 @@ class Article(db.Model):
     theme_id = db.Column(db.Integer, db.ForeignKey('automation_theme.id'), nullable=True)
     news_item_id = db.Column(db.Integer, db.ForeignKey('news_item.id'), nullable=True)
     
+    # Geração em lote pelas Batch APIs dos provedores (services/generation_batches.py)
+    generation_status = db.Column(db.String(16), index=True)  # queued, submitted ou failed (nulo: sem geração pendente)
+    generation_batch_id = db.Column(db.Integer, db.ForeignKey('generation_batch.id'), index=True)
+    
+    # Uso da geração: tokens de entrada do prompt, quantos vieram do cache de prompt do provedor e duração da chamada
+    prompt_tokens = db.Column(db.Integer)
+    cached_prompt_tokens = db.Column(db.Integer)
+    generation_seconds = db.Column(db.Float)  # Nulo na geração pelas Batch APIs
+    
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -183,6 +193,31 @@ class SchedulerLog(db.Model):
         return f'<SchedulerLog {self.log_type.value}: {self.message[:30]}>'
 
 
+# Lote de prompts enviado à Batch API de um provedor; os resultados voltam para os Article do lote
+class GenerationBatch(db.Model):
+    __tablename__ = 'generation_batch'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    provider = db.Column(db.String(16), nullable=False)  # APIType.value (claude ou gpt)
+    provider_batch_id = db.Column(db.String(128), index=True)  # ID do lote no provedor
+    input_file_id = db.Column(db.String(128))  # Arquivo JSONL enviado (OpenAI)
+    status = db.Column(db.String(16), default="submitted", index=True)  # submitted, ended ou failed
+    request_count = db.Column(db.Integer, default=0)
+    succeeded_count = db.Column(db.Integer, default=0)
+    failed_count = db.Column(db.Integer, default=0)  # Sem resultado no lote (gerados depois por chamada direta)
+    error = db.Column(db.String(512))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_polled_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime)
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    
+    articles = db.relationship('Article', backref='generation_batch', lazy=True)
+    
+    def __repr__(self):
+        return f'<GenerationBatch {self.provider} {self.provider_batch_id}>'
+
+
 # Classes de automação diretamente neste arquivo para evitar dependências circulares
 
 class ContentSourceType(enum.Enum):
@@ -213,6 +248,36 @@ class RSSFeed(db.Model):
     url = db.Column(db.String(512), nullable=False)
     last_fetch = db.Column(db.DateTime)
     is_active = db.Column(db.Boolean, default=True)
+    
+    # Validadores HTTP para GET condicional
+    etag = db.Column(db.String(256))
+    last_modified = db.Column(db.String(64))  # Valor bruto do cabeçalho Last-Modified
+    content_hash = db.Column(db.String(64))  # SHA-256 do último corpo processado (fallback)
+    
+    # Marca d'água: entrada mais nova já salva, para parar a leitura do feed nela
+    watermark_published_at = db.Column(db.DateTime)
+    watermark_guid = db.Column(db.String(512))
+    full_scan = db.Column(db.Boolean, default=False)  # Feed fora de ordem cronológica: ler todas as entradas
+    
+    # Agendamento adaptativo (services/feed_scheduling.py)
+    next_poll_at = db.Column(db.DateTime, index=True)
+    poll_interval_minutes = db.Column(db.Integer)
+    
+    # Saúde do feed e circuit breaker (services/feed_health.py)
+    consecutive_failures = db.Column(db.Integer, default=0)
+    last_error = db.Column(db.String(512))
+    last_success_at = db.Column(db.DateTime)
+    avg_latency_ms = db.Column(db.Integer)  # Média móvel do tempo de download
+    circuit_open_until = db.Column(db.DateTime)  # Buscas suspensas até este horário
+    
+    # Assinatura WebSub do feed (services/websub.py)
+    websub_hub = db.Column(db.String(512))  # Hub anunciado pelo feed
+    websub_topic = db.Column(db.String(512))  # URL do tópico (rel="self") assinada no hub
+    websub_secret = db.Column(db.String(64))  # Chave das assinaturas HMAC das notificações
+    websub_state = db.Column(db.String(16))  # pending, active ou denied
+    websub_requested_at = db.Column(db.DateTime)  # Último pedido de assinatura
+    websub_lease_expires_at = db.Column(db.DateTime)  # Fim da assinatura confirmada pelo hub
+    websub_last_push_at = db.Column(db.DateTime)  # Última notificação recebida
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -223,24 +288,81 @@ class RSSFeed(db.Model):
         return f'<RSSFeed {self.name}>'
 
 
+# Texto completo de um link, extraído uma vez e compartilhado por todos os NewsItem que apontam para ele
+class NewsContent(db.Model):
+    __tablename__ = 'news_content'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    link = db.Column(db.String(512), nullable=False, unique=True)
+    content = db.Column(CompressedText)  # Texto extraído, comprimido (services/compressed_text.py)
+    
+    # Extração do texto completo (feita depois da gravação, por services/extraction_worker.py)
+    extraction_status = db.Column(db.String(20), default="pending", index=True)  # pending, done, failed
+    extraction_attempts = db.Column(db.Integer, default=0)
+    extraction_error = db.Column(db.String(512))
+    extracted_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    news_items = db.relationship('NewsItem', backref='news_content', lazy=True)
+    
+    def __repr__(self):
+        return f'<NewsContent {self.link}>'
+
+
 class NewsItem(db.Model):
+    # O mesmo GUID pode aparecer em feeds (assinaturas) de usuários diferentes
+    __table_args__ = (db.UniqueConstraint('rss_feed_id', 'guid', name='uq_news_item_feed_guid'),)
+    
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(256), nullable=False)
-    description = db.Column(db.Text)
-    content = db.Column(db.Text)
+    description = db.Column(CompressedText)  # Texto comprimido (services/compressed_text.py)
+    content = db.Column(CompressedText)  # Conteúdo vindo do próprio feed, comprimido
     link = db.Column(db.String(512), nullable=False)
-    guid = db.Column(db.String(512), nullable=False, unique=True)
+    guid = db.Column(db.String(512), nullable=False)
     published_date = db.Column(db.DateTime)
     is_processed = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Espelho de NewsContent.extraction_status, para filtrar a geração sem join
+    extraction_status = db.Column(db.String(20), default="pending", index=True)  # pending, done, failed, skipped
+    news_content_id = db.Column(db.Integer, db.ForeignKey('news_content.id'), index=True)
+    
+    # Notícias quase iguais de feeds diferentes (services/story_clusters.py)
+    story_cluster_id = db.Column(db.Integer, index=True)  # ID da primeira notícia da mesma história (nulo na primeira)
+    
+    # Pontuação nas palavras-chave do tema (services/keyword_filter.py); nula se o tema não tem palavras-chave
+    keyword_score = db.Column(db.Integer)
+    
     rss_feed_id = db.Column(db.Integer, db.ForeignKey('rss_feed.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     
+    @property
+    def full_content(self):
+        """Texto completo compartilhado do link ou, na falta dele, o conteúdo do feed"""
+        if self.news_content and self.news_content.content:
+            return self.news_content.content
+        return self.content
+    
     def __repr__(self):
         return f'<NewsItem {self.title}>'
 
 
+# Índice de similaridade das notícias recentes: uma linha por faixa do SimHash de cada NewsItem
+class StoryFingerprint(db.Model):
+    __tablename__ = 'story_fingerprint'
+    __table_args__ = (db.Index('ix_story_fingerprint_user_band', 'user_id', 'band'),)
+    
+    id = db.Column(db.Integer, primary_key=True)
+    band = db.Column(db.Integer, nullable=False)  # Posição da faixa e valor dos seus bits
+    simhash = db.Column(db.BigInteger, nullable=False)
+    news_item_id = db.Column(db.Integer, nullable=False, index=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f'<StoryFingerprint {self.news_item_id}:{self.band}>'
+
+
 class AutomationSettings(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     post_interval_hours = db.Column(db.Integer, default=6)  # Intervalo em horas entre postagens
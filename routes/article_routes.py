@@ -6,10 +6,12 @@ from flask_login import login_required, current_user
 from app import db
 from models import (
     Article, ArticleStatus, AIModel, RepeatSchedule, 
-    WordPressConfig, APIKey, APIType, ArticleLog, LogType
+    WordPressConfig, APIType, ArticleLog, LogType
 )
 from services.ai_service import generate_article_from_news, generate_article_from_theme
 from services.wordpress_service import WordPressService
+from services.url_canonical import canonical_url
+from services.api_key_cache import get_generation_keys
 
 logger = logging.getLogger(__name__)
 
@@ -27,19 +29,8 @@ def create():
         flash('You need to set up a WordPress site before creating articles.', 'warning')
         return redirect(url_for('settings.wordpress_config'))
     
-    # Get API keys
-    gpt_key = APIKey.query.filter_by(
-        user_id=current_user.id, 
-        type=APIType.GPT
-    ).first()
-    
-    claude_key = APIKey.query.filter_by(
-        user_id=current_user.id, 
-        type=APIType.CLAUDE
-    ).first()
-    
-    # Check if user has API keys
-    if not gpt_key and not claude_key:
+    # Check if user has API keys (cached, see services/api_key_cache.py)
+    if not get_generation_keys(current_user.id):
         flash('You need to set up at least one AI API key before creating articles.', 'warning')
         return redirect(url_for('settings.api_keys'))
     
@@ -114,24 +105,8 @@ def generate_content():
     # Convert model type string to enum
     model_type = AIModel.CLAUDE if model_type_str.lower() == 'claude' else AIModel.GPT
     
-    # Get API keys
-    api_keys = {}
-    
-    gpt_key = APIKey.query.filter_by(
-        user_id=current_user.id, 
-        type=APIType.GPT
-    ).first()
-    
-    claude_key = APIKey.query.filter_by(
-        user_id=current_user.id, 
-        type=APIType.CLAUDE
-    ).first()
-    
-    if gpt_key:
-        api_keys[AIModel.GPT.value] = gpt_key.key
-    
-    if claude_key:
-        api_keys[AIModel.CLAUDE.value] = claude_key.key
+    # Get API keys (cached, see services/api_key_cache.py)
+    api_keys = {api_type.value: key for api_type, key in get_generation_keys(current_user.id).items()}
     
     # Check if we have the right API key
     if model_type.value not in api_keys:
@@ -193,7 +168,7 @@ def save_article():
     categories = data.get('categories', '').strip()
     featured_image_url = data.get('featured_image_url', '').strip()
     keyword = data.get('keyword', '').strip()
-    source_url = data.get('source_url', '').strip()
+    source_url = canonical_url(data.get('source_url', ''))
     ai_model_str = data.get('ai_model', 'claude')
     wordpress_config_id = data.get('wordpress_config_id')
     
@@ -461,10 +436,8 @@ def export_article(article_id, format_type):
     try:
         if format_type == 'markdown':
             # Convert HTML to Markdown
-            import html2text
-            h = html2text.HTML2Text()
-            h.ignore_links = False
-            markdown_content = h.handle(article.content)
+            from services.html_converter import html_to_markdown
+            markdown_content = html_to_markdown(article.content)
             
             # Create full markdown document
             full_content = f"# {article.title}\n\n"
@@ -6,12 +6,22 @@ from datetime import datetime, timedelta
 from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app
 from flask_login import login_required, current_user
 from app import db
+from config import Config
 from models import (
     AutomationTheme, RSSFeed, NewsItem, AutomationSettings,
     Article, ArticleStatus, AIModel, RepeatSchedule, LogType, 
-    ArticleLog, WordPressConfig, APIKey, APIType, SchedulerLog
+    ArticleLog, WordPressConfig, APIType, SchedulerLog
 )
 from services.automation_monitor import AutomationMonitor
+from services.extraction_worker import process_pending_extractions, extract_news_item
+from services.news_store import EXTRACTION_PENDING, EXTRACTION_DONE, EXTRACTION_SKIPPED
+from services.keyword_filter import invalidate_theme
+from services.story_clusters import one_per_story, mark_story_processed
+from services.url_canonical import canonical_url
+from services.opml_import import import_opml
+from services.api_key_cache import get_generation_keys
+from services.generation_batches import GENERATION_QUEUED
+from services import websub
 
 logger = logging.getLogger(__name__)
 
@@ -135,6 +145,7 @@ def update_theme(theme_id):
         theme.updated_at = datetime.utcnow()
         
         db.session.commit()
+        invalidate_theme(theme.id)
         
         return jsonify({'success': True, 'message': 'Tema atualizado com sucesso'})
     except Exception as e:
@@ -154,6 +165,7 @@ def delete_theme(theme_id):
     try:
         db.session.delete(theme)
         db.session.commit()
+        invalidate_theme(theme_id)
         
         return jsonify({'success': True, 'message': 'Tema excluído com sucesso'})
     except Exception as e:
@@ -214,6 +226,7 @@ def import_themes():
                 existing_theme.keywords = keywords
                 existing_theme.priority = priority
                 existing_theme.updated_at = datetime.utcnow()
+                invalidate_theme(existing_theme.id)
                 themes_added += 1
             else:
                 # Criar novo tema
@@ -267,6 +280,7 @@ def create_feed():
             name=data['name'],
             url=data['url'],
             is_active=data.get('is_active', True),
+            full_scan=data.get('full_scan', False),
             theme_id=data['theme_id'],
             user_id=current_user.id
         )
@@ -280,6 +294,38 @@ def create_feed():
         logger.error(f"Erro ao criar feed: {str(e)}")
         return jsonify({'success': False, 'message': f'Erro ao criar feed: {str(e)}'}), 500
 
+@automation_bp.route('/feeds/import', methods=['POST'])
+@login_required
+def import_feeds():
+    """Importar feeds de um arquivo OPML, validando todos antes de gravar"""
+    if 'opmlFile' not in request.files:
+        return jsonify({'success': False, 'message': 'Nenhum arquivo enviado'}), 400
+    
+    file = request.files['opmlFile']
+    
+    if file.filename == '':
+        return jsonify({'success': False, 'message': 'Nenhum arquivo selecionado'}), 400
+    
+    if not file.filename.lower().endswith(('.opml', '.xml')):
+        return jsonify({'success': False, 'message': 'O arquivo deve ser um OPML'}), 400
+    
+    try:
+        report = import_opml(file.stream.read(), current_user.id, request.form.get('theme_id', type=int))
+    except ValueError as e:
+        # OPML ilegível ou tema padrão inexistente
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Erro ao importar feeds: {str(e)}")
+        return jsonify({'success': False, 'message': f'Erro ao importar feeds: {str(e)}'}), 500
+    
+    message = f"{report['added']} de {report['total']} feeds importados com sucesso."
+    if report['invalid'] or report['timed_out']:
+        message += f" {report['invalid'] + report['timed_out']} feeds inválidos ou sem resposta."
+    if report['duplicate']:
+        message += f" {report['duplicate']} já cadastrados."
+    
+    return jsonify({'success': True, 'message': message, 'report': report})
+
 @automation_bp.route('/feeds/<int:feed_id>', methods=['GET'])
 @login_required
 def get_feed(feed_id):
@@ -297,6 +343,7 @@ def get_feed(feed_id):
             'url': feed.url,
             'theme_id': feed.theme_id,
             'is_active': feed.is_active,
+            'full_scan': feed.full_scan,
             'last_fetch': feed.last_fetch.isoformat() if feed.last_fetch else None
         }
     })
@@ -325,6 +372,7 @@ def update_feed(feed_id):
         feed.name = data.get('name', feed.name)
         feed.url = data.get('url', feed.url)
         feed.is_active = data.get('is_active', feed.is_active)
+        feed.full_scan = data.get('full_scan', feed.full_scan)
         if data.get('theme_id'):
             feed.theme_id = data['theme_id']
         feed.updated_at = datetime.utcnow()
@@ -494,15 +542,23 @@ def process_news_item(news_item_id):
     if news_item.is_processed:
         return jsonify({'success': False, 'message': 'Este item já foi processado'}), 400
     
+    # Extrair o texto completo agora se o worker de extração ainda não passou pelo item
+    # (ou se o item ficou fora das palavras-chave do tema)
+    if news_item.extraction_status in (EXTRACTION_PENDING, EXTRACTION_SKIPPED):
+        extract_news_item(db.session, news_item.id)
+        db.session.refresh(news_item)
+    
+    if news_item.extraction_status != EXTRACTION_DONE:
+        return jsonify({'success': False, 'message': 'Não foi possível extrair o conteúdo desta notícia'}), 400
+    
     # Verificar se existe um modelo de IA configurado
-    api_key_claude = APIKey.query.filter_by(user_id=current_user.id, type=APIType.CLAUDE).first()
-    api_key_gpt = APIKey.query.filter_by(user_id=current_user.id, type=APIType.GPT).first()
+    api_keys = get_generation_keys(current_user.id)
     
-    if not api_key_claude and not api_key_gpt:
+    if not api_keys:
         return jsonify({'success': False, 'message': 'Configure pelo menos uma chave de API para IA'}), 400
     
     # Por padrão, preferir Claude se disponível
-    ai_model = AIModel.CLAUDE if api_key_claude else AIModel.GPT
+    ai_model = AIModel.CLAUDE if APIType.CLAUDE in api_keys else AIModel.GPT
     
     # Verificar configurações de WordPress
     wp_config = WordPressConfig.query.filter_by(user_id=current_user.id, is_default=True).first()
@@ -551,6 +607,74 @@ def process_news_item(news_item_id):
         logger.error(f"Erro ao processar notícia: {str(e)}")
         return jsonify({'success': False, 'message': f'Erro ao processar notícia: {str(e)}'}), 500
 
+@automation_bp.route('/news/process', methods=['POST'])
+@login_required
+def process_news_items():
+    """Processar várias notícias de uma vez, com a geração em paralelo"""
+    data = request.json
+    
+    if not data or not data.get('news_ids'):
+        return jsonify({'success': False, 'message': 'Nenhuma notícia selecionada'}), 400
+    
+    news_items = NewsItem.query.join(RSSFeed).filter(
+        NewsItem.id.in_([int(news_id) for news_id in data['news_ids']]),
+        RSSFeed.user_id == current_user.id,
+        NewsItem.is_processed == False
+    ).all()
+    
+    if not news_items:
+        return jsonify({'success': False, 'message': 'Nenhuma notícia pendente encontrada'}), 404
+    
+    # Extrair o texto completo das notícias em que o worker de extração ainda não passou
+    for news_item in news_items:
+        if news_item.extraction_status in (EXTRACTION_PENDING, EXTRACTION_SKIPPED):
+            extract_news_item(db.session, news_item.id)
+            db.session.refresh(news_item)
+    
+    ready = [news_item for news_item in news_items if news_item.extraction_status == EXTRACTION_DONE]
+    if not ready:
+        return jsonify({'success': False, 'message': 'Não foi possível extrair o conteúdo das notícias'}), 400
+    
+    api_keys = get_generation_keys(current_user.id)
+    
+    if not api_keys:
+        return jsonify({'success': False, 'message': 'Configure pelo menos uma chave de API para IA'}), 400
+    
+    # Por padrão, preferir Claude se disponível
+    ai_model = AIModel.CLAUDE if APIType.CLAUDE in api_keys else AIModel.GPT
+    
+    wp_config = WordPressConfig.query.filter_by(user_id=current_user.id, is_default=True).first()
+    if not wp_config:
+        wp_config = WordPressConfig.query.filter_by(user_id=current_user.id).first()
+    
+    if not wp_config:
+        return jsonify({'success': False, 'message': 'Configure uma conta WordPress primeiro'}), 400
+    
+    try:
+        from services.news_processor import process_news_items as process_news_function
+        
+        results = process_news_function(ready, ai_model, current_user.id, wp_config.id)
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Erro ao processar notícias: {str(e)}")
+        return jsonify({'success': False, 'message': f'Erro ao processar notícias: {str(e)}'}), 500
+    
+    generated = sum(1 for _, _, success, _ in results if success)
+    message = f"{generated} de {len(results)} artigos gerados com sucesso."
+    if len(ready) < len(news_items):
+        message += f" {len(news_items) - len(ready)} notícias sem conteúdo extraído."
+    
+    return jsonify({
+        'success': True,
+        'message': message,
+        'results': [{
+            'news_item_id': news_item.id,
+            'article_id': article.id if article else None,
+            'success': success,
+            'message': item_message
+        } for news_item, article, success, item_message in results]
+    })
+
 @automation_bp.route('/monitoring', methods=['GET'])
 @login_required
 def monitoring():
@@ -558,10 +682,14 @@ def monitoring():
     # Obter status de automação e saúde do sistema
     automation_status = AutomationMonitor.get_automation_status(current_user.id)
     system_health = AutomationMonitor.check_health()
+    cache_stats = AutomationMonitor.get_cache_stats()
+    feed_health = AutomationMonitor.get_feed_health(current_user.id)
     
     return render_template('automation/monitoring.html',
                           automation_status=automation_status,
-                          system_health=system_health)
+                          system_health=system_health,
+                          cache_stats=cache_stats,
+                          feed_health=feed_health)
 
 @automation_bp.route('/repair_scheduled_articles', methods=['GET'])
 @login_required
@@ -803,6 +931,12 @@ def schedule_automation():
         # Configurar publicação imediata ou não
         publish_immediately = 'publish_immediately' in data
         
+        # Geração em lote: o conteúdo é gerado pelas Batch APIs dos provedores antes da data
+        # agendada (services/generation_batches.py); até lá o artigo fica como rascunho
+        batch_generation = data.get('generation_mode') == 'batch'
+        article_status = ArticleStatus.DRAFT if batch_generation else ArticleStatus.SCHEDULED
+        generation_status = GENERATION_QUEUED if batch_generation else None
+        
         # Criar artigos programados
         ai_model_enum = AIModel.CLAUDE if ai_model == 'claude' else AIModel.GPT
         
@@ -821,7 +955,8 @@ def schedule_automation():
                 article = Article(
                     title=f"Artigo programado: {selected_theme.name}",
                     content="Este conteúdo será gerado automaticamente.",
-                    status=ArticleStatus.SCHEDULED,
+                    status=article_status,
+                    generation_status=generation_status,
                     scheduled_date=current_datetime,
                     ai_model=ai_model_enum,
                     is_automated=True,
@@ -846,11 +981,12 @@ def schedule_automation():
                 flash('Nenhum feed RSS encontrado. Por favor, adicione pelo menos um feed.', 'warning')
                 return redirect(url_for('automation.index'))
             
-            # Buscar notícias não processadas    
-            news_items = NewsItem.query.join(RSSFeed).filter(
+            # Buscar notícias não processadas com o conteúdo já extraído (uma por história)
+            news_items = one_per_story(NewsItem.query.join(RSSFeed).filter(
                 RSSFeed.user_id == current_user.id,
-                NewsItem.is_processed == False
-            ).order_by(NewsItem.published_date.desc()).limit(num_articles).all()
+                NewsItem.is_processed == False,
+                NewsItem.extraction_status == EXTRACTION_DONE
+            ).order_by(NewsItem.published_date.desc()).limit(num_articles).all())
             
             if not news_items:
                 # Buscar feeds automaticamente para obter novos itens
@@ -862,23 +998,28 @@ def schedule_automation():
                         flash(f"Erro ao processar feed {feed.name}: {str(e)}", "danger")
                         logger.error(f"Erro ao processar feed {feed.name}: {str(e)}")
                 
+                # Extrair o conteúdo dos itens pendentes do usuário
+                process_pending_extractions(db.session, user_id=current_user.id)
+                
                 # Buscar novamente as notícias
-                news_items = NewsItem.query.join(RSSFeed).filter(
+                news_items = one_per_story(NewsItem.query.join(RSSFeed).filter(
                     RSSFeed.user_id == current_user.id,
-                    NewsItem.is_processed == False
-                ).order_by(NewsItem.published_date.desc()).limit(num_articles).all()
+                    NewsItem.is_processed == False,
+                    NewsItem.extraction_status == EXTRACTION_DONE
+                ).order_by(NewsItem.published_date.desc()).limit(num_articles).all())
             
             # Agendar artigos com base nas notícias
             for i, news_item in enumerate(news_items):
                 article = Article(
                     title=f"Reescrita: {news_item.title[:100]}",
                     content="Este conteúdo será gerado automaticamente a partir da notícia.",
-                    status=ArticleStatus.SCHEDULED,
+                    status=article_status,
+                    generation_status=generation_status,
                     scheduled_date=current_datetime,
                     ai_model=ai_model_enum,
                     is_automated=True,
                     source_type="rss",
-                    source_url=news_item.link,
+                    source_url=canonical_url(news_item.link),
                     user_id=current_user.id,
                     wordpress_config_id=settings.wordpress_config_id,
                     news_item_id=news_item.id
@@ -886,6 +1027,7 @@ def schedule_automation():
                 
                 db.session.add(article)
                 news_item.is_processed = True
+                mark_story_processed(db.session, news_item)
                 scheduled_count += 1
                 
                 # Avançar para o próximo horário de agendamento
@@ -936,4 +1078,33 @@ def schedule_automation():
             })
         else:
             flash(f'Erro ao agendar automação: {str(e)}', 'danger')
-            return redirect(url_for('automation.index'))
\ No newline at end of file
+            return redirect(url_for('automation.index'))
+
+@automation_bp.route('/websub/<int:feed_id>', methods=['GET', 'POST'])
+def websub_callback(feed_id):
+    """Callback WebSub chamado pelo hub: verificação da assinatura (GET) e entrega de conteúdo (POST)"""
+    feed = RSSFeed.query.get(feed_id)
+    if not feed or not feed.websub_hub or not websub.is_enabled():
+        return '', 404
+    
+    if request.method == 'GET':
+        status, body = websub.verify_intent(feed, request.args)
+        return body, status, {'Content-Type': 'text/plain'}
+    
+    if request.content_length and request.content_length > Config.RSS_MAX_FEED_BYTES:
+        return '', 413
+    
+    try:
+        websub.handle_notification(
+            feed,
+            request.get_data(),
+            request.headers.get('Content-Type', ''),
+            request.headers.get('X-Hub-Signature')
+        )
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Erro ao processar notificação WebSub do feed {feed_id}: {str(e)}")
+        return '', 500
+    
+    # 202 mesmo para notificações ignoradas, para não revelar ao remetente se a assinatura conferiu
+    return '', 202
@@ -5,6 +5,8 @@ from flask_login import login_required, current_user
 from app import db
 from models import WordPressConfig, APIKey, APIType, Article
 from services.wordpress_service import WordPressService
+from services.llm_clients import evict_client
+from services.api_key_cache import invalidate_api_key
 
 logger = logging.getLogger(__name__)
 
@@ -309,8 +311,12 @@ def api_keys():
         
         if existing_key:
             # Update existing key
+            old_key = existing_key.key
             existing_key.key = api_key
             db.session.commit()
+            invalidate_api_key(current_user.id, api_type_enum)
+            if old_key != api_key:
+                evict_client(api_type_enum, old_key)
             flash(f'{api_type.upper()} API key updated successfully.', 'success')
         else:
             # Create new key
@@ -321,6 +327,7 @@ def api_keys():
             )
             db.session.add(new_key)
             db.session.commit()
+            invalidate_api_key(current_user.id, api_type_enum)
             flash(f'{api_type.upper()} API key added successfully.', 'success')
         
         return redirect(url_for('settings.api_keys'))
@@ -356,6 +363,8 @@ def delete_api_key(api_type):
     # Delete key
     db.session.delete(key)
     db.session.commit()
+    invalidate_api_key(current_user.id, api_type_enum)
+    evict_client(api_type_enum, key.key)
     
     flash(f'{api_type.upper()} API key deleted successfully.', 'success')
     return redirect(url_for('settings.api_keys'))
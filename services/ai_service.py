@@ -1,17 +1,20 @@
 import os
+import time
+import hashlib
 import logging
 import json
-import anthropic
-import openai
 from datetime import datetime
 from app import db
-from models import Article, ArticleStatus, AIModel, APIKey, APIType, ArticleLog, LogType
+from models import Article, ArticleStatus, AIModel, APIType, ArticleLog, LogType
+from services.url_canonical import canonical_url
+from services.llm_clients import get_client
+from services import api_key_cache
 
 logger = logging.getLogger(__name__)
 
 def get_api_key(user_id, model_type):
     """
-    Obtém a chave de API para o modelo especificado
+    Obtém a chave de API para o modelo especificado (services/api_key_cache.py)
     
     Args:
         user_id: ID do usuário
@@ -20,199 +23,533 @@ def get_api_key(user_id, model_type):
     Returns:
         str: Chave de API ou None se não encontrada
     """
-    api_key = APIKey.query.filter_by(user_id=user_id, type=model_type).first()
-    return api_key.key if api_key else None
+    return api_key_cache.get_api_key(user_id, model_type)
 
-def generate_content_claude(prompt, user_id, max_tokens=4000):
+# Parâmetros padrão das chamadas de geração
+CLAUDE_MAX_TOKENS = 4000
+GPT_MAX_TOKENS = 2000
+GPT_SYSTEM_PROMPT = "Você é um assistente especializado em criação de conteúdo para blogs."
+
+# Instruções fixas dos prompts de artigos. Vão como prefixo estático (system), igual em
+# todas as chamadas, para o provedor reaproveitar o cache de prompt; só o tema ou a
+# notícia (mensagem do usuário) muda de um artigo para outro. Os provedores só guardam em
+# cache prefixos a partir de 1024 tokens; abaixo disso cached_prompt_tokens fica em 0
+ARTICLE_FORMAT_INSTRUCTIONS = """Formate o conteúdo em markdown e separe cada elemento com marcadores específicos:
+
+TITULO: [Título do artigo]
+
+META: [Meta descrição]
+
+TAGS: [tag1, tag2, tag3, tag4, tag5]
+
+CONTEUDO:
+[Conteúdo completo do artigo em markdown]
+"""
+
+THEME_ARTICLE_INSTRUCTIONS = """Você gera artigos de blog completos sobre o tema e a palavra-chave principal pedidos.
+
+O artigo deve ter:
+1. Um título atraente e otimizado para SEO
+2. Uma introdução envolvente
+3. 4-5 seções com subtítulos relevantes
+4. Uma conclusão
+5. Meta descrição para SEO (limite de 155 caracteres)
+6. 5 tags sugeridas
+
+""" + ARTICLE_FORMAT_INSTRUCTIONS
+
+NEWS_ARTICLE_INSTRUCTIONS = """Você reescreve notícias para criar artigos originais para blog.
+
+Reescreva completamente, mudando a estrutura, parágrafo e escolhas de palavras para criar um artigo 100% original, melhorado e informativo.
+
+O artigo deve ter:
+1. Um título original (diferente do original)
+2. Uma introdução envolvente
+3. Conteúdo reescrito e expandido
+4. Uma conclusão
+5. Meta descrição para SEO (limite de 155 caracteres)
+6. 5 tags sugeridas
+
+IMPORTANTE: Não copie frases ou parágrafos do original. Reescreva completamente com suas próprias palavras.
+
+""" + ARTICLE_FORMAT_INSTRUCTIONS
+
+def claude_request(prompt, max_tokens=CLAUDE_MAX_TOKENS, system=None):
     """
-    Gera conteúdo usando o modelo Claude da Anthropic
+    Argumentos de client.messages.create para um prompt (chamadas síncronas e em lote)
+    
+    Args:
+        prompt: Parte variável do prompt (mensagem do usuário)
+        max_tokens: Número máximo de tokens na resposta
+        system: Instruções fixas (opcional), marcadas para o cache de prompt da Anthropic
+    """
+    # the newest Anthropic model is "claude-3-5-sonnet-20241022" which was released October 22, 2024
+    request = {
+        'model': "claude-3-5-sonnet-20241022",
+        'max_tokens': max_tokens,
+        'messages': [
+            {"role": "user", "content": prompt}
+        ]
+    }
+    if system:
+        request['system'] = [{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}]
+    return request
+
+def gpt_request(prompt, max_tokens=GPT_MAX_TOKENS, system=None):
+    """
+    Argumentos de client.chat.completions.create para um prompt (chamadas síncronas e em lote)
+    
+    Args:
+        prompt: Parte variável do prompt (mensagem do usuário)
+        max_tokens: Número máximo de tokens na resposta
+        system: Instruções fixas (opcional), no início do prompt para o cache automático da OpenAI
+    """
+    # the newest OpenAI model is "gpt-4o" which was released May 13, 2024
+    request = {
+        'model': "gpt-4o",
+        'messages': [
+            {"role": "system", "content": f"{GPT_SYSTEM_PROMPT}\n\n{system}" if system else GPT_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        'max_tokens': max_tokens
+    }
+    if system:
+        # Mesma chave para o mesmo prefixo: as chamadas vão para os servidores que já o têm em cache.
+        # Vai em extra_body porque o SDK fixado no projeto (openai 1.79) não tem esse argumento
+        request['extra_body'] = {
+            'prompt_cache_key': f"blogautoai-{hashlib.sha256(system.encode('utf-8')).hexdigest()[:16]}"
+        }
+    return request
+
+def prompt_usage(usage):
+    """
+    Tokens de entrada de uma resposta, com os lidos do cache de prompt do provedor
+    
+    Args:
+        usage: Campo usage da resposta da Anthropic ou da OpenAI
+        
+    Returns:
+        dict: input_tokens (total do prompt) e cached_input_tokens (lidos do cache)
+    """
+    if usage is None:
+        return {'input_tokens': None, 'cached_input_tokens': None}
+    if hasattr(usage, 'cache_read_input_tokens'):
+        # Anthropic: input_tokens não inclui os tokens lidos nem os gravados no cache
+        cached = usage.cache_read_input_tokens or 0
+        written = usage.cache_creation_input_tokens or 0
+        return {'input_tokens': usage.input_tokens + cached + written, 'cached_input_tokens': cached}
+    details = getattr(usage, 'prompt_tokens_details', None)
+    return {
+        'input_tokens': usage.prompt_tokens,
+        'cached_input_tokens': (details.cached_tokens or 0) if details else 0
+    }
+
+def claude_completion(prompt, user_id, max_tokens=CLAUDE_MAX_TOKENS, system=None):
+    """
+    Chama o modelo Claude da Anthropic
     
     Args:
         prompt: Prompt para o modelo
         user_id: ID do usuário (para buscar a chave de API)
         max_tokens: Número máximo de tokens na resposta
+        system: Instruções fixas (opcional, em cache no provedor)
         
     Returns:
-        str: Texto gerado pelo modelo
+        anthropic.types.Message: Resposta completa (texto e uso de tokens)
     """
     api_key = get_api_key(user_id, APIType.CLAUDE)
     
     if not api_key:
         raise Exception("Chave de API Claude não encontrada")
     
-    client = anthropic.Anthropic(api_key=api_key)
+    client = get_client(APIType.CLAUDE, api_key)
     
     try:
-        # the newest Anthropic model is "claude-3-5-sonnet-20241022" which was released October 22, 2024
-        response = client.messages.create(
-            model="claude-3-5-sonnet-20241022",
-            max_tokens=max_tokens,
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
-        )
-        
-        return response.content[0].text
+        return client.messages.create(**claude_request(prompt, max_tokens, system))
     except Exception as e:
         logger.error(f"Erro ao gerar conteúdo com Claude: {str(e)}")
         raise Exception(f"Erro ao gerar conteúdo com Claude: {str(e)}")
 
-def generate_content_gpt(prompt, user_id, max_tokens=2000):
+def gpt_completion(prompt, user_id, max_tokens=GPT_MAX_TOKENS, system=None):
     """
-    Gera conteúdo usando o modelo GPT da OpenAI
+    Chama o modelo GPT da OpenAI
     
     Args:
         prompt: Prompt para o modelo
         user_id: ID do usuário (para buscar a chave de API)
         max_tokens: Número máximo de tokens na resposta
+        system: Instruções fixas (opcional, em cache no provedor)
         
     Returns:
-        str: Texto gerado pelo modelo
+        openai.types.chat.ChatCompletion: Resposta completa (texto e uso de tokens)
     """
     api_key = get_api_key(user_id, APIType.GPT)
     
     if not api_key:
         raise Exception("Chave de API OpenAI não encontrada")
     
-    client = openai.OpenAI(api_key=api_key)
+    client = get_client(APIType.GPT, api_key)
     
     try:
-        # the newest OpenAI model is "gpt-4o" which was released May 13, 2024
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "Você é um assistente especializado em criação de conteúdo para blogs."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=max_tokens
-        )
-        
-        return response.choices[0].message.content
+        return client.chat.completions.create(**gpt_request(prompt, max_tokens, system))
     except Exception as e:
         logger.error(f"Erro ao gerar conteúdo com GPT: {str(e)}")
         raise Exception(f"Erro ao gerar conteúdo com GPT: {str(e)}")
 
-def generate_article_from_theme(theme, ai_model, user_id, wp_config_id):
+def generate_content_claude(prompt, user_id, max_tokens=CLAUDE_MAX_TOKENS, system=None):
     """
-    Gera um artigo completo baseado em um tema
+    Gera conteúdo usando o modelo Claude da Anthropic
     
     Args:
-        theme: Objeto AutomationTheme
+        prompt: Prompt para o modelo
+        user_id: ID do usuário (para buscar a chave de API)
+        max_tokens: Número máximo de tokens na resposta
+        system: Instruções fixas (opcional)
+        
+    Returns:
+        str: Texto gerado pelo modelo
+    """
+    return claude_completion(prompt, user_id, max_tokens, system).content[0].text
+
+def generate_content_gpt(prompt, user_id, max_tokens=GPT_MAX_TOKENS, system=None):
+    """
+    Gera conteúdo usando o modelo GPT da OpenAI
+    
+    Args:
+        prompt: Prompt para o modelo
+        user_id: ID do usuário (para buscar a chave de API)
+        max_tokens: Número máximo de tokens na resposta
+        system: Instruções fixas (opcional)
+        
+    Returns:
+        str: Texto gerado pelo modelo
+    """
+    return gpt_completion(prompt, user_id, max_tokens, system).choices[0].message.content
+
+def generate_content_with_usage(prompt, ai_model, user_id, system=None):
+    """
+    Gera conteúdo com o provedor do modelo escolhido e mede a chamada
+    
+    Args:
+        prompt: Parte variável do prompt
         ai_model: Modelo de IA a ser usado (AIModel)
         user_id: ID do usuário
-        wp_config_id: ID da configuração WordPress
+        system: Instruções fixas (opcional, em cache no provedor)
         
     Returns:
-        Article: Objeto do artigo gerado
+        tuple: (texto gerado, uso) com o uso de prompt_usage mais elapsed_seconds
+    """
+    started = time.monotonic()
+    if ai_model == AIModel.CLAUDE:
+        response = claude_completion(prompt, user_id, system=system)
+        text = response.content[0].text
+    else:
+        response = gpt_completion(prompt, user_id, system=system)
+        text = response.choices[0].message.content
+    usage = prompt_usage(response.usage)
+    usage['elapsed_seconds'] = round(time.monotonic() - started, 3)
+    return text, usage
+
+def generate_content(prompt, ai_model, user_id, system=None):
+    """
+    Gera conteúdo com o provedor do modelo escolhido
+    
+    Args:
+        prompt: Prompt para o modelo
+        ai_model: Modelo de IA a ser usado (AIModel)
+        user_id: ID do usuário
+        system: Instruções fixas (opcional)
+        
+    Returns:
+        str: Texto gerado pelo modelo
+    """
+    return generate_content_with_usage(prompt, ai_model, user_id, system)[0]
+
+def apply_usage(article, usage):
+    """
+    Grava no artigo os tokens de entrada, os lidos do cache e a duração da geração
+    
+    Args:
+        article: Objeto Article
+        usage: Dicionário de generate_content_with_usage (ou None)
+    """
+    if not usage:
+        return
+    article.prompt_tokens = usage.get('input_tokens')
+    article.cached_prompt_tokens = usage.get('cached_input_tokens')
+    article.generation_seconds = usage.get('elapsed_seconds')
+
+def build_theme_prompt(theme):
+    """
+    Monta a parte variável do prompt de um artigo sobre um tema
+    (as instruções fixas estão em THEME_ARTICLE_INSTRUCTIONS)
+    
+    Args:
+        theme: Objeto AutomationTheme
+        
+    Returns:
+        tuple: (prompt, palavra-chave principal)
     """
     keywords = theme.keywords.split(',')
     main_keyword = keywords[0].strip()
     
-    # Construir prompt para o modelo de IA
     prompt = f"""Gere um artigo de blog completo sobre o tema "{theme.name}" focando na palavra-chave principal "{main_keyword}".
     
 Outras palavras-chave relacionadas: {', '.join(keywords[1:5] if len(keywords) > 1 else [])}
+"""
+    return prompt, main_keyword
 
-O artigo deve ter:
-1. Um título atraente e otimizado para SEO
-2. Uma introdução envolvente
-3. 4-5 seções com subtítulos relevantes
-4. Uma conclusão
-5. Meta descrição para SEO (limite de 155 caracteres)
-6. 5 tags sugeridas
+def parse_article_response(response):
+    """
+    Separa título, meta descrição, tags e conteúdo da resposta do modelo
+    
+    Args:
+        response: Texto gerado com os marcadores TITULO/META/TAGS/CONTEUDO
+        
+    Returns:
+        tuple: (titulo, meta, tags, conteudo); partes não encontradas ficam vazias
+    """
+    titulo = ""
+    meta = ""
+    tags = ""
+    conteudo = ""
+    
+    # Parsear resposta
+    sections = response.split("\n\n")
+    for section in sections:
+        if section.startswith("TITULO:"):
+            titulo = section.replace("TITULO:", "").strip()
+        elif section.startswith("META:"):
+            meta = section.replace("META:", "").strip()
+        elif section.startswith("TAGS:"):
+            tags = section.replace("TAGS:", "").strip()
+        elif section.startswith("CONTEUDO:"):
+            conteudo = section.replace("CONTEUDO:", "").strip()
+    
+    # Se não conseguiu extrair corretamente, tentar outro método
+    if not titulo or not conteudo:
+        lines = response.split("\n")
+        for i, line in enumerate(lines):
+            if "TITULO:" in line:
+                titulo = line.replace("TITULO:", "").strip()
+            elif "META:" in line:
+                meta = line.replace("META:", "").strip()
+            elif "TAGS:" in line:
+                tags = line.replace("TAGS:", "").strip()
+            elif "CONTEUDO:" in line:
+                conteudo = "\n".join(lines[i+1:]).strip()
+    
+    return titulo, meta, tags, conteudo
 
-Formate o conteúdo em markdown e separe cada elemento com marcadores específicos:
+def save_theme_article(theme, ai_model, user_id, wp_config_id, response, existing_article_id=None, usage=None):
+    """
+    Grava o artigo gerado para um tema (Article + ArticleLog) e faz o commit
+    
+    Args:
+        theme: Objeto AutomationTheme
+        ai_model: Modelo de IA usado (AIModel)
+        user_id: ID do usuário
+        wp_config_id: ID da configuração WordPress
+        response: Texto gerado pelo modelo
+        existing_article_id: ID de um artigo existente para atualizar (opcional)
+        usage: Tokens e duração da geração, de generate_content_with_usage (opcional)
+        
+    Returns:
+        Article: Objeto do artigo gerado ou atualizado
+    """
+    titulo, meta, tags, conteudo = parse_article_response(response)
+    main_keyword = theme.keywords.split(',')[0].strip()
+    
+    # Se ainda não conseguiu extrair título, usar o tema como título
+    if not titulo:
+        titulo = f"Artigo sobre {theme.name}"
+    
+    # Contar palavras
+    word_count = len(conteudo.split())
+    
+    # Verificar se estamos atualizando um artigo existente (ex.: artigo agendado gerado em lote)
+    if existing_article_id:
+        article = Article.query.get(existing_article_id)
+        if article:
+            article.title = titulo
+            article.content = conteudo
+            article.meta_description = meta[:320] if meta else None
+            article.tags = tags[:256] if tags else None
+            article.word_count = word_count
+            article.updated_at = datetime.utcnow()
+            apply_usage(article, usage)
+            
+            # Adicionar log
+            log = ArticleLog(
+                message=f"Artigo atualizado com conteúdo gerado a partir do tema '{theme.name}'",
+                log_type=LogType.INFO,
+                article_id=article.id
+            )
+            db.session.add(log)
+            db.session.commit()
+            
+            return article
+    
+    # Criar artigo
+    article = Article(
+        title=titulo,
+        content=conteudo,
+        meta_description=meta[:320] if meta else None,
+        tags=tags[:256] if tags else None,
+        status=ArticleStatus.DRAFT,
+        ai_model=ai_model,
+        is_automated=True,
+        source_type="keyword",
+        keyword=main_keyword,
+        word_count=word_count,
+        user_id=user_id,
+        wordpress_config_id=wp_config_id,
+        theme_id=theme.id
+    )
+    
+    apply_usage(article, usage)
+    db.session.add(article)
+    db.session.flush()  # Necessário para obter o ID do artigo antes de criar o log
+    
+    # Adicionar log
+    log = ArticleLog(
+        message=f"Artigo gerado automaticamente a partir do tema '{theme.name}'",
+        log_type=LogType.INFO,
+        article_id=article.id
+    )
+    
+    db.session.add(log)
+    db.session.commit()
+    
+    return article
 
-TITULO: [Título do artigo]
+def generate_article_from_theme(theme, ai_model, user_id, wp_config_id):
+    """
+    Gera um artigo completo baseado em um tema
+    
+    Args:
+        theme: Objeto AutomationTheme
+        ai_model: Modelo de IA a ser usado (AIModel)
+        user_id: ID do usuário
+        wp_config_id: ID da configuração WordPress
+        
+    Returns:
+        Article: Objeto do artigo gerado
+    """
+    # Construir prompt para o modelo de IA
+    prompt, _ = build_theme_prompt(theme)
+    
+    # Gerar conteúdo com o modelo adequado (instruções fixas em cache no provedor)
+    try:
+        response, usage = generate_content_with_usage(prompt, ai_model, user_id, THEME_ARTICLE_INSTRUCTIONS)
+        return save_theme_article(theme, ai_model, user_id, wp_config_id, response, usage=usage)
+    
+    except Exception as e:
+        logger.error(f"Erro ao gerar artigo a partir do tema: {str(e)}")
+        raise e
 
-META: [Meta descrição]
+def build_news_prompt(news_item):
+    """
+    Monta a parte variável do prompt da reescrita de uma notícia
+    (as instruções fixas estão em NEWS_ARTICLE_INSTRUCTIONS)
+    
+    Args:
+        news_item: Objeto NewsItem
+        
+    Returns:
+        str: Prompt para o modelo
+    """
+    return f"""Reescreva completamente a notícia abaixo para criar um artigo original para blog.
+    
+TÍTULO ORIGINAL: {news_item.title}
 
-TAGS: [tag1, tag2, tag3, tag4, tag5]
+CONTEÚDO ORIGINAL:
+{news_item.full_content[:5000] if news_item.full_content else news_item.description[:1000]}
 
-CONTEUDO:
-[Conteúdo completo do artigo em markdown]
+FONTE: {news_item.link}
 """
+
+def save_news_article(news_item, ai_model, user_id, wp_config_id, response, existing_article_id=None, usage=None):
+    """
+    Grava o artigo gerado a partir de uma notícia (Article + ArticleLog) e faz o commit
     
-    # Gerar conteúdo com o modelo adequado
-    try:
-        if ai_model == AIModel.CLAUDE:
-            response = generate_content_claude(prompt, user_id)
-        else:
-            response = generate_content_gpt(prompt, user_id)
-        
-        # Extrair partes do artigo
-        titulo = ""
-        meta = ""
-        tags = ""
-        conteudo = ""
-        
-        # Parsear resposta
-        sections = response.split("\n\n")
-        for section in sections:
-            if section.startswith("TITULO:"):
-                titulo = section.replace("TITULO:", "").strip()
-            elif section.startswith("META:"):
-                meta = section.replace("META:", "").strip()
-            elif section.startswith("TAGS:"):
-                tags = section.replace("TAGS:", "").strip()
-            elif section.startswith("CONTEUDO:"):
-                conteudo = section.replace("CONTEUDO:", "").strip()
-        
-        # Se não conseguiu extrair corretamente, tentar outro método
-        if not titulo or not conteudo:
-            lines = response.split("\n")
-            for i, line in enumerate(lines):
-                if "TITULO:" in line:
-                    titulo = line.replace("TITULO:", "").strip()
-                elif "META:" in line:
-                    meta = line.replace("META:", "").strip()
-                elif "TAGS:" in line:
-                    tags = line.replace("TAGS:", "").strip()
-                elif "CONTEUDO:" in line:
-                    conteudo = "\n".join(lines[i+1:]).strip()
-        
-        # Se ainda não conseguiu extrair título, usar o tema como título
-        if not titulo:
-            titulo = f"Artigo sobre {theme.name}"
-        
-        # Contar palavras
-        word_count = len(conteudo.split())
-        
-        # Criar artigo
-        article = Article(
-            title=titulo,
-            content=conteudo,
-            meta_description=meta[:320] if meta else None,
-            tags=tags[:256] if tags else None,
-            status=ArticleStatus.DRAFT,
-            ai_model=ai_model,
-            is_automated=True,
-            source_type="keyword",
-            keyword=main_keyword,
-            word_count=word_count,
-            user_id=user_id,
-            wordpress_config_id=wp_config_id,
-            theme_id=theme.id
-        )
-        
-        db.session.add(article)
-        db.session.flush()  # Necessário para obter o ID do artigo antes de criar o log
-        
-        # Adicionar log
-        log = ArticleLog(
-            message=f"Artigo gerado automaticamente a partir do tema '{theme.name}'",
-            log_type=LogType.INFO,
-            article_id=article.id
-        )
-        
-        db.session.add(log)
-        db.session.commit()
+    Args:
+        news_item: Objeto NewsItem
+        ai_model: Modelo de IA usado (AIModel)
+        user_id: ID do usuário
+        wp_config_id: ID da configuração WordPress (opcional)
+        response: Texto gerado pelo modelo
+        existing_article_id: ID de um artigo existente para atualizar (opcional)
+        usage: Tokens e duração da geração, de generate_content_with_usage (opcional)
         
-        return article
+    Returns:
+        Article: Objeto do artigo gerado ou atualizado
+    """
+    titulo, meta, tags, conteudo = parse_article_response(response)
     
-    except Exception as e:
-        logger.error(f"Erro ao gerar artigo a partir do tema: {str(e)}")
-        raise e
+    # Se ainda não conseguiu extrair título, usar o título original
+    if not titulo:
+        titulo = f"Reescrita: {news_item.title}"
+    
+    # Contar palavras
+    word_count = len(conteudo.split())
+    
+    # Verificar se estamos atualizando um artigo existente
+    if existing_article_id:
+        article = Article.query.get(existing_article_id)
+        if article:
+            # Atualizar artigo existente
+            article.title = titulo
+            article.content = conteudo
+            article.meta_description = meta[:320] if meta else None
+            article.tags = tags[:256] if tags else None
+            article.word_count = word_count
+            article.updated_at = datetime.utcnow()
+            apply_usage(article, usage)
+            
+            # Adicionar log
+            log = ArticleLog(
+                message=f"Artigo atualizado com conteúdo gerado a partir da notícia '{news_item.title}'",
+                log_type=LogType.INFO,
+                article_id=article.id
+            )
+            db.session.add(log)
+            db.session.commit()
+            
+            return article
+    
+    # Se não estamos atualizando, cria um novo artigo 
+    article = Article(
+        title=titulo,
+        content=conteudo,
+        meta_description=meta[:320] if meta else None,
+        tags=tags[:256] if tags else None,
+        status=ArticleStatus.DRAFT,
+        ai_model=ai_model,
+        is_automated=True,
+        source_type="rss",
+        source_url=canonical_url(news_item.link),
+        word_count=word_count,
+        user_id=user_id,
+        wordpress_config_id=wp_config_id,
+        news_item_id=news_item.id
+    )
+    
+    apply_usage(article, usage)
+    db.session.add(article)
+    db.session.flush()  # Necessário para obter o ID do artigo antes de criar o log
+    
+    # Adicionar log
+    log = ArticleLog(
+        message=f"Artigo gerado automaticamente a partir da notícia '{news_item.title}'",
+        log_type=LogType.INFO,
+        article_id=article.id
+    )
+    
+    db.session.add(log)
+    db.session.commit()
+    
+    return article
 
 def generate_article_from_news(news_item, ai_model, user_id, wp_config_id=None, existing_article_id=None):
     """
@@ -229,139 +566,13 @@ def generate_article_from_news(news_item, ai_model, user_id, wp_config_id=None,
         Article: Objeto do artigo gerado ou atualizado
     """
     # Construir prompt para o modelo de IA
-    prompt = f"""Reescreva completamente a notícia abaixo para criar um artigo original para blog.
-    
-TÍTULO ORIGINAL: {news_item.title}
-
-CONTEÚDO ORIGINAL:
-{news_item.content[:5000] if news_item.content else news_item.description[:1000]}
-
-FONTE: {news_item.link}
-
-Reescreva completamente, mudando a estrutura, parágrafo e escolhas de palavras para criar um artigo 100% original, melhorado e informativo.
-
-O artigo deve ter:
-1. Um título original (diferente do original)
-2. Uma introdução envolvente
-3. Conteúdo reescrito e expandido
-4. Uma conclusão
-5. Meta descrição para SEO (limite de 155 caracteres)
-6. 5 tags sugeridas
-
-IMPORTANTE: Não copie frases ou parágrafos do original. Reescreva completamente com suas próprias palavras.
-
-Formate o conteúdo em markdown e separe cada elemento com marcadores específicos:
-
-TITULO: [Título do artigo]
-
-META: [Meta descrição]
-
-TAGS: [tag1, tag2, tag3, tag4, tag5]
-
-CONTEUDO:
-[Conteúdo completo do artigo em markdown]
-"""
+    prompt = build_news_prompt(news_item)
     
-    # Gerar conteúdo com o modelo adequado
+    # Gerar conteúdo com o modelo adequado (instruções fixas em cache no provedor)
     try:
-        if ai_model == AIModel.CLAUDE:
-            response = generate_content_claude(prompt, user_id)
-        else:
-            response = generate_content_gpt(prompt, user_id)
-        
-        # Extrair partes do artigo
-        titulo = ""
-        meta = ""
-        tags = ""
-        conteudo = ""
-        
-        # Parsear resposta
-        sections = response.split("\n\n")
-        for section in sections:
-            if section.startswith("TITULO:"):
-                titulo = section.replace("TITULO:", "").strip()
-            elif section.startswith("META:"):
-                meta = section.replace("META:", "").strip()
-            elif section.startswith("TAGS:"):
-                tags = section.replace("TAGS:", "").strip()
-            elif section.startswith("CONTEUDO:"):
-                conteudo = section.replace("CONTEUDO:", "").strip()
-        
-        # Se não conseguiu extrair corretamente, tentar outro método
-        if not titulo or not conteudo:
-            lines = response.split("\n")
-            for i, line in enumerate(lines):
-                if "TITULO:" in line:
-                    titulo = line.replace("TITULO:", "").strip()
-                elif "META:" in line:
-                    meta = line.replace("META:", "").strip()
-                elif "TAGS:" in line:
-                    tags = line.replace("TAGS:", "").strip()
-                elif "CONTEUDO:" in line:
-                    conteudo = "\n".join(lines[i+1:]).strip()
-        
-        # Se ainda não conseguiu extrair título, usar o título original
-        if not titulo:
-            titulo = f"Reescrita: {news_item.title}"
-        
-        # Contar palavras
-        word_count = len(conteudo.split())
-        
-        # Verificar se estamos atualizando um artigo existente
-        if existing_article_id:
-            article = Article.query.get(existing_article_id)
-            if article:
-                # Atualizar artigo existente
-                article.title = titulo
-                article.content = conteudo
-                article.meta_description = meta[:320] if meta else None
-                article.tags = tags[:256] if tags else None
-                article.word_count = word_count
-                article.updated_at = datetime.utcnow()
-                
-                # Adicionar log
-                log = ArticleLog(
-                    message=f"Artigo atualizado com conteúdo gerado a partir da notícia '{news_item.title}'",
-                    log_type=LogType.INFO,
-                    article_id=article.id
-                )
-                db.session.add(log)
-                db.session.commit()
-                
-                return article
-        
-        # Se não estamos atualizando, cria um novo artigo 
-        article = Article(
-            title=titulo,
-            content=conteudo,
-            meta_description=meta[:320] if meta else None,
-            tags=tags[:256] if tags else None,
-            status=ArticleStatus.DRAFT,
-            ai_model=ai_model,
-            is_automated=True,
-            source_type="rss",
-            source_url=news_item.link,
-            word_count=word_count,
-            user_id=user_id,
-            wordpress_config_id=wp_config_id,
-            news_item_id=news_item.id
-        )
-        
-        db.session.add(article)
-        db.session.flush()  # Necessário para obter o ID do artigo antes de criar o log
-        
-        # Adicionar log
-        log = ArticleLog(
-            message=f"Artigo gerado automaticamente a partir da notícia '{news_item.title}'",
-            log_type=LogType.INFO,
-            article_id=article.id
-        )
-        
-        db.session.add(log)
-        db.session.commit()
-        
-        return article
+        response, usage = generate_content_with_usage(prompt, ai_model, user_id, NEWS_ARTICLE_INSTRUCTIONS)
+        return save_news_article(news_item, ai_model, user_id, wp_config_id, response, existing_article_id, usage)
     
     except Exception as e:
         logger.error(f"Erro ao gerar artigo a partir da notícia: {str(e)}")
-        raise e
\ No newline at end of file
+        raise e
@@ -0,0 +1,80 @@
+"""
+Cache em memória das chaves de API dos usuários
+Cada geração de artigo precisa da chave do provedor; em vez de consultar
+APIKey a cada chamada, a chave (ou a ausência dela) fica em memória por
+Config.API_KEY_CACHE_TTL_SECONDS. As rotas de configuração invalidam a entrada
+ao gravar ou remover uma chave, de modo que a troca vale imediatamente neste
+processo; nos demais (daemon, cron) vale ao fim do prazo
+"""
+
+import time
+import threading
+from config import Config
+from models import APIKey, APIType
+
+# (user_id, APIType) -> (chave ou None, horário de expiração em time.monotonic)
+_keys = {}
+_lock = threading.Lock()
+# Incrementado a cada invalidação: uma leitura do banco iniciada antes dela não é guardada
+_generation = 0
+
+
+def get_api_key(user_id, api_type, refresh=False):
+    """
+    Chave de API do usuário para um provedor, lida do cache quando possível
+
+    Args:
+        user_id: ID do usuário
+        api_type: APIType da chave
+        refresh: Ler do banco mesmo com a chave em cache (e atualizar o cache)
+
+    Returns:
+        str: Chave de API ou None se o usuário não tem chave para o provedor
+    """
+    now = time.monotonic()
+    with _lock:
+        cached = _keys.get((user_id, api_type))
+        generation = _generation
+    if cached and cached[1] > now and not refresh:
+        return cached[0]
+
+    api_key = APIKey.query.filter_by(user_id=user_id, type=api_type).first()
+    value = api_key.key if api_key else None
+    with _lock:
+        # Uma invalidação durante a consulta pode ter tornado o valor lido antigo
+        if _generation == generation:
+            _keys[(user_id, api_type)] = (value, now + Config.API_KEY_CACHE_TTL_SECONDS)
+    return value
+
+
+def get_generation_keys(user_id):
+    """
+    Chaves dos provedores de geração de texto configuradas pelo usuário
+
+    Returns:
+        dict: APIType.CLAUDE e APIType.GPT -> chave (somente os configurados)
+    """
+    keys = {}
+    for api_type in (APIType.CLAUDE, APIType.GPT):
+        value = get_api_key(user_id, api_type)
+        if value:
+            keys[api_type] = value
+    return keys
+
+
+def invalidate_api_key(user_id, api_type=None):
+    """
+    Remove do cache a chave de um usuário (todas as chaves dele se api_type for None)
+
+    Args:
+        user_id: ID do usuário
+        api_type: APIType da chave gravada ou removida (opcional)
+    """
+    global _generation
+    with _lock:
+        _generation += 1
+        if api_type is not None:
+            _keys.pop((user_id, api_type), None)
+        else:
+            for cache_key in [cache_key for cache_key in _keys if cache_key[0] == user_id]:
+                del _keys[cache_key]
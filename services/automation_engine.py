@@ -8,11 +8,19 @@ import logging
 import time
 import random
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
-import feedparser
-from sqlalchemy import create_engine, text
+from typing import Optional, List, Dict, Any, Tuple
+from sqlalchemy import create_engine, text, bindparam, DateTime
 from sqlalchemy.orm import sessionmaker
 from config import Config
+from services.feed_reader import (
+    fetch_feed, scan_new_entries, group_feeds_by_url, shared_validators, stop_before_for, FEED_MODIFIED
+)
+from services.news_store import store_new_items, delete_orphan_contents
+from services.compressed_text import CompressedText
+from services.feed_scheduling import compute_next_poll
+from services.feed_health import fetch_allowed, health_after_success, health_after_failure, save_health
+from services.extraction_worker import process_pending_extractions
+from services.story_clusters import one_per_story, mark_story_processed
 
 logger = logging.getLogger(__name__)
 
@@ -37,6 +45,9 @@ class AutomationEngine:
                 # 2. Buscar novos conteúdos de feeds RSS
                 self._fetch_rss_feeds(session)
                 
+                # 2.1 Extrair o texto completo das notícias pendentes
+                self._extract_news_content(session)
+                
                 # 3. Gerar novos artigos baseados em temas
                 self._generate_theme_articles(session)
                 
@@ -101,108 +112,171 @@ class AutomationEngine:
             logger.error(f"Erro no processamento de artigos agendados: {e}")
             
     def _fetch_rss_feeds(self, session):
-        """Busca novos itens de feeds RSS"""
+        """Busca novos itens de feeds RSS, baixando cada URL uma única vez para todos os assinantes"""
         try:
-            # Buscar feeds RSS ativos
-            result = session.execute(text("""
-                SELECT rf.id, rf.url, rf.name, rf.user_id, rf.theme_id, rf.last_fetch
+            # URLs com alguma assinatura ativa cuja próxima busca já chegou e cujo circuito não está aberto
+            due_urls = [row.url for row in session.execute(text("""
+                SELECT rf.url, MIN(rf.next_poll_at) AS next_poll_at
                 FROM rss_feed rf
                 JOIN automation_theme at ON rf.theme_id = at.id
                 WHERE rf.is_active = 1 
                 AND at.is_active = 1
-                AND (rf.last_fetch IS NULL OR rf.last_fetch < :cutoff_time)
+                AND (rf.next_poll_at IS NULL OR rf.next_poll_at <= :now)
+                AND (rf.circuit_open_until IS NULL OR rf.circuit_open_until <= :now)
+                GROUP BY rf.url
+                ORDER BY next_poll_at
                 LIMIT 20
-            """), {"cutoff_time": datetime.utcnow() - timedelta(hours=2)})
+            """), {"now": datetime.utcnow()})]
+            
+            if not due_urls:
+                logger.info("📡 Nenhum feed RSS para buscar")
+                return {"processed": 0, "unchanged": 0, "errors": 0, "new_items": 0}
+            
+            # Todas as assinaturas ativas dessas URLs recebem o mesmo download
+            result = session.execute(text("""
+                SELECT rf.id, rf.url, rf.name, rf.user_id, rf.theme_id, rf.last_fetch,
+                       rf.etag, rf.last_modified, rf.content_hash,
+                       rf.watermark_published_at, rf.watermark_guid, rf.full_scan,
+                       rf.consecutive_failures, rf.last_error, rf.last_success_at,
+                       rf.avg_latency_ms, rf.circuit_open_until
+                FROM rss_feed rf
+                JOIN automation_theme at ON rf.theme_id = at.id
+                WHERE rf.is_active = 1 
+                AND at.is_active = 1
+                AND rf.url IN :urls
+            """).bindparams(bindparam("urls", expanding=True))
+                .columns(last_fetch=DateTime, watermark_published_at=DateTime,
+                         last_success_at=DateTime, circuit_open_until=DateTime), {"urls": due_urls})
             
             feeds = result.fetchall()
-            logger.info(f"📡 Processando {len(feeds)} feeds RSS")
+            groups = group_feeds_by_url(feeds)
+            logger.info(f"📡 Processando {len(feeds)} feeds RSS ({len(groups)} URLs)")
             
-            for feed in feeds:
-                try:
-                    new_items = self._parse_rss_feed(feed.url, feed.last_fetch)
-                    
-                    for item in new_items:
-                        # Verificar se já existe
-                        existing = session.execute(text("""
-                            SELECT id FROM news_item WHERE guid = :guid
-                        """), {"guid": item['guid']}).fetchone()
+            stats = {"processed": 0, "unchanged": 0, "errors": 0, "skipped": 0, "new_items": 0,
+                     "canonicalized_links": 0, "canonical_duplicates": 0, "shared_contents": 0}
+            
+            for url, group in groups.items():
+                if not fetch_allowed(group):
+                    # Circuito aberto em todas as assinaturas: aguardar o fim da suspensão
+                    stats["skipped"] += len(group)
+                    continue
+                
+                started = time.monotonic()
+                fetch_result, error = self._download_rss_feed(url, group)
+                elapsed = time.monotonic() - started
+                if error is None and fetch_result['bozo']:
+                    error = f"Feed inválido: {fetch_result['bozo_exception']}"
+                if error is not None:
+                    # Falha no download ou feed inválido vale para todas as assinaturas da URL
+                    stats["errors"] += len(group)
+                    for feed in group:
+                        save_health(session, feed.id, health_after_failure(feed, error))
+                    continue
+                
+                for feed in group:
+                    save_health(session, feed.id, health_after_success(feed, elapsed))
+                    try:
+                        new_items, watermark = self._parse_rss_feed(feed, fetch_result)
                         
-                        if not existing:
-                            # Inserir nova notícia
-                            session.execute(text("""
-                                INSERT INTO news_item 
-                                (title, description, content, link, guid, published_date, 
-                                 rss_feed_id, user_id, created_at, is_processed)
-                                VALUES (:title, :description, :content, :link, :guid, 
-                                        :published_date, :rss_feed_id, :user_id, :created_at, 0)
-                            """), {
-                                "title": item['title'][:255],
-                                "description": item['description'][:500] if item['description'] else None,
-                                "content": item['content'],
-                                "link": item['link'][:500],
-                                "guid": item['guid'][:500],
-                                "published_date": item['published_date'],
-                                "rss_feed_id": feed.id,
-                                "user_id": feed.user_id,
-                                "created_at": datetime.utcnow()
-                            })
-                    
-                    # Atualizar última busca
-                    session.execute(text("""
-                        UPDATE rss_feed 
-                        SET last_fetch = :now 
-                        WHERE id = :feed_id
-                    """), {"now": datetime.utcnow(), "feed_id": feed.id})
-                    
-                    logger.info(f"📰 Feed '{feed.name}': {len(new_items)} novos itens")
-                    
-                except Exception as e:
-                    logger.error(f"Erro ao processar feed {feed.name}: {e}")
+                        # Verificar os GUIDs em uma consulta e inserir os novos em lote
+                        inserted = store_new_items(session, new_items, feed.id, feed.user_id, stats)
+                        
+                        # Próxima busca conforme a frequência de publicação do feed
+                        poll_schedule = compute_next_poll(session, feed.id)
+                        
+                        # Atualizar última busca, validadores HTTP e agendamento
+                        session.execute(text("""
+                            UPDATE rss_feed 
+                            SET last_fetch = :now,
+                                etag = :etag,
+                                last_modified = :last_modified,
+                                content_hash = :content_hash,
+                                next_poll_at = :next_poll_at,
+                                poll_interval_minutes = :poll_interval_minutes,
+                                watermark_published_at = :watermark_published_at,
+                                watermark_guid = :watermark_guid,
+                                websub_hub = COALESCE(:websub_hub, websub_hub),
+                                websub_topic = COALESCE(:websub_topic, websub_topic)
+                            WHERE id = :feed_id
+                        """), {
+                            "now": datetime.utcnow(),
+                            "etag": fetch_result['etag'],
+                            "last_modified": fetch_result['last_modified'],
+                            "content_hash": fetch_result['content_hash'],
+                            "next_poll_at": poll_schedule['next_poll_at'],
+                            "poll_interval_minutes": poll_schedule['poll_interval_minutes'],
+                            "watermark_published_at": watermark['published_at'] if watermark else feed.watermark_published_at,
+                            "watermark_guid": watermark['guid'] if watermark else feed.watermark_guid,
+                            "websub_hub": fetch_result['websub_hub'][:512] if fetch_result['websub_hub'] else None,
+                            "websub_topic": (fetch_result['websub_topic'] or url)[:512] if fetch_result['websub_hub'] else None,
+                            "feed_id": feed.id
+                        })
+                        
+                        stats["processed"] += 1
+                        if fetch_result['status'] != FEED_MODIFIED:
+                            stats["unchanged"] += 1
+                            logger.info(f"📰 Feed '{feed.name}': sem alterações ({fetch_result['status']})")
+                            continue
+                        
+                        stats["new_items"] += inserted
+                        logger.info(f"📰 Feed '{feed.name}': {inserted} novos itens")
+                        
+                    except Exception as e:
+                        stats["errors"] += 1
+                        logger.error(f"Erro ao processar feed {feed.name}: {e}")
+            
+            logger.info(
+                f"📡 Feeds: {stats['processed']} processados, {stats['unchanged']} sem alterações, "
+                f"{stats['errors']} com erros, {stats['skipped']} suspensos, {stats['new_items']} novos itens "
+                f"(URL canônica: {stats['canonicalized_links']} links reescritos, "
+                f"{stats['canonical_duplicates']} repetições evitadas, {stats['shared_contents']} textos reaproveitados)"
+            )
+            return stats
                     
         except Exception as e:
             logger.error(f"Erro na busca de feeds RSS: {e}")
             
-    def _parse_rss_feed(self, url: str, last_fetch: datetime = None) -> List[Dict]:
-        """Faz parsing de um feed RSS e retorna novos itens"""
+    def _download_rss_feed(self, url: str, subscriptions: List) -> Tuple[Optional[Dict], Optional[str]]:
+        """Baixa um feed uma vez para todas as assinaturas da URL; retorna (resultado, None) ou (None, erro)"""
         try:
-            feed = feedparser.parse(url)
-            new_items = []
-            
-            for entry in feed.entries:
-                # Processar data de publicação
-                published_date = None
-                if hasattr(entry, 'published_parsed') and entry.published_parsed:
-                    try:
-                        published_date = datetime(*entry.published_parsed[:6])
-                    except:
-                        pass
-                
-                # Verificar se é novo
-                if not last_fetch or not published_date or published_date > last_fetch:
-                    content = ""
-                    if hasattr(entry, 'content') and entry.content:
-                        content = entry.content[0].value if entry.content else ""
-                    elif hasattr(entry, 'summary'):
-                        content = entry.summary
-                    
-                    new_items.append({
-                        'title': entry.get('title', 'Sem título'),
-                        'description': entry.get('summary', ''),
-                        'content': content,
-                        'link': entry.get('link', ''),
-                        'guid': entry.get('id', entry.get('link', '')),
-                        'published_date': published_date
-                    })
-            
-            return new_items
-            
+            etag, last_modified, content_hash = shared_validators(subscriptions)
+            return fetch_feed(
+                url, etag=etag, last_modified=last_modified, previous_hash=content_hash,
+                stop_before=stop_before_for(subscriptions)
+            ), None
         except Exception as e:
-            logger.error(f"Erro ao fazer parsing do feed {url}: {e}")
-            return []
+            logger.error(f"Erro ao baixar o feed {url}: {e}")
+            return None, str(e)
+            
+    def _parse_rss_feed(self, feed, fetch_result: Dict) -> Tuple[List[Dict], Optional[Dict]]:
+        """Lê as entradas de um feed baixado até a marca d'água da assinatura e retorna novos itens e a nova marca"""
+        if fetch_result['status'] != FEED_MODIFIED:
+            # 304 ou conteúdo idêntico: nada a parsear
+            return [], None
+        
+        # Ler apenas as entradas acima da marca d'água do feed
+        return scan_new_entries(
+            fetch_result['entries'],
+            feed.watermark_published_at,
+            feed.watermark_guid,
+            bool(feed.full_scan)
+        )
+            
+    def _extract_news_content(self, session):
+        """Extrai o texto completo das notícias gravadas com extração pendente"""
+        try:
+            return process_pending_extractions(session)
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Erro na extração de conteúdo das notícias: {e}")
             
     def _generate_theme_articles(self, session):
         """Gera novos artigos baseados em temas"""
         try:
+            from models import AIModel, APIType
+            from services.api_key_cache import get_api_key
+            from services.generation_engine import GenerationEngine, PromptJob
+            
             # Buscar usuários com automação ativa
             result = session.execute(text("""
                 SELECT DISTINCT u.id as user_id, 
@@ -219,6 +293,7 @@ class AutomationEngine:
             """), {"now": datetime.utcnow()})
             
             active_users = result.fetchall()
+            jobs = []
             
             for user in active_users:
                 try:
@@ -227,51 +302,26 @@ class AutomationEngine:
                     if not (user.active_hours_start <= current_hour <= user.active_hours_end):
                         continue
                     
-                    # Buscar notícias não processadas
-                    unprocessed_news = session.execute(text("""
-                        SELECT id, title, content, link
-                        FROM news_item 
-                        WHERE user_id = :user_id 
-                        AND is_processed = 0
-                        ORDER BY published_date DESC
+                    # Buscar notícias não processadas (uma por história); o texto completo e o do
+                    # feed vêm em colunas separadas, cada uma com o seu tipo, e a escolha é feita aqui
+                    unprocessed_news = one_per_story(session.execute(text("""
+                        SELECT ni.id, ni.title, nc.content AS shared_content, ni.content AS feed_content,
+                               ni.link, ni.story_cluster_id
+                        FROM news_item ni
+                        LEFT JOIN news_content nc ON nc.id = ni.news_content_id
+                        WHERE ni.user_id = :user_id 
+                        AND ni.is_processed = 0
+                        AND ni.extraction_status = 'done'
+                        ORDER BY ni.published_date DESC
                         LIMIT 3
-                    """), {"user_id": user.user_id}).fetchall()
+                    """).columns(shared_content=CompressedText, feed_content=CompressedText),
+                        {"user_id": user.user_id}).fetchall())
                     
-                    # Gerar artigos a partir de notícias
-                    for news in unprocessed_news:
-                        try:
-                            article_content = self._generate_article_from_news(
-                                news, user.user_id, user.min_word_count, user.max_word_count
-                            )
-                            
-                            if article_content:
-                                # Inserir novo artigo
-                                session.execute(text("""
-                                    INSERT INTO article 
-                                    (title, content, status, user_id, wordpress_config_id, 
-                                     created_at, is_automated, news_item_id, ai_model)
-                                    VALUES (:title, :content, 'draft', :user_id, :wp_config_id, 
-                                            :created_at, 1, :news_id, 'gpt')
-                                """), {
-                                    "title": article_content['title'],
-                                    "content": article_content['content'],
-                                    "user_id": user.user_id,
-                                    "wp_config_id": user.wordpress_config_id,
-                                    "created_at": datetime.utcnow(),
-                                    "news_id": news.id
-                                })
-                                
-                                # Marcar notícia como processada
-                                session.execute(text("""
-                                    UPDATE news_item 
-                                    SET is_processed = 1 
-                                    WHERE id = :news_id
-                                """), {"news_id": news.id})
-                                
-                                logger.info(f"📝 Artigo gerado para usuário {user.user_id}")
-                                
-                        except Exception as e:
-                            logger.error(f"Erro ao gerar artigo da notícia {news.id}: {e}")
+                    # Artigos a partir de notícias (gerados depois, em um único lote para todos os usuários)
+                    if get_api_key(user.user_id, APIType.GPT):
+                        for news in unprocessed_news:
+                            prompt = self._build_news_prompt(news, user.min_word_count, user.max_word_count)
+                            jobs.append((user, news, PromptJob(AIModel.GPT, user.user_id, prompt, max_tokens=2000)))
                     
                     # Atualizar próxima execução
                     next_run = datetime.utcnow() + timedelta(hours=user.post_interval_hours)
@@ -283,27 +333,58 @@ class AutomationEngine:
                     
                 except Exception as e:
                     logger.error(f"Erro ao processar usuário {user.user_id}: {e}")
+            
+            # Chamadas ao provedor em paralelo (services/generation_engine.py)
+            GenerationEngine().run_prompts([job for _, _, job in jobs])
+            
+            for user, news, job in jobs:
+                try:
+                    if job.error:
+                        logger.error(f"Erro ao gerar artigo: {job.error}")
+                        continue
+                    article_content = self._parse_generated_article(job.response, news)
+                    
+                    # Inserir novo artigo
+                    session.execute(text("""
+                        INSERT INTO article 
+                        (title, content, status, user_id, wordpress_config_id, 
+                         created_at, is_automated, news_item_id, ai_model)
+                        VALUES (:title, :content, 'draft', :user_id, :wp_config_id, 
+                                :created_at, 1, :news_id, 'gpt')
+                    """), {
+                        "title": article_content['title'],
+                        "content": article_content['content'],
+                        "user_id": user.user_id,
+                        "wp_config_id": user.wordpress_config_id,
+                        "created_at": datetime.utcnow(),
+                        "news_id": news.id
+                    })
+                    
+                    # Marcar notícia como processada
+                    session.execute(text("""
+                        UPDATE news_item 
+                        SET is_processed = 1 
+                        WHERE id = :news_id
+                    """), {"news_id": news.id})
+                    mark_story_processed(session, news)
+                    
+                    logger.info(f"📝 Artigo gerado para usuário {user.user_id}")
+                    
+                except Exception as e:
+                    logger.error(f"Erro ao gerar artigo da notícia {news.id}: {e}")
                     
         except Exception as e:
             logger.error(f"Erro na geração de artigos temáticos: {e}")
             
-    def _generate_article_from_news(self, news, user_id: int, min_words: int, max_words: int) -> Optional[Dict]:
-        """Gera artigo usando IA a partir de uma notícia"""
-        try:
-            # Buscar chave de API do usuário
-            from services.ai_service import generate_content_gpt, get_api_key
-            from models import APIType
-            
-            api_key = get_api_key(user_id, APIType.GPT)
-            if not api_key:
-                return None
-            
-            # Criar prompt para geração
-            prompt = f"""
+    def _build_news_prompt(self, news, min_words: int, max_words: int) -> str:
+        """Prompt da geração de artigo a partir de uma notícia"""
+        # Texto completo do link ou, na falta dele, o conteúdo do feed (como NewsItem.full_content)
+        content = news.shared_content or news.feed_content or ""
+        return f"""
             Baseado na seguinte notícia, crie um artigo original e informativo:
             
             Título: {news.title}
-            Conteúdo: {news.content[:1000]}
+            Conteúdo: {content[:1000]}
             Link original: {news.link}
             
             Requisitos:
@@ -318,30 +399,26 @@ class AutomationEngine:
             {{"title": "título do artigo", "content": "conteúdo completo em HTML"}}
             """
             
-            response = generate_content_gpt(prompt, user_id, max_tokens=2000)
-            
-            # Tentar extrair JSON da resposta
-            import json
-            try:
-                # Encontrar JSON na resposta
-                start = response.find('{')
-                end = response.rfind('}') + 1
-                if start >= 0 and end > start:
-                    json_str = response[start:end]
-                    article_data = json.loads(json_str)
-                    return article_data
-            except:
-                pass
-            
-            # Fallback: criar estrutura básica
-            return {
-                "title": f"Análise: {news.title}",
-                "content": f"<p>{response}</p>"
-            }
-            
-        except Exception as e:
-            logger.error(f"Erro ao gerar artigo: {e}")
-            return None
+    def _parse_generated_article(self, response: str, news) -> Dict:
+        """Extrai título e conteúdo do JSON retornado pela IA"""
+        # Tentar extrair JSON da resposta
+        import json
+        try:
+            # Encontrar JSON na resposta
+            start = response.find('{')
+            end = response.rfind('}') + 1
+            if start >= 0 and end > start:
+                json_str = response[start:end]
+                article_data = json.loads(json_str)
+                return article_data
+        except:
+            pass
+        
+        # Fallback: criar estrutura básica
+        return {
+            "title": f"Análise: {news.title}",
+            "content": f"<p>{response}</p>"
+        }
             
     def _publish_article_to_wordpress(self, session, article_id: int) -> bool:
         """Publica um artigo no WordPress"""
@@ -461,6 +538,11 @@ class AutomationEngine:
             
             if result.rowcount > 0:
                 logger.info(f"🗑️ Removidas {result.rowcount} notícias antigas")
+            
+            # Remover textos compartilhados sem nenhuma notícia que os referencie
+            removed = delete_orphan_contents(session, older_than=cutoff_date)
+            if removed > 0:
+                logger.info(f"🗑️ Removidos {removed} textos de notícias sem referência")
                 
         except Exception as e:
             logger.error(f"Erro na limpeza de dados: {e}")
@@ -1,9 +1,11 @@
 import logging
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 from app import db
-from models import Article, ArticleStatus, SchedulerLog, LogType, AutomationSettings
+from models import Article, ArticleStatus, SchedulerLog, LogType, AutomationSettings, RSSFeed
+from services import extraction_cache
+from services.feed_health import circuit_state
 
 logger = logging.getLogger(__name__)
 
@@ -116,6 +118,55 @@ class AutomationMonitor:
                 'logs': []
             }
     
+    @staticmethod
+    def get_cache_stats() -> Optional[Dict[str, Any]]:
+        """
+        Obtém as estatísticas do cache de extração de páginas
+        
+        Returns:
+            Dicionário com acertos, falhas e ocupação do cache, ou None se desativado
+        """
+        try:
+            return extraction_cache.cache_stats()
+        except Exception as e:
+            logger.error(f"Erro ao obter estatísticas do cache de extração: {str(e)}")
+            return None
+    
+    @staticmethod
+    def get_feed_health(user_id: int) -> List[Dict[str, Any]]:
+        """
+        Obtém a saúde dos feeds RSS de um usuário, com os que mais falham primeiro
+        
+        Args:
+            user_id: ID do usuário
+            
+        Returns:
+            Lista de dicionários com estado do circuito, falhas seguidas, último
+            erro, último sucesso e tempo médio de download de cada feed
+        """
+        try:
+            feeds = RSSFeed.query.filter_by(user_id=user_id).order_by(
+                RSSFeed.consecutive_failures.desc(), RSSFeed.name
+            ).all()
+            now = datetime.utcnow()
+            return [
+                {
+                    'id': feed.id,
+                    'name': feed.name,
+                    'url': feed.url,
+                    'is_active': feed.is_active,
+                    'state': circuit_state(feed, now),
+                    'consecutive_failures': feed.consecutive_failures or 0,
+                    'last_error': feed.last_error,
+                    'last_success_at': feed.last_success_at,
+                    'avg_latency_ms': feed.avg_latency_ms,
+                    'circuit_open_until': feed.circuit_open_until
+                } for feed in feeds
+            ]
+        except Exception as e:
+            logger.error(f"Erro ao obter a saúde dos feeds: {str(e)}")
+            return []
+    
     @staticmethod
     def check_health() -> Dict[str, Any]:
         """
@@ -0,0 +1,75 @@
+"""
+Coluna de texto comprimido
+CompressedText guarda o texto em UTF-8 comprimido com zlib, precedido de um
+cabeçalho curto que identifica o formato. Textos curtos ou que não diminuem são
+gravados sem compressão e sem cabeçalho, o mesmo formato das linhas antigas, que
+continuam sendo lidas normalmente (inclusive quando o banco ainda as devolve
+como texto, antes da migração com compress_news_items.py)
+"""
+
+import zlib
+from sqlalchemy.types import TypeDecorator, LargeBinary
+
+# Cabeçalho dos valores comprimidos: NUL nunca inicia um texto vindo dos feeds
+COMPRESSED_HEADER = b'\x00Z\x01'
+
+# Abaixo disso a compressão não compensa o cabeçalho
+MIN_COMPRESS_BYTES = 64
+
+COMPRESSION_LEVEL = 6
+
+
+def compress_text(value):
+    """
+    Converte um texto no formato gravado na coluna
+
+    Args:
+        value: Texto (ou None)
+
+    Returns:
+        bytes: Cabeçalho + zlib, ou o UTF-8 puro quando a compressão não reduz o tamanho
+    """
+    if value is None:
+        return None
+    data = value.encode('utf-8')
+    if len(data) < MIN_COMPRESS_BYTES:
+        return data
+    compressed = COMPRESSED_HEADER + zlib.compress(data, COMPRESSION_LEVEL)
+    return compressed if len(compressed) < len(data) else data
+
+
+def decompress_text(value):
+    """
+    Converte o valor lido da coluna de volta em texto
+
+    Args:
+        value: bytes, memoryview ou str (linha ainda não migrada), ou None
+
+    Returns:
+        str: Texto original
+    """
+    if value is None or isinstance(value, str):
+        return value
+    value = bytes(value)
+    if value.startswith(COMPRESSED_HEADER):
+        value = zlib.decompress(value[len(COMPRESSED_HEADER):])
+    return value.decode('utf-8')
+
+
+def is_compressed(value):
+    """Indica se um valor bruto da coluna já está no formato comprimido"""
+    return isinstance(value, (bytes, memoryview)) and bytes(value[:len(COMPRESSED_HEADER)]) == COMPRESSED_HEADER
+
+
+class CompressedText(TypeDecorator):
+    """Texto gravado comprimido em uma coluna binária, lido e escrito como str"""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return compress_text(value)
+
+    def result_processor(self, dialect, coltype):
+        # Sem o processador do tipo binário: linhas não migradas chegam como str
+        return decompress_text
@@ -0,0 +1,252 @@
+"""
+Cache em disco das páginas baixadas para extração de conteúdo
+Guarda o HTML bruto e o texto extraído de cada página, indexados pelo hash da URL
+canônica (services/url_canonical.py), para que a mesma URL não seja baixada nem
+extraída de novo dentro da validade configurada. A página também é gravada sob a
+URL canônica que ela declara em <link rel="canonical">, de modo que a versão AMP
+e a versão normal da mesma notícia compartilham a entrada. O tamanho total é limitado: ao passar do limite, as
+entradas usadas há mais tempo são removidas primeiro. Os contadores de acertos
+e falhas do processo ficam disponíveis para a página de monitoramento
+"""
+
+import os
+import gzip
+import json
+import time
+import hashlib
+import logging
+import threading
+from config import Config
+from services.url_canonical import canonical_url, url_key, find_canonical_link
+
+logger = logging.getLogger(__name__)
+
+# Após uma limpeza o cache fica com esta fração do tamanho máximo
+EVICTION_TARGET = 0.9
+
+class ExtractionCache:
+    """
+    Cache de páginas em disco: um arquivo gzip por URL, com um cabeçalho JSON
+    (URL, título, texto extraído e data de gravação) seguido do HTML bruto.
+    A data de modificação do arquivo marca o último uso e orienta a remoção LRU.
+    """
+
+    def __init__(self, directory, ttl_seconds, max_bytes):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None
+        self.counters = {
+            'hits': 0, 'misses': 0, 'expired': 0, 'stores': 0, 'evictions': 0, 'canonical_hits': 0
+        }
+
+    def _path(self, url):
+        key = hashlib.sha256(url_key(url).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, key[:2], f'{key}.gz')
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def _entries(self):
+        """Lista (último uso, tamanho, caminho) de todas as entradas no disco"""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith('.gz'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _remove(self, path):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            if self._size is not None:
+                self._size -= size
+
+    def get(self, url):
+        """
+        Busca uma página no cache
+
+        Args:
+            url: URL da página
+
+        Returns:
+            dict: html (bytes), title e text, ou None se não houver entrada válida
+        """
+        path = self._path(url)
+        try:
+            with gzip.open(path, 'rb') as handle:
+                header = json.loads(handle.readline())
+                expired = time.time() - header['stored_at'] > self.ttl_seconds
+                html = None if expired else handle.read()
+        except FileNotFoundError:
+            self._count('misses')
+            return None
+        except Exception as e:
+            logger.warning(f"Entrada inválida no cache de extração para {url}: {str(e)}")
+            self._remove(path)
+            self._count('misses')
+            return None
+
+        if expired:
+            self._remove(path)
+            self._count('expired')
+            self._count('misses')
+            return None
+
+        try:
+            # Marcar o uso para a remoção das entradas menos usadas
+            os.utime(path)
+        except OSError:
+            pass
+        self._count('hits')
+        if header.get('alias_of') or url.strip() != canonical_url(url):
+            # Acerto que só aconteceu por causa da forma canônica da URL
+            self._count('canonical_hits')
+        return {'html': html, 'title': header.get('title'), 'text': header.get('text')}
+
+    def put(self, url, html, title=None, text=None):
+        """
+        Grava (ou substitui) a página e o resultado da extração no cache
+
+        Se a página declara uma URL canônica diferente, a entrada é gravada
+        também sob essa URL.
+
+        Args:
+            url: URL da página
+            html: HTML bruto baixado (bytes)
+            title: Título extraído (opcional)
+            text: Texto extraído (opcional)
+        """
+        self._write(url, html, {'url': canonical_url(url), 'title': title, 'text': text})
+
+        declared = find_canonical_link(html, canonical_url(url))
+        if declared and url_key(declared) != url_key(url):
+            # Página AMP ou com parâmetros próprios: disponível também pela URL declarada
+            self._write(declared, html, {
+                'url': declared, 'title': title, 'text': text, 'alias_of': canonical_url(url)
+            })
+
+    def _write(self, url, html, header):
+        """Grava uma entrada no disco e remove as menos usadas se passar do limite"""
+        path = self._path(url)
+        header['stored_at'] = time.time()
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            with gzip.open(temp_path, 'wb') as handle:
+                handle.write(json.dumps(header).encode('utf-8') + b'\n')
+                handle.write(html or b'')
+            # Substituição atômica: leitores nunca veem um arquivo pela metade
+            os.replace(temp_path, path)
+            size = os.path.getsize(path)
+        except OSError as e:
+            logger.warning(f"Não foi possível gravar {url} no cache de extração: {str(e)}")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return
+
+        self._count('stores')
+        with self._lock:
+            if self._size is None:
+                self._size = sum(entry[1] for entry in self._entries())
+            else:
+                self._size += size - previous
+            over_limit = self._size > self.max_bytes
+        if over_limit:
+            self._evict()
+
+    def _evict(self):
+        """Remove as entradas usadas há mais tempo até voltar abaixo do limite"""
+        entries = sorted(self._entries())
+        total = sum(entry[1] for entry in entries)
+        target = self.max_bytes * EVICTION_TARGET
+        removed = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        with self._lock:
+            self._size = total
+        self._count('evictions', removed)
+        if removed:
+            logger.info(f"Cache de extração: {removed} entradas removidas para respeitar o limite de tamanho")
+
+    def stats(self):
+        """Contadores do processo e ocupação atual do disco"""
+        entries = self._entries()
+        with self._lock:
+            counters = dict(self.counters)
+        lookups = counters['hits'] + counters['misses']
+        counters.update(
+            entries=len(entries),
+            size_mb=round(sum(entry[1] for entry in entries) / (1024 * 1024), 2),
+            max_size_mb=round(self.max_bytes / (1024 * 1024), 2),
+            hit_rate=round(counters['hits'] / lookups * 100, 1) if lookups else None
+        )
+        return counters
+
+
+_cache = None
+_init_lock = threading.Lock()
+
+
+def get_cache():
+    """Retorna o cache compartilhado do processo, ou None se estiver desativado"""
+    global _cache
+    if not Config.EXTRACTION_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _init_lock:
+            if _cache is None:
+                _cache = ExtractionCache(
+                    Config.EXTRACTION_CACHE_DIR,
+                    Config.EXTRACTION_CACHE_TTL_HOURS * 3600,
+                    Config.EXTRACTION_CACHE_MAX_MB * 1024 * 1024
+                )
+    return _cache
+
+
+def get(url):
+    """Busca uma página no cache compartilhado (None em caso de falha ou cache desativado)"""
+    cache = get_cache()
+    return cache.get(url) if cache else None
+
+
+def put(url, html, title=None, text=None):
+    """Grava uma página no cache compartilhado (ignorado se o cache estiver desativado)"""
+    cache = get_cache()
+    if cache:
+        cache.put(url, html, title, text)
+
+
+def cache_stats():
+    """
+    Estatísticas do cache para o monitoramento
+
+    Returns:
+        dict: Acertos (e quantos vieram da URL canônica), falhas, expiradas,
+              gravações e remoções deste processo,
+              entradas e tamanho em disco, ou None se o cache estiver desativado
+    """
+    cache = get_cache()
+    return cache.stats() if cache else None
@@ -0,0 +1,293 @@
+"""
+Worker de extração do texto completo das notícias
+A leitura dos feeds grava os itens com a extração pendente; esta etapa baixa
+cada link uma única vez e preenche o texto compartilhado (news_content) com
+concorrência, tentativas e timeouts próprios, sem segurar o processamento dos feeds
+"""
+
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from urllib.parse import urlparse
+from sqlalchemy import select, update
+from config import Config
+from services import http_client, extraction_cache
+from services.html_extraction import extract_html
+from services.html_converter import html_to_markdown
+from services.news_store import (
+    news_item_table, news_content_table, resolve_contents,
+    EXTRACTION_PENDING, EXTRACTION_DONE, EXTRACTION_FAILED, EXTRACTION_SKIPPED, CONTENT_MAX_LENGTH, LINK_MAX_LENGTH
+)
+
+logger = logging.getLogger(__name__)
+
+ERROR_MAX_LENGTH = 512
+
+
+def fetch_article_text(url, timeout=None):
+    """
+    Baixa uma página e extrai o texto principal (etapa de rede, sem acesso ao banco)
+
+    Páginas presentes no cache de extração não são baixadas de novo.
+
+    Args:
+        url: Link da notícia
+        timeout: Timeout da requisição em segundos (padrão: Config.EXTRACTION_TIMEOUT_SECONDS)
+
+    Returns:
+        tuple: (texto extraído ou string vazia, tempo gasto em segundos)
+    """
+    started = time.monotonic()
+    cached = extraction_cache.get(url)
+    if cached and cached['text'] is not None:
+        return cached['text'], time.monotonic() - started
+
+    if cached:
+        html = cached['html']
+    else:
+        response = http_client.fetch(url, timeout=timeout or Config.EXTRACTION_TIMEOUT_SECONDS)
+        response.raise_for_status()
+        html = response.content
+
+    _, text, _ = extract_html(html)
+    extraction_cache.put(url, html, cached['title'] if cached else None, text)
+    return text, time.monotonic() - started
+
+
+def _fallback_text(session, content_id):
+    """Converte o HTML vindo do próprio feed em texto quando a extração não dá resultado"""
+    row = session.execute(
+        select(news_item_table.c.content, news_item_table.c.description)
+        .where(news_item_table.c.news_content_id == content_id)
+        .limit(1)
+    ).first()
+    html = (row.content or row.description or "") if row else ""
+    if not html.strip():
+        return ""
+    return html_to_markdown(html).strip()
+
+
+def _record_result(session, row, text, error, max_attempts):
+    """
+    Grava o resultado de uma tentativa de extração e faz o commit
+
+    Erros de rede deixam o link pendente até esgotar as tentativas. Uma página
+    baixada sem texto aproveitável não é tentada de novo. Sem texto extraído,
+    o conteúdo do próprio feed é usado como fallback; o link só fica como
+    'failed' se nem isso existir. O estado final é copiado para todos os
+    NewsItem que referenciam o link.
+
+    Returns:
+        str: Estado final do link ('done', 'fallback', 'failed' ou 'retrying')
+    """
+    attempts = (row.extraction_attempts or 0) + 1
+    now = datetime.utcnow()
+    values = {'extraction_attempts': attempts, 'extraction_error': None}
+    outcome = EXTRACTION_DONE
+
+    if text:
+        values.update(content=text[:CONTENT_MAX_LENGTH], extraction_status=EXTRACTION_DONE, extracted_at=now)
+    elif error and attempts < max_attempts:
+        values.update(extraction_error=error[:ERROR_MAX_LENGTH])
+        outcome = 'retrying'
+    else:
+        fallback = _fallback_text(session, row.id)
+        values['extraction_error'] = (error or "Nenhum texto extraído da página")[:ERROR_MAX_LENGTH]
+        if fallback:
+            values.update(content=fallback[:CONTENT_MAX_LENGTH], extraction_status=EXTRACTION_DONE, extracted_at=now)
+            outcome = 'fallback'
+        else:
+            values.update(extraction_status=EXTRACTION_FAILED, extracted_at=now)
+            outcome = EXTRACTION_FAILED
+
+    session.execute(
+        update(news_content_table).where(news_content_table.c.id == row.id).values(**values)
+    )
+    if 'extraction_status' in values:
+        session.execute(
+            update(news_item_table)
+            .where(news_item_table.c.news_content_id == row.id)
+            .values(extraction_status=values['extraction_status'])
+        )
+    session.commit()
+    return outcome
+
+
+def _interleave_by_host(rows):
+    """
+    Alterna os itens entre hosts para que o limite por host da camada HTTP não
+    prenda todos os workers em um único site
+    """
+    by_host = {}
+    for row in rows:
+        by_host.setdefault(urlparse(row.link).hostname, []).append(row)
+    queues = list(by_host.values())
+    interleaved = []
+    while queues:
+        interleaved.extend(queue.pop(0) for queue in queues)
+        queues = [queue for queue in queues if queue]
+    return interleaved
+
+
+def _pending_query(limit, max_attempts, user_id=None, content_id=None):
+    table = news_content_table
+    query = select(table.c.id, table.c.link, table.c.extraction_attempts).where(
+        table.c.extraction_status == EXTRACTION_PENDING,
+        table.c.extraction_attempts < max_attempts
+    )
+    if user_id is not None:
+        query = query.where(table.c.id.in_(
+            select(news_item_table.c.news_content_id).where(news_item_table.c.user_id == user_id)
+        ))
+    if content_id is not None:
+        query = query.where(table.c.id == content_id)
+    return query.order_by(table.c.created_at.desc()).limit(limit)
+
+
+def process_pending_extractions(session, user_id=None, limit=None, max_workers=None,
+                                timeout=None, deadline_seconds=None, max_attempts=None):
+    """
+    Extrai o texto completo dos links de notícia pendentes
+
+    Cada link é baixado uma única vez, mesmo que vários assinantes tenham
+    recebido a notícia. Os downloads rodam em um pool limitado de threads, alternando entre hosts,
+    e passam pelos limites por host de services/http_client.py; as leituras e gravações
+    no banco acontecem apenas na thread que chamou a função, com um commit por
+    link para não manter transações abertas durante a rede. Links que não
+    terminarem dentro do prazo continuam pendentes para o próximo ciclo.
+
+    Args:
+        session: Sessão SQLAlchemy (db.session ou sessão do AutomationEngine)
+        user_id: ID do usuário para limitar aos links dos seus itens (opcional, padrão: todos)
+        limit: Máximo de links por ciclo (padrão: Config.EXTRACTION_BATCH_SIZE)
+        max_workers: Downloads simultâneos (padrão: Config.EXTRACTION_WORKERS)
+        timeout: Timeout de cada download (padrão: Config.EXTRACTION_TIMEOUT_SECONDS)
+        deadline_seconds: Prazo do ciclo (padrão: Config.EXTRACTION_CYCLE_DEADLINE_SECONDS)
+        max_attempts: Tentativas por link (padrão: Config.EXTRACTION_MAX_ATTEMPTS)
+
+    Returns:
+        dict: Estatísticas da extração
+    """
+    limit = limit or Config.EXTRACTION_BATCH_SIZE
+    max_workers = max_workers or Config.EXTRACTION_WORKERS
+    deadline_seconds = deadline_seconds or Config.EXTRACTION_CYCLE_DEADLINE_SECONDS
+    max_attempts = max_attempts or Config.EXTRACTION_MAX_ATTEMPTS
+
+    stats = {
+        'selected': 0,
+        'done': 0,
+        'fallback': 0,
+        'failed': 0,
+        'retrying': 0,
+        'timed_out': 0,
+        'elapsed_seconds': 0.0
+    }
+
+    rows = session.execute(_pending_query(limit, max_attempts, user_id=user_id)).fetchall()
+    # Encerrar a transação de leitura antes de ir para a rede
+    session.commit()
+    stats['selected'] = len(rows)
+
+    if not rows:
+        return stats
+
+    cycle_started = time.monotonic()
+    deadline = cycle_started + deadline_seconds
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='news-extract')
+    pending = {}
+    try:
+        for row in _interleave_by_host(rows):
+            pending[executor.submit(fetch_article_text, row.link, timeout)] = row
+
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                row = pending.pop(future)
+                text, error = "", None
+                try:
+                    text, _ = future.result()
+                except Exception as e:
+                    error = str(e)
+                    logger.warning(f"Erro ao extrair conteúdo de {row.link}: {error}")
+
+                try:
+                    stats[_record_result(session, row, text, error, max_attempts)] += 1
+                except Exception as e:
+                    session.rollback()
+                    logger.error(f"Erro ao gravar extração de {row.link}: {str(e)}")
+
+        # Links que estouraram o prazo continuam pendentes, sem consumir tentativa
+        for future in pending:
+            future.cancel()
+            stats['timed_out'] += 1
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    stats['elapsed_seconds'] = round(time.monotonic() - cycle_started, 3)
+    logger.info(
+        f"Extração concluída. {stats['done']} extraídos, {stats['fallback']} com conteúdo do feed, "
+        f"{stats['failed']} sem conteúdo, {stats['retrying']} para nova tentativa, "
+        f"{stats['timed_out']} fora do prazo em {stats['elapsed_seconds']}s"
+    )
+    return stats
+
+
+def _attach_skipped_item(session, news_item_id, link):
+    """Liga um item descartado pelo filtro de palavras-chave ao NewsContent do link (com commit)"""
+    content_id, status = resolve_contents(session, [link]).get(link[:LINK_MAX_LENGTH], (None, EXTRACTION_DONE))
+    session.execute(
+        update(news_item_table)
+        .where(news_item_table.c.id == news_item_id)
+        .values(news_content_id=content_id, extraction_status=status)
+    )
+    session.commit()
+    return content_id
+
+
+def extract_news_item(session, news_item_id, timeout=None):
+    """
+    Extrai imediatamente o texto de um item pendente (usado no processamento manual)
+
+    Um item descartado pelo filtro de palavras-chave é ligado agora ao
+    NewsContent do seu link, já que o usuário pediu o processamento.
+
+    Args:
+        session: Sessão SQLAlchemy
+        news_item_id: ID do NewsItem
+        timeout: Timeout do download (padrão: Config.EXTRACTION_TIMEOUT_SECONDS)
+
+    Returns:
+        str: Resultado ('done', 'fallback', 'failed', 'retrying') ou None se o item não estava pendente
+    """
+    item = session.execute(
+        select(news_item_table.c.news_content_id, news_item_table.c.link, news_item_table.c.extraction_status)
+        .where(news_item_table.c.id == news_item_id)
+    ).first()
+    if not item:
+        return None
+    content_id = item.news_content_id
+    if item.extraction_status == EXTRACTION_SKIPPED:
+        content_id = _attach_skipped_item(session, news_item_id, item.link)
+    row = None
+    if content_id is not None:
+        row = session.execute(
+            _pending_query(1, Config.EXTRACTION_MAX_ATTEMPTS, content_id=content_id)
+        ).first()
+    if not row:
+        return None
+
+    text, error = "", None
+    try:
+        text, _ = fetch_article_text(row.link, timeout)
+    except Exception as e:
+        error = str(e)
+        logger.warning(f"Erro ao extrair conteúdo de {row.link}: {error}")
+
+    # Extração manual: não deixar o item pendente para o próximo ciclo
+    return _record_result(session, row, text, error, max_attempts=1)
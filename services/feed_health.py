@@ -0,0 +1,165 @@
+"""
+Saúde dos feeds RSS e circuit breaker
+Cada busca registra no RSSFeed o resultado: falhas seguidas, último erro, último
+sucesso e a média móvel do tempo de download. Depois de
+Config.FEED_CIRCUIT_FAILURE_THRESHOLD falhas seguidas o circuito abre e o feed
+deixa de ser baixado até RSSFeed.circuit_open_until; passado esse horário o
+circuito fica meio aberto e a próxima busca serve de teste. Cada nova falha dobra
+a suspensão, até Config.FEED_CIRCUIT_MAX_MINUTES, e um sucesso fecha o circuito
+"""
+
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import table, column, update, DateTime, Integer, String
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Estados do circuito de um feed
+CIRCUIT_CLOSED = "closed"        # Feed saudável, buscado normalmente
+CIRCUIT_OPEN = "open"            # Falhas seguidas, buscas suspensas
+CIRCUIT_HALF_OPEN = "half_open"  # Suspensão terminou, a próxima busca é um teste
+
+# Peso da busca mais recente na média do tempo de download
+LATENCY_SMOOTHING = 0.3
+
+ERROR_MAX_LENGTH = 512
+
+# Colunas de saúde de rss_feed (usada também pelo AutomationEngine)
+rss_feed_health_table = table(
+    'rss_feed',
+    column('id', Integer),
+    column('consecutive_failures', Integer),
+    column('last_error', String),
+    column('last_success_at', DateTime),
+    column('avg_latency_ms', Integer),
+    column('circuit_open_until', DateTime),
+)
+
+
+def circuit_state(feed, now=None):
+    """
+    Estado do circuito de um feed
+
+    Args:
+        feed: Objeto RSSFeed ou linha com os mesmos atributos
+        now: Horário de referência (padrão: agora)
+
+    Returns:
+        str: CIRCUIT_CLOSED, CIRCUIT_OPEN ou CIRCUIT_HALF_OPEN
+    """
+    if (feed.consecutive_failures or 0) < Config.FEED_CIRCUIT_FAILURE_THRESHOLD:
+        return CIRCUIT_CLOSED
+    now = now or datetime.utcnow()
+    if feed.circuit_open_until and feed.circuit_open_until > now:
+        return CIRCUIT_OPEN
+    return CIRCUIT_HALF_OPEN
+
+
+def fetch_allowed(feeds, now=None):
+    """
+    Indica se a URL compartilhada por estas assinaturas deve ser baixada
+
+    Basta uma assinatura com o circuito fechado ou meio aberto: o resultado do
+    download vale para todas.
+
+    Args:
+        feeds: Objetos RSSFeed ou linhas da mesma URL
+
+    Returns:
+        bool: True se o download deve acontecer
+    """
+    now = now or datetime.utcnow()
+    return any(circuit_state(feed, now) != CIRCUIT_OPEN for feed in feeds)
+
+
+def health_after_success(feed, latency_seconds=None, now=None):
+    """
+    Calcula o estado de saúde de um feed após uma busca bem-sucedida
+
+    Args:
+        feed: Objeto RSSFeed ou linha com os mesmos atributos
+        latency_seconds: Tempo do download em segundos (opcional)
+        now: Horário da busca (padrão: agora)
+
+    Returns:
+        dict: Valores das colunas de saúde do RSSFeed
+    """
+    if circuit_state(feed, now) != CIRCUIT_CLOSED:
+        logger.info(f"Feed {feed.url} voltou a responder, circuito fechado")
+
+    average = feed.avg_latency_ms
+    if latency_seconds is not None:
+        latency_ms = latency_seconds * 1000
+        average = latency_ms if average is None else average + LATENCY_SMOOTHING * (latency_ms - average)
+        average = int(round(average))
+
+    return {
+        'consecutive_failures': 0,
+        'last_error': feed.last_error,
+        'last_success_at': now or datetime.utcnow(),
+        'avg_latency_ms': average,
+        'circuit_open_until': None
+    }
+
+
+def health_after_failure(feed, error, now=None):
+    """
+    Calcula o estado de saúde de um feed após uma busca com erro
+
+    Ao atingir Config.FEED_CIRCUIT_FAILURE_THRESHOLD falhas seguidas o circuito
+    abre por Config.FEED_CIRCUIT_BASE_MINUTES, dobrando a cada nova falha.
+
+    Args:
+        feed: Objeto RSSFeed ou linha com os mesmos atributos
+        error: Mensagem de erro
+        now: Horário da busca (padrão: agora)
+
+    Returns:
+        dict: Valores das colunas de saúde do RSSFeed
+    """
+    now = now or datetime.utcnow()
+    failures = (feed.consecutive_failures or 0) + 1
+    open_until = None
+    excess = failures - Config.FEED_CIRCUIT_FAILURE_THRESHOLD
+    if excess >= 0:
+        # Limitar o expoente para não estourar o cálculo em feeds mortos há muito tempo
+        minutes = min(Config.FEED_CIRCUIT_BASE_MINUTES * 2 ** min(excess, 20), Config.FEED_CIRCUIT_MAX_MINUTES)
+        open_until = now + timedelta(minutes=minutes)
+        logger.warning(f"Feed {feed.url} com {failures} falhas seguidas, buscas suspensas por {minutes} minutos")
+
+    return {
+        'consecutive_failures': failures,
+        'last_error': str(error)[:ERROR_MAX_LENGTH],
+        'last_success_at': feed.last_success_at,
+        'avg_latency_ms': feed.avg_latency_ms,
+        'circuit_open_until': open_until
+    }
+
+
+def apply_health(feed, health):
+    """
+    Copia o estado de saúde calculado para um objeto RSSFeed (sem commit)
+
+    Args:
+        feed: Objeto RSSFeed do banco de dados
+        health: Dicionário retornado por health_after_success ou health_after_failure
+    """
+    for name, value in health.items():
+        setattr(feed, name, value)
+
+
+def save_health(session, feed_id, health):
+    """
+    Grava o estado de saúde de um feed sem depender do ORM (sem commit)
+
+    Args:
+        session: Sessão SQLAlchemy (sessão do AutomationEngine)
+        feed_id: ID do RSSFeed
+        health: Dicionário retornado por health_after_success ou health_after_failure
+    """
+    session.execute(
+        update(rss_feed_health_table)
+        .where(rss_feed_health_table.c.id == feed_id)
+        .values(**health)
+    )
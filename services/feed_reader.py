@@ -0,0 +1,485 @@
+"""
+Leitura de feeds RSS com GET condicional
+Este módulo centraliza o download dos feeds para que todos os caminhos de ingestão
+reaproveitem os validadores HTTP (ETag / Last-Modified) e o hash do conteúdo
+"""
+
+import re
+import html
+import hashlib
+import logging
+import itertools
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from xml.etree import ElementTree
+import feedparser
+from config import Config
+from services import http_client
+from services.news_store import GUID_MAX_LENGTH
+from services.url_canonical import canonical_url
+
+logger = logging.getLogger(__name__)
+
+# Resultado de uma busca de feed
+FEED_MODIFIED = "modified"          # Conteúdo novo, feed processado
+FEED_NOT_MODIFIED = "not_modified"  # Servidor respondeu 304
+FEED_UNCHANGED = "unchanged"        # Corpo idêntico ao da última busca (hash)
+
+FEED_ACCEPT_HEADER = "application/rss+xml, application/atom+xml, application/xml;q=0.9, text/xml;q=0.9, */*;q=0.8"
+
+# <link rel="hub"> e <link rel="self"> do canal (Atom ou atom:link no RSS), para o WebSub
+WEBSUB_DISCOVERY_BYTES = 64 * 1024
+_LINK_TAG_RE = re.compile(rb'<(?:[\w-]+:)?link\b[^>]*>', re.IGNORECASE)
+_ATTRIBUTE_RE = re.compile(rb'([\w:-]+)\s*=\s*("[^"]*"|\'[^\']*\')')
+
+
+def content_hash(body):
+    """Calcula o hash SHA-256 do corpo de um feed"""
+    return hashlib.sha256(body).hexdigest()
+
+
+def fetch_feed(url, etag=None, last_modified=None, previous_hash=None, timeout=None, stop_before=None):
+    """
+    Busca um feed enviando os validadores da última resposta
+
+    Um 304 ou um corpo com o mesmo hash da busca anterior não é parseado.
+    Feeds pequenos passam pelo feedparser; acima de
+    Config.RSS_STREAM_THRESHOLD_BYTES o XML é lido em streaming, entrada por
+    entrada, sem guardar o documento em memória. Nos dois casos a leitura para
+    em Config.RSS_MAX_FEED_ENTRIES entradas, em Config.RSS_MAX_FEED_BYTES bytes
+    ou na primeira entrada publicada antes de stop_before.
+
+    No streaming o hash é atualizado a cada bloco lido e só é conhecido no fim
+    da leitura: cobre todos os bytes até o ponto de parada, então um hash igual
+    ao anterior significa as mesmas entradas e o resultado volta sem elas.
+
+    Args:
+        url: URL do feed
+        etag: ETag recebido na última busca (opcional)
+        last_modified: Cabeçalho Last-Modified recebido na última busca (opcional)
+        previous_hash: Hash SHA-256 do último corpo processado (opcional)
+        timeout: Timeout da requisição em segundos (padrão: Config.RSS_FEED_TIMEOUT_SECONDS)
+        stop_before: Data a partir da qual as entradas já foram vistas (ver stop_before_for)
+
+    Returns:
+        dict: status (FEED_MODIFIED, FEED_NOT_MODIFIED ou FEED_UNCHANGED), entries
+              (itens normalizados por entry_to_item), total_entries, truncated,
+              bozo, bozo_exception, os validadores a serem salvos no RSSFeed e o
+              hub WebSub anunciado (websub_hub e websub_topic, ou None)
+    """
+    headers = {
+        'User-Agent': feedparser.USER_AGENT,
+        'Accept': FEED_ACCEPT_HEADER
+    }
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+
+    with http_client.stream(url, headers=headers, timeout=timeout or Config.RSS_FEED_TIMEOUT_SECONDS) as response:
+        websub_hub, websub_topic = find_websub_links(b'', response.links)
+        result = {
+            'status': FEED_MODIFIED,
+            'entries': [],
+            'total_entries': 0,
+            'truncated': False,
+            'bozo': False,
+            'bozo_exception': None,
+            # Validadores exatamente como enviados (None se a resposta não tiver)
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'content_hash': previous_hash,
+            'websub_hub': websub_hub,
+            'websub_topic': websub_topic
+        }
+
+        if response.status_code == 304:
+            # Os validadores enviados continuam valendo; o 304 pode omiti-los
+            result['etag'] = result['etag'] or etag
+            result['last_modified'] = result['last_modified'] or last_modified
+            result['status'] = FEED_NOT_MODIFIED
+            return result
+
+        response.raise_for_status()
+
+        chunks = http_client.iter_body(response)
+        head, complete = _read_head(chunks, Config.RSS_STREAM_THRESHOLD_BYTES)
+        result['websub_hub'], result['websub_topic'] = find_websub_links(head, response.links)
+
+        if complete:
+            result['content_hash'] = content_hash(head)
+            if previous_hash and result['content_hash'] == previous_hash:
+                # Servidor sem suporte a validadores, mas o conteúdo não mudou
+                result['status'] = FEED_UNCHANGED
+                return result
+            items, result['bozo'], result['bozo_exception'] = parse_feed_body(
+                head, response.url, response.headers.get('Content-Type', '')
+            )
+            _collect_items(items, stop_before, result)
+            return result
+
+        digest = hashlib.sha256(head)
+        items = _iter_stream_items(head, _hashed_chunks(chunks, digest), result)
+        _collect_items(items, stop_before, result)
+        result['content_hash'] = digest.hexdigest()
+        if previous_hash and result['content_hash'] == previous_hash:
+            result['status'] = FEED_UNCHANGED
+            result['entries'], result['total_entries'], result['truncated'] = [], 0, False
+    return result
+
+
+def parse_feed_body(body, url='', content_type=''):
+    """
+    Faz o parse com o feedparser de um corpo de feed já recebido por completo
+
+    Args:
+        body: Corpo do feed (bytes)
+        url: URL de origem, para resolver links relativos
+        content_type: Cabeçalho Content-Type recebido
+
+    Returns:
+        tuple: (gerador de itens normalizados por entry_to_item, bozo, bozo_exception)
+    """
+    parsed = feedparser.parse(body, response_headers={
+        'content-location': url,
+        'content-type': content_type
+    })
+    items = (entry_to_item(entry) for entry in parsed.entries)
+    return items, bool(parsed.bozo), parsed.get('bozo_exception')
+
+
+def find_websub_links(head, link_headers=None):
+    """
+    Hub WebSub e URL do tópico anunciados por um feed
+
+    Os cabeçalhos Link têm prioridade sobre os <link> do documento.
+
+    Args:
+        head: Início do corpo do feed (bytes)
+        link_headers: Cabeçalhos Link já interpretados (response.links do requests)
+
+    Returns:
+        tuple: (URL do hub ou None, URL do tópico - rel="self" - ou None)
+    """
+    links = {}
+    for rel in ('hub', 'self'):
+        if link_headers and link_headers.get(rel, {}).get('url'):
+            links[rel] = link_headers[rel]['url'].strip()
+
+    for tag in _LINK_TAG_RE.findall(head[:WEBSUB_DISCOVERY_BYTES]):
+        attributes = {name.lower(): value[1:-1] for name, value in _ATTRIBUTE_RE.findall(tag)}
+        href = html.unescape(attributes.get(b'href', b'').decode('utf-8', errors='ignore')).strip()
+        for rel in attributes.get(b'rel', b'').decode('ascii', errors='ignore').lower().split():
+            if rel in ('hub', 'self') and href and rel not in links:
+                links[rel] = href
+    return links.get('hub'), links.get('self')
+
+
+def _read_head(chunks, limit):
+    """Lê blocos até passar de limit bytes; retorna (bytes lidos, corpo terminou)"""
+    head = bytearray()
+    for chunk in chunks:
+        head += chunk
+        if len(head) > limit:
+            return bytes(head), False
+    return bytes(head), True
+
+
+def _hashed_chunks(chunks, digest):
+    """Repassa os blocos do corpo atualizando o hash com cada um"""
+    for chunk in chunks:
+        digest.update(chunk)
+        yield chunk
+
+
+def _collect_items(items, stop_before, result):
+    """Guarda em result os itens até o limite de entradas ou a primeira entrada já vista"""
+    for item in items:
+        if stop_before and item['published_date'] and item['published_date'] < stop_before:
+            break
+        if len(result['entries']) >= Config.RSS_MAX_FEED_ENTRIES:
+            result['truncated'] = True
+            break
+        result['entries'].append(item)
+    result['total_entries'] = len(result['entries'])
+
+
+def stop_before_for(feeds):
+    """
+    Data em que a leitura de um feed compartilhado por estas assinaturas pode parar
+
+    É a marca d'água (ou, sem ela, a última busca) mais antiga entre as
+    assinaturas, para que nenhuma perca entradas. None quando alguma assinatura
+    pede leitura completa ou ainda não tem referência.
+
+    Args:
+        feeds: Objetos RSSFeed ou linhas com os mesmos atributos
+
+    Returns:
+        datetime: Data de corte (UTC, sem fuso) ou None
+    """
+    if Config.RSS_FORCE_FULL_SCAN:
+        return None
+    dates = []
+    for feed in feeds:
+        reference = feed.watermark_published_at or feed.last_fetch
+        if feed.full_scan or not reference:
+            return None
+        dates.append(reference)
+    return min(dates) if dates else None
+
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1] if isinstance(tag, str) else ''
+
+
+def _element_text(element):
+    return ''.join(element.itertext()).strip()
+
+
+def _parse_date(value):
+    """Converte uma data RFC 822 ou ISO 8601 em datetime UTC sem fuso"""
+    if not value:
+        return None
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        try:
+            date = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if date.tzinfo is not None:
+        date = date.astimezone(timezone.utc).replace(tzinfo=None)
+    return date
+
+
+def _stream_element_to_item(element):
+    """Normaliza um <item> RSS ou <entry> Atom lido em streaming, como entry_to_item"""
+    fields = {}
+    link = None
+    for child in element:
+        name = _local_name(child.tag)
+        if name == 'link':
+            href = child.get('href')
+            if href is None:
+                link = link or (child.text or '').strip()
+            elif child.get('rel', 'alternate') == 'alternate' and not link:
+                link = href.strip()
+        elif name not in fields:
+            fields[name] = _element_text(child)
+
+    published_date = None
+    for name in ('pubDate', 'published', 'date', 'issued'):
+        published_date = _parse_date(fields.get(name))
+        if published_date:
+            break
+
+    description = fields.get('description') or fields.get('summary') or ''
+    content = fields.get('encoded') or fields.get('content') or description
+    original_link = link or ''
+    link = canonical_url(original_link)
+    return {
+        'title': fields.get('title') or 'Sem título',
+        'description': description,
+        'content': content,
+        'link': link,
+        'original_link': original_link,
+        'guid': fields.get('guid') or fields.get('id') or link,
+        'published_date': published_date
+    }
+
+
+def _iter_stream_items(head, chunks, result):
+    """
+    Percorre o XML em streaming e gera um item normalizado por entrada
+
+    Cada entrada é descartada da árvore depois de normalizada, então a memória
+    não cresce com o tamanho do feed. A leitura para em Config.RSS_MAX_FEED_BYTES;
+    um erro de XML encerra a leitura com os itens já lidos e marca bozo.
+    """
+    parser = ElementTree.XMLPullParser(events=('start', 'end'))
+    stack = []
+    received = 0
+    # O início já lido entra em blocos do mesmo tamanho dos da rede
+    head_chunks = (head[start:start + http_client.CHUNK_SIZE] for start in range(0, len(head), http_client.CHUNK_SIZE))
+    for chunk in itertools.chain(head_chunks, chunks):
+        received += len(chunk)
+        try:
+            parser.feed(chunk)
+            for event, element in parser.read_events():
+                if event == 'start':
+                    stack.append(element)
+                    continue
+                stack.pop()
+                if _local_name(element.tag) in ('item', 'entry'):
+                    item = _stream_element_to_item(element)
+                    element.clear()
+                    if stack:
+                        stack[-1].remove(element)
+                    yield item
+        except ElementTree.ParseError as e:
+            result['bozo'] = True
+            result['bozo_exception'] = e
+            return
+        if received >= Config.RSS_MAX_FEED_BYTES:
+            result['truncated'] = True
+            logger.warning(f"Feed com mais de {Config.RSS_MAX_FEED_BYTES} bytes, leitura interrompida")
+            return
+
+
+def apply_fetch_state(feed, result):
+    """
+    Copia os validadores de uma busca para um objeto RSSFeed (sem commit)
+
+    Args:
+        feed: Objeto RSSFeed do banco de dados
+        result: Dicionário retornado por fetch_feed
+    """
+    feed.etag = result['etag']
+    feed.last_modified = result['last_modified']
+    feed.content_hash = result['content_hash']
+    if result.get('websub_hub'):
+        # Hub anunciado pelo feed: a assinatura é feita por services/websub.py
+        feed.websub_hub = result['websub_hub'][:512]
+        feed.websub_topic = (result.get('websub_topic') or feed.url)[:512]
+
+
+def group_feeds_by_url(feeds):
+    """
+    Agrupa as assinaturas de feed (de qualquer usuário) pela URL
+
+    Args:
+        feeds: Objetos RSSFeed ou linhas com os mesmos atributos
+
+    Returns:
+        dict: URL -> lista de assinaturas, na ordem recebida
+    """
+    groups = {}
+    for feed in feeds:
+        groups.setdefault(feed.url.strip(), []).append(feed)
+    return groups
+
+
+def shared_validators(feeds):
+    """
+    Validadores HTTP comuns a todas as assinaturas de uma URL
+
+    Como o resultado de um download é aplicado a todas as assinaturas, elas
+    passam a ter os mesmos validadores. Enquanto divergirem (por exemplo, uma
+    assinatura nova), o feed é baixado sem validadores.
+
+    Returns:
+        tuple: (etag, last_modified, content_hash) para fetch_feed
+    """
+    first = feeds[0]
+    validators = (first.etag, first.last_modified, first.content_hash)
+    for feed in feeds[1:]:
+        if (feed.etag, feed.last_modified, feed.content_hash) != validators:
+            return None, None, None
+    return validators
+
+
+def entry_to_item(entry):
+    """
+    Normaliza uma entrada do feedparser no formato usado na gravação de NewsItem
+
+    Args:
+        entry: Entrada do feedparser
+
+    Returns:
+        dict: title, description, content, link (canônico), original_link, guid
+              (id da entrada ou o link canônico) e published_date (UTC, sem fuso)
+    """
+    published_date = None
+    if entry.get('published_parsed'):
+        try:
+            published_date = datetime(*entry.published_parsed[:6])
+        except (TypeError, ValueError):
+            pass
+
+    description = entry.get('summary') or entry.get('description') or ''
+    content = description
+    if entry.get('content'):
+        content = entry.content[0].get('value', '') or description
+
+    original_link = entry.get('link', '')
+    link = canonical_url(original_link)
+    return {
+        'title': entry.get('title', 'Sem título'),
+        'description': description,
+        'content': content,
+        'link': link,
+        'original_link': original_link,
+        'guid': entry.get('id') or link,
+        'published_date': published_date
+    }
+
+
+def _guid_key(guid):
+    # Mesmo limite de tamanho da coluna NewsItem.guid
+    return (guid or '')[:GUID_MAX_LENGTH]
+
+
+def scan_new_entries(entries, watermark_published=None, watermark_guid=None, full_scan=False):
+    """
+    Seleciona as entradas do feed até alcançar a marca d'água do feed
+
+    A maioria dos feeds lista as entradas da mais nova para a mais antiga, então
+    a leitura para na primeira entrada já vista: a do GUID da marca d'água ou uma
+    publicada antes da data da marca. Entradas com a mesma data da marca (mas
+    outro GUID) continuam sendo lidas e são filtradas pela verificação de GUID.
+    Feeds fora de ordem cronológica devem usar full_scan.
+
+    Args:
+        entries: Itens normalizados (fetch_feed()['entries'])
+        watermark_published: Data da entrada mais nova já salva (RSSFeed.watermark_published_at)
+        watermark_guid: GUID dessa entrada (RSSFeed.watermark_guid)
+        full_scan: Ler todas as entradas, sem parar na marca d'água (RSSFeed.full_scan;
+                   Config.RSS_FORCE_FULL_SCAN força para todos os feeds)
+
+    Returns:
+        tuple: (itens novos, nova marca d'água como dict
+               com 'published_at' e 'guid', ou None se nada mudou)
+    """
+    full_scan = full_scan or Config.RSS_FORCE_FULL_SCAN
+    watermark_guid = _guid_key(watermark_guid) if watermark_guid else None
+    items = []
+    for item in entries:
+        if not full_scan:
+            if watermark_guid and _guid_key(item['guid']) == watermark_guid:
+                break
+            if watermark_published and item['published_date'] and item['published_date'] < watermark_published:
+                break
+        items.append(item)
+
+    return items, _advance_watermark(items, watermark_published, watermark_guid)
+
+
+def _advance_watermark(items, watermark_published, watermark_guid):
+    """Retorna a nova marca d'água a partir dos itens lidos, ou None se ela não avançou"""
+    dated = [item for item in items if item['published_date'] and item['guid']]
+    if dated:
+        newest = max(dated, key=lambda item: item['published_date'])
+        if watermark_published and newest['published_date'] <= watermark_published:
+            return None
+        return {'published_at': newest['published_date'], 'guid': _guid_key(newest['guid'])}
+
+    # Feed sem datas: a entrada do topo serve de marca
+    if items and items[0]['guid'] and not watermark_published:
+        guid = _guid_key(items[0]['guid'])
+        if guid != watermark_guid:
+            return {'published_at': None, 'guid': guid}
+    return None
+
+
+def apply_watermark(feed, watermark):
+    """
+    Copia a nova marca d'água para um objeto RSSFeed (sem commit)
+
+    Args:
+        feed: Objeto RSSFeed do banco de dados
+        watermark: Dicionário retornado por scan_new_entries (None não altera nada)
+    """
+    if watermark:
+        feed.watermark_published_at = watermark['published_at']
+        feed.watermark_guid = watermark['guid']
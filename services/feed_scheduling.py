@@ -0,0 +1,103 @@
+"""
+Intervalo adaptativo de busca dos feeds RSS
+O intervalo de cada feed é calculado a partir do histórico de publicação dos seus
+itens (NewsItem.published_date), dentro dos limites configurados, e o próximo
+horário de busca fica salvo em RSSFeed.next_poll_at (coluna indexada). Feeds com
+assinatura WebSub ativa recebem as novidades por push e só são buscados de vez em
+quando, como segurança
+"""
+
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import table, column, select, DateTime, Integer
+from config import Config
+from services.news_store import news_item_table
+
+logger = logging.getLogger(__name__)
+
+# Fim da assinatura WebSub do feed, se houver
+rss_feed_websub_table = table(
+    'rss_feed',
+    column('id', Integer),
+    column('websub_lease_expires_at', DateTime),
+)
+
+
+def compute_poll_interval(published_dates, now=None):
+    """
+    Calcula o intervalo de busca a partir das datas de publicação recentes
+
+    O intervalo acompanha o espaço médio entre publicações; se o feed está
+    parado há mais tempo que isso, o tempo sem publicar passa a valer, de modo
+    que feeds inativos recuam até o limite máximo.
+
+    Args:
+        published_dates: Datas de publicação recentes (UTC, sem fuso)
+        now: Horário de referência (padrão: agora)
+
+    Returns:
+        timedelta: Intervalo até a próxima busca, entre os limites mínimo e máximo
+    """
+    now = now or datetime.utcnow()
+    minimum = timedelta(minutes=Config.FEED_POLL_MIN_MINUTES)
+    maximum = timedelta(minutes=Config.FEED_POLL_MAX_MINUTES)
+
+    dates = sorted((date for date in published_dates if date and date <= now), reverse=True)
+    if len(dates) < 2:
+        # Sem histórico suficiente para estimar a frequência
+        return maximum
+
+    average_gap = (dates[0] - dates[-1]) / (len(dates) - 1)
+    idle = now - dates[0]
+    interval = max(average_gap, idle) * Config.FEED_POLL_GAP_FACTOR
+    return min(max(interval, minimum), maximum)
+
+
+def compute_next_poll(session, feed_id, now=None):
+    """
+    Calcula o próximo horário de busca de um feed com base nos itens salvos
+
+    Args:
+        session: Sessão SQLAlchemy (db.session ou sessão do AutomationEngine)
+        feed_id: ID do RSSFeed
+        now: Horário da busca atual (padrão: agora)
+
+    Returns:
+        dict: next_poll_at (datetime) e poll_interval_minutes (int)
+    """
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=Config.FEED_POLL_HISTORY_DAYS)
+    rows = session.execute(
+        select(news_item_table.c.published_date)
+        .where(
+            news_item_table.c.rss_feed_id == feed_id,
+            news_item_table.c.published_date >= cutoff
+        )
+        .order_by(news_item_table.c.published_date.desc())
+        .limit(Config.FEED_POLL_HISTORY_ITEMS)
+    )
+    interval = compute_poll_interval([row[0] for row in rows], now)
+
+    lease_expires_at = session.execute(
+        select(rss_feed_websub_table.c.websub_lease_expires_at)
+        .where(rss_feed_websub_table.c.id == feed_id)
+    ).scalar()
+    if Config.WEBSUB_ENABLED and lease_expires_at and lease_expires_at > now:
+        # Novidades chegam por push: a busca é só uma verificação de segurança
+        interval = max(interval, timedelta(minutes=Config.WEBSUB_FALLBACK_POLL_MINUTES))
+    return {
+        'next_poll_at': now + interval,
+        'poll_interval_minutes': int(interval.total_seconds() // 60)
+    }
+
+
+def apply_poll_schedule(feed, schedule):
+    """
+    Copia o agendamento calculado para um objeto RSSFeed (sem commit)
+
+    Args:
+        feed: Objeto RSSFeed do banco de dados
+        schedule: Dicionário retornado por compute_next_poll
+    """
+    feed.next_poll_at = schedule['next_poll_at']
+    feed.poll_interval_minutes = schedule['poll_interval_minutes']
@@ -0,0 +1,360 @@
+"""
+Geração dos artigos agendados pelas Batch APIs dos provedores
+Artigos agendados com antecedência (schedule_automation em modo "batch") não
+precisam de resposta imediata: os prompts pendentes são enviados juntos à
+Message Batches API da Anthropic ou à Batch API da OpenAI, que processam o lote
+em até 24 horas com custo menor, e o daemon consulta os lotes até o fim. Cada
+resposta volta para o seu Article (custom_id) pelo mesmo caminho de gravação da
+geração direta. Artigos com publicação próxima demais, ou sem resultado no lote,
+são gerados na hora por services/generation_engine.py
+"""
+
+import json
+import logging
+from datetime import datetime, timedelta
+from openai.types.chat import ChatCompletion
+from app import db
+from services import ai_service
+from config import Config
+from models import (
+    Article, ArticleStatus, ArticleLog, LogType, AIModel, APIType, AutomationTheme, NewsItem, GenerationBatch
+)
+from services.api_key_cache import get_api_key
+from services.generation_engine import GenerationJob, generate_articles
+from services.llm_clients import get_client
+
+logger = logging.getLogger(__name__)
+
+# Article.generation_status
+GENERATION_QUEUED = "queued"        # Aguardando envio em um lote
+GENERATION_SUBMITTED = "submitted"  # Enviado, aguardando o fim do lote
+GENERATION_FAILED = "failed"        # Sem conteúdo gerado (ver ArticleLog)
+
+# GenerationBatch.status
+BATCH_SUBMITTING = "submitting"  # Artigos reservados, envio ao provedor em andamento
+BATCH_SUBMITTED = "submitted"
+BATCH_ENDED = "ended"
+BATCH_FAILED = "failed"
+
+# Rota da OpenAI usada por cada linha do arquivo do lote
+OPENAI_BATCH_ENDPOINT = "/v1/chat/completions"
+OPENAI_FINAL_STATUSES = {'completed', 'failed', 'expired', 'cancelled'}
+
+
+def _custom_id(article_id):
+    return f"article-{article_id}"
+
+
+def _provider(ai_model):
+    return APIType.CLAUDE if ai_model == AIModel.CLAUDE else APIType.GPT
+
+
+def _job_for(article):
+    """GenerationJob que preenche o artigo agendado (None se o tema ou a notícia não existe mais)"""
+    theme = news_item = None
+    if article.news_item_id:
+        news_item = NewsItem.query.get(article.news_item_id)
+    elif article.theme_id:
+        theme = AutomationTheme.query.get(article.theme_id)
+    if theme is None and news_item is None:
+        return None
+    return GenerationJob(
+        article.ai_model or AIModel.GPT, article.user_id, article.wordpress_config_id,
+        theme=theme, news_item=news_item, existing_article_id=article.id
+    )
+
+
+def _finish(article, job, error=None):
+    """Libera o artigo para publicação ou o marca como falho (sem commit)"""
+    if job is not None and job.article is not None:
+        article.status = ArticleStatus.SCHEDULED
+        article.generation_status = None
+        return True
+    article.generation_status = GENERATION_FAILED
+    db.session.add(ArticleLog(
+        message=f"Erro ao gerar conteúdo do artigo agendado: {error or (job.error if job else 'origem removida')}",
+        log_type=LogType.ERROR,
+        article_id=article.id
+    ))
+    return False
+
+
+def _generate_now(pairs):
+    """Gera diretamente (em paralelo) os artigos de pares (artigo, job)"""
+    generate_articles([job for _, job in pairs if job is not None])
+    generated = sum(1 for article, job in pairs if _finish(article, job))
+    db.session.commit()
+    return generated
+
+
+def _openai_body(request):
+    """Corpo HTTP de uma linha do lote: os campos de extra_body vão junto dos demais, como o SDK faz"""
+    body = dict(request)
+    body.update(body.pop('extra_body', None) or {})
+    return body
+
+
+def _submit(user_id, provider, articles):
+    """Envia um lote de artigos do mesmo usuário e provedor; retorna o GenerationBatch criado ou None"""
+    # A ausência da chave pode estar em cache de antes de o usuário gravá-la (outro processo):
+    # só falha depois de confirmar no banco
+    api_key = get_api_key(user_id, provider) or get_api_key(user_id, provider, refresh=True)
+    if not api_key:
+        # Sem a chave o artigo nunca seria gerado: falha registrada em vez de ficar na fila
+        logger.warning(f"Usuário {user_id} sem chave {provider.value}; {len(articles)} artigos marcados como falhos")
+        for article in articles:
+            _finish(article, None, error=f"Chave de API {provider.value} não encontrada")
+        db.session.commit()
+        return None
+
+    pairs = []
+    for article in articles:
+        job = _job_for(article)
+        if job is None:
+            _finish(article, None)
+        else:
+            pairs.append((article, job))
+    if not pairs:
+        db.session.commit()
+        return None
+
+    # Os artigos ficam reservados pelo lote antes da chamada ao provedor: se a gravação
+    # depois dela falhar, eles não voltam para a fila nem são enviados (e cobrados) de novo
+    record = GenerationBatch(
+        provider=provider.value,
+        status=BATCH_SUBMITTING,
+        request_count=len(pairs),
+        user_id=user_id
+    )
+    db.session.add(record)
+    db.session.flush()
+    for article, _ in pairs:
+        article.generation_status = GENERATION_SUBMITTED
+        article.generation_batch_id = record.id
+    db.session.commit()
+
+    try:
+        batch, input_file_id = _create_provider_batch(provider, api_key, pairs)
+    except Exception as e:
+        # Nada foi criado no provedor: os artigos voltam para a fila
+        db.session.rollback()
+        record.status, record.error, record.completed_at = BATCH_FAILED, str(e)[:512], datetime.utcnow()
+        for article, _ in pairs:
+            article.generation_status = GENERATION_QUEUED
+            article.generation_batch_id = None
+        db.session.commit()
+        raise
+
+    # Gravação própria, logo após a chamada: só o ID do lote no provedor
+    record.provider_batch_id = batch.id
+    record.input_file_id = input_file_id
+    record.status = BATCH_SUBMITTED
+    try:
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        logger.error(
+            f"Lote {provider.value} {batch.id} criado no provedor, mas não gravado no GenerationBatch {record.id}; "
+            f"os {len(pairs)} artigos continuam reservados por ele"
+        )
+        raise
+
+    logger.info(f"Lote {provider.value} {batch.id} enviado com {len(pairs)} artigos do usuário {user_id}")
+    return record
+
+
+def _create_provider_batch(provider, api_key, pairs):
+    """Cria o lote no provedor; retorna (lote do SDK, ID do arquivo de entrada ou None)"""
+    client = get_client(provider, api_key)
+    input_file_id = None
+    if provider == APIType.CLAUDE:
+        batch = client.messages.batches.create(requests=[
+            {'custom_id': _custom_id(article.id), 'params': job.request()} for article, job in pairs
+        ])
+    else:
+        lines = [
+            json.dumps({
+                'custom_id': _custom_id(article.id),
+                'method': 'POST',
+                'url': OPENAI_BATCH_ENDPOINT,
+                'body': _openai_body(job.request())
+            }, ensure_ascii=False)
+            for article, job in pairs
+        ]
+        input_file = client.files.create(
+            file=('generation_batch.jsonl', '\n'.join(lines).encode('utf-8')),
+            purpose='batch'
+        )
+        input_file_id = input_file.id
+        batch = client.batches.create(
+            input_file_id=input_file_id,
+            endpoint=OPENAI_BATCH_ENDPOINT,
+            completion_window='24h'
+        )
+    return batch, input_file_id
+
+
+def submit_queued_articles():
+    """
+    Envia os artigos na fila em lotes por usuário e provedor
+
+    Os agendados para antes de Config.GENERATION_BATCH_MIN_LEAD_MINUTES são
+    gerados na hora, pois o lote pode levar horas para terminar.
+
+    Returns:
+        dict: Estatísticas (generated_now, batches, submitted)
+    """
+    stats = {'generated_now': 0, 'batches': 0, 'submitted': 0}
+    queued = Article.query.filter_by(generation_status=GENERATION_QUEUED).order_by(Article.scheduled_date).all()
+    if not queued:
+        return stats
+
+    deadline = datetime.utcnow() + timedelta(minutes=Config.GENERATION_BATCH_MIN_LEAD_MINUTES)
+    urgent = [article for article in queued if not article.scheduled_date or article.scheduled_date < deadline]
+    if urgent:
+        stats['generated_now'] = _generate_now([(article, _job_for(article)) for article in urgent])
+
+    groups = {}
+    for article in queued:
+        if article.generation_status == GENERATION_QUEUED and article not in urgent:
+            groups.setdefault((article.user_id, _provider(article.ai_model)), []).append(article)
+
+    for (user_id, provider), articles in groups.items():
+        for start in range(0, len(articles), Config.GENERATION_BATCH_MAX_REQUESTS):
+            chunk = articles[start:start + Config.GENERATION_BATCH_MAX_REQUESTS]
+            try:
+                record = _submit(user_id, provider, chunk)
+            except Exception as e:
+                # Falha antes da criação no provedor: os artigos voltaram para a fila e são
+                # reenviados no próximo ciclo. Depois dela, continuam reservados pelo lote
+                db.session.rollback()
+                logger.error(f"Erro ao enviar lote {provider.value} do usuário {user_id}: {str(e)}")
+                continue
+            if record:
+                stats['batches'] += 1
+                stats['submitted'] += record.request_count
+    return stats
+
+
+def _claude_results(client, batch_id):
+    """(texto, uso) por custom_id, ou None se o lote ainda está em processamento"""
+    batch = client.messages.batches.retrieve(batch_id)
+    if batch.processing_status != 'ended':
+        return None
+    results = {}
+    for entry in client.messages.batches.results(batch_id):
+        if entry.result.type == 'succeeded':
+            message = entry.result.message
+            results[entry.custom_id] = (message.content[0].text, ai_service.prompt_usage(message.usage))
+    return results
+
+
+def _openai_results(client, batch_id):
+    """(texto, uso) por custom_id, ou None se o lote ainda está em processamento"""
+    batch = client.batches.retrieve(batch_id)
+    if batch.status not in OPENAI_FINAL_STATUSES:
+        return None
+    results = {}
+    if batch.output_file_id:
+        for line in client.files.content(batch.output_file_id).text.splitlines():
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            response = row.get('response') or {}
+            if response.get('status_code') == 200:
+                completion = ChatCompletion.model_validate(response['body'])
+                results[row['custom_id']] = (
+                    completion.choices[0].message.content, ai_service.prompt_usage(completion.usage)
+                )
+    return results
+
+
+def poll_batches():
+    """
+    Consulta os lotes enviados e grava os resultados dos que terminaram
+
+    Artigos sem resultado (erro, expiração ou cancelamento no provedor) são
+    gerados na hora.
+
+    Returns:
+        dict: Estatísticas (pending, completed, succeeded, generated_now, failed)
+    """
+    stats = {'pending': 0, 'completed': 0, 'succeeded': 0, 'generated_now': 0, 'failed': 0}
+    now = datetime.utcnow()
+
+    for batch in GenerationBatch.query.filter_by(status=BATCH_SUBMITTED).order_by(GenerationBatch.id).all():
+        provider = APIType(batch.provider)
+        articles = Article.query.filter_by(generation_batch_id=batch.id, generation_status=GENERATION_SUBMITTED).all()
+        api_key = get_api_key(batch.user_id, provider)
+        if not api_key:
+            # Sem a chave não há como buscar o resultado: os artigos voltam para a fila
+            batch.status, batch.error, batch.completed_at = BATCH_FAILED, "Chave de API removida", now
+            for article in articles:
+                article.generation_status = GENERATION_QUEUED
+            db.session.commit()
+            continue
+
+        try:
+            client = get_client(provider, api_key)
+            if provider == APIType.CLAUDE:
+                results = _claude_results(client, batch.provider_batch_id)
+            else:
+                results = _openai_results(client, batch.provider_batch_id)
+        except Exception as e:
+            logger.error(f"Erro ao consultar o lote {batch.provider_batch_id}: {str(e)}")
+            batch.last_polled_at, batch.error = now, str(e)[:512]
+            db.session.commit()
+            continue
+
+        batch.last_polled_at = now
+        if results is None:
+            stats['pending'] += 1
+            db.session.commit()
+            continue
+
+        missing = []
+        for article in articles:
+            job = _job_for(article)
+            text, usage = results.get(_custom_id(article.id), (None, None))
+            if job is None or not text:
+                missing.append((article, job))
+                continue
+            job.response, job.usage = text, usage
+            try:
+                job.save()
+            except Exception as e:
+                db.session.rollback()
+                job.error = f"Erro ao gravar artigo: {str(e)}"
+            if _finish(article, job):
+                batch.succeeded_count += 1
+            else:
+                stats['failed'] += 1
+
+        if missing:
+            generated = _generate_now(missing)
+            stats['generated_now'] += generated
+            stats['failed'] += len(missing) - generated
+        batch.failed_count = len(missing)
+        batch.status, batch.completed_at = BATCH_ENDED, now
+        db.session.commit()
+
+        stats['completed'] += 1
+        stats['succeeded'] += batch.succeeded_count
+        logger.info(
+            f"Lote {batch.provider} {batch.provider_batch_id} concluído: {batch.succeeded_count} artigos do lote, "
+            f"{len(missing)} gerados diretamente"
+        )
+    return stats
+
+
+def process_generation_batches():
+    """
+    Ciclo do daemon: grava os lotes concluídos e envia os artigos na fila
+
+    Returns:
+        dict: Estatísticas de poll_batches e submit_queued_articles
+    """
+    stats = {'poll': poll_batches(), 'submit': submit_queued_articles()}
+    if stats['poll']['completed'] or stats['submit']['batches'] or stats['submit']['generated_now']:
+        logger.info(f"Geração em lote: {stats}")
+    return stats
@@ -0,0 +1,205 @@
+"""
+Geração de artigos em lote, com as chamadas aos provedores em paralelo
+Cada artigo espera de 20 a 60 segundos pela resposta do provedor; em vez de
+gerar um por vez, o lote dispara as chamadas juntas em um event loop asyncio
+(clientes assíncronos dos SDKs) e limita quantas ficam abertas ao mesmo tempo
+por provedor e por chave de API. Os prompts e a gravação (Article e ArticleLog)
+são os mesmos da geração individual em services/ai_service.py; a gravação
+acontece na thread que chamou o lote, à medida que cada resposta chega
+"""
+
+import time
+import asyncio
+import logging
+from app import db
+from config import Config
+from models import AIModel, APIType
+from services import ai_service
+from services.api_key_cache import get_api_key
+from services.llm_clients import create_async_client
+
+logger = logging.getLogger(__name__)
+
+
+def _provider(ai_model):
+    return APIType.CLAUDE if ai_model == AIModel.CLAUDE else APIType.GPT
+
+
+class PromptJob:
+    """Um prompt a enviar ao provedor do modelo, com a chave do usuário"""
+
+    def __init__(self, ai_model, user_id, prompt, max_tokens=None, system=None):
+        self.ai_model = ai_model
+        self.user_id = user_id
+        self.prompt = prompt
+        self.max_tokens = max_tokens
+        self.system = system  # Instruções fixas, em cache no provedor (opcional)
+        self.response = None  # Texto gerado
+        self.error = None     # Mensagem de erro, se a chamada falhou
+        self.usage = None     # Tokens de entrada e lidos do cache (ai_service.prompt_usage)
+        self.elapsed_seconds = None
+
+    @property
+    def provider(self):
+        return _provider(self.ai_model)
+
+    def request(self):
+        """Argumentos da chamada ao SDK (os mesmos de ai_service.generate_content_*)"""
+        if self.provider == APIType.CLAUDE:
+            return ai_service.claude_request(self.prompt, self.max_tokens or ai_service.CLAUDE_MAX_TOKENS, self.system)
+        return ai_service.gpt_request(self.prompt, self.max_tokens or ai_service.GPT_MAX_TOKENS, self.system)
+
+
+class GenerationJob(PromptJob):
+    """
+    Um artigo a gerar a partir de um tema ou de uma notícia
+
+    Depois do lote, article tem o Article gravado ou error tem o motivo da falha.
+    """
+
+    def __init__(self, ai_model, user_id, wp_config_id=None, theme=None, news_item=None, existing_article_id=None):
+        if (theme is None) == (news_item is None):
+            raise ValueError("Informe um tema ou uma notícia")
+        if theme is not None:
+            prompt, _ = ai_service.build_theme_prompt(theme)
+            system = ai_service.THEME_ARTICLE_INSTRUCTIONS
+        else:
+            prompt = ai_service.build_news_prompt(news_item)
+            system = ai_service.NEWS_ARTICLE_INSTRUCTIONS
+        super().__init__(ai_model, user_id, prompt, system=system)
+        self.wp_config_id = wp_config_id
+        self.theme = theme
+        self.news_item = news_item
+        self.existing_article_id = existing_article_id
+        self.article = None
+
+    def save(self):
+        """Grava o artigo gerado pelo mesmo caminho da geração individual (com commit)"""
+        usage = dict(self.usage, elapsed_seconds=self.elapsed_seconds) if self.usage else None
+        if self.theme is not None:
+            self.article = ai_service.save_theme_article(
+                self.theme, self.ai_model, self.user_id, self.wp_config_id,
+                self.response, self.existing_article_id, usage
+            )
+        else:
+            self.article = ai_service.save_news_article(
+                self.news_item, self.ai_model, self.user_id, self.wp_config_id,
+                self.response, self.existing_article_id, usage
+            )
+        return self.article
+
+
+class GenerationEngine:
+    """
+    Executa lotes de PromptJob/GenerationJob com chamadas simultâneas limitadas
+
+    Args:
+        provider_limits: Chamadas simultâneas por provedor (padrão: Config.GENERATION_CONCURRENCY_CLAUDE/GPT)
+        per_key_limit: Chamadas simultâneas por chave de API (padrão: Config.GENERATION_CONCURRENCY_PER_KEY)
+    """
+
+    def __init__(self, provider_limits=None, per_key_limit=None):
+        self.provider_limits = provider_limits or {
+            APIType.CLAUDE: Config.GENERATION_CONCURRENCY_CLAUDE,
+            APIType.GPT: Config.GENERATION_CONCURRENCY_GPT,
+        }
+        self.per_key_limit = per_key_limit or Config.GENERATION_CONCURRENCY_PER_KEY
+
+    async def _complete(self, job, api_key, clients, provider_slots, key_slots):
+        provider = job.provider
+        # Vaga da chave antes da do provedor: quem espera pela própria chave não ocupa a vaga do provedor
+        async with key_slots.setdefault((provider, api_key), asyncio.Semaphore(self.per_key_limit)):
+            async with provider_slots[provider]:
+                client = clients.get((provider, api_key))
+                if client is None:
+                    client = clients[(provider, api_key)] = create_async_client(provider, api_key)
+                started = time.monotonic()
+                try:
+                    if provider == APIType.CLAUDE:
+                        response = await client.messages.create(**job.request())
+                        text = response.content[0].text
+                    else:
+                        response = await client.chat.completions.create(**job.request())
+                        text = response.choices[0].message.content
+                    job.usage = ai_service.prompt_usage(response.usage)
+                    return text
+                finally:
+                    job.elapsed_seconds = round(time.monotonic() - started, 3)
+
+    async def _run(self, jobs, on_done):
+        provider_slots = {provider: asyncio.Semaphore(limit) for provider, limit in self.provider_limits.items()}
+        key_slots = {}
+        clients = {}
+
+        async def run_job(job):
+            # Chave lida aqui, na thread do loop (a mesma que chamou o lote), do cache de chaves
+            api_key = get_api_key(job.user_id, job.provider)
+            if not api_key:
+                job.error = f"Chave de API {job.provider.value} não encontrada"
+                return job
+            try:
+                job.response = await self._complete(job, api_key, clients, provider_slots, key_slots)
+            except Exception as e:
+                job.error = f"Erro ao gerar conteúdo com {job.provider.value}: {str(e)}"
+            return job
+
+        try:
+            for finished in asyncio.as_completed([run_job(job) for job in jobs]):
+                job = await finished
+                if on_done:
+                    on_done(job)
+        finally:
+            for client in clients.values():
+                await client.close()
+
+    def run_prompts(self, jobs, on_done=None):
+        """
+        Envia os prompts em paralelo e espera todas as respostas
+
+        Args:
+            jobs: Lista de PromptJob
+            on_done: Função chamada com cada job assim que ele termina (opcional,
+                     na thread que chamou run_prompts)
+
+        Returns:
+            list: Os mesmos jobs, com response ou error preenchido
+        """
+        if not jobs:
+            return jobs
+        started = time.monotonic()
+        asyncio.run(self._run(jobs, on_done))
+        failed = sum(1 for job in jobs if job.error)
+        input_tokens = sum(job.usage['input_tokens'] or 0 for job in jobs if job.usage)
+        cached_tokens = sum(job.usage['cached_input_tokens'] or 0 for job in jobs if job.usage)
+        logger.info(
+            f"Geração em lote: {len(jobs) - failed} de {len(jobs)} respostas em "
+            f"{time.monotonic() - started:.1f}s ({cached_tokens} de {input_tokens} tokens de entrada do cache de prompt)"
+        )
+        return jobs
+
+    def generate_articles(self, jobs):
+        """
+        Gera os artigos em paralelo e grava cada um assim que a resposta chega
+
+        Args:
+            jobs: Lista de GenerationJob
+
+        Returns:
+            list: Os mesmos jobs, com article ou error preenchido
+        """
+        def save(job):
+            # Erros ficam em job.error para quem montou o lote registrar com o contexto
+            if job.error:
+                return
+            try:
+                job.save()
+            except Exception as e:
+                db.session.rollback()
+                job.error = f"Erro ao gravar artigo: {str(e)}"
+
+        return self.run_prompts(jobs, on_done=save)
+
+
+def generate_articles(jobs):
+    """Atalho para GenerationEngine().generate_articles com os limites da configuração"""
+    return GenerationEngine().generate_articles(jobs)
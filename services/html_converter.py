@@ -0,0 +1,72 @@
+"""
+Conversão de HTML para Markdown com html2text
+Uma instância de HTML2Text guarda o estado do documento em andamento e não pode
+ser compartilhada entre threads. Aqui cada thread recebe o seu conversor, criado
+uma única vez com as opções padrão do projeto e restaurado ao estado inicial
+antes de cada documento, para que um HTML malformado não contamine o próximo
+"""
+
+import logging
+import threading
+from html2text import HTML2Text
+
+logger = logging.getLogger(__name__)
+
+# Opções padrão do projeto: manter links, imagens e tabelas
+STANDARD_OPTIONS = {
+    'ignore_links': False,
+    'ignore_images': False,
+    'ignore_tables': False,
+}
+
+
+class _ThreadConverter:
+    """Conversor de uma thread com a fotografia do seu estado inicial"""
+
+    def __init__(self):
+        self.converter = HTML2Text()
+        for name, value in STANDARD_OPTIONS.items():
+            setattr(self.converter, name, value)
+        self._initial_state = dict(self.converter.__dict__)
+
+    def handle(self, html):
+        # Restaurar o estado de um conversor recém-criado (parser e pilhas do documento)
+        state = self.converter.__dict__
+        state.clear()
+        state.update({
+            name: value.copy() if isinstance(value, (list, dict, set)) else value
+            for name, value in self._initial_state.items()
+        })
+        return self.converter.handle(html)
+
+
+_local = threading.local()
+
+
+def _thread_converter():
+    converter = getattr(_local, 'converter', None)
+    if converter is None:
+        converter = _local.converter = _ThreadConverter()
+    return converter
+
+
+def html_to_markdown(html):
+    """
+    Converte HTML em Markdown com as opções padrão do projeto
+
+    Pode ser chamada de várias threads ao mesmo tempo: cada thread usa o seu
+    próprio conversor, reaproveitado entre documentos.
+
+    Args:
+        html: Conteúdo HTML
+
+    Returns:
+        str: Texto em Markdown
+    """
+    converter = _thread_converter()
+    try:
+        return converter.handle(html or '')
+    except Exception:
+        # Descartar o conversor para não reaproveitar um estado inconsistente
+        _local.converter = None
+        raise
@@ -0,0 +1,177 @@
+"""
+Extração de título e texto de páginas HTML em um pool de processos
+O parse do HTML (BeautifulSoup, trafilatura e html2text) usa CPU e segura o GIL,
+então as threads de download entregam o HTML bruto a processos separados e
+recebem de volta o título e o texto limpo. Cada tarefa tem um tempo máximo:
+dentro do processo um alarme interrompe a extração e, se mesmo assim o processo
+não responder, o pool é recriado para que uma página patológica não prenda os workers
+"""
+
+import signal
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import trafilatura
+from config import Config
+from services.html_converter import html_to_markdown
+
+logger = logging.getLogger(__name__)
+
+# Tempo extra que o processo principal espera além do alarme do processo filho
+TIMEOUT_GRACE_SECONDS = 5
+
+# O alarme se repete caso alguma biblioteca engula a exceção do primeiro disparo
+ALARM_REPEAT_SECONDS = 0.5
+
+
+class ExtractionTimeout(Exception):
+    """A extração de uma página não terminou dentro do tempo permitido"""
+
+
+def _page_title(soup):
+    title_tag = soup.find('title')
+    return (title_tag.text.strip() if title_tag else None), title_tag
+
+
+def extract_page(html, title=False, fallback=False):
+    """
+    Extrai o título e o texto principal de uma página (roda dentro do processo do pool)
+
+    Args:
+        html: HTML bruto (bytes ou str)
+        title: Extrair também o título da tag <title>
+        fallback: Se o trafilatura não achar texto, converter o HTML ao redor do
+                  título com html2text
+
+    Returns:
+        tuple: (título ou None, texto extraído ou string vazia, texto de fallback ou None)
+    """
+    page_title, title_tag = None, None
+    if title or fallback:
+        try:
+            from bs4 import BeautifulSoup
+            page_title, title_tag = _page_title(BeautifulSoup(html, 'html.parser'))
+        except ExtractionTimeout:
+            raise
+        except Exception:
+            # Se não conseguir extrair com BeautifulSoup, continuar sem título
+            pass
+
+    text = trafilatura.extract(html) or ""
+
+    fallback_text = None
+    if fallback and not text and title_tag is not None and title_tag.parent is not None:
+        try:
+            fallback_text = html_to_markdown(str(title_tag.parent))
+        except ExtractionTimeout:
+            raise
+        except Exception as e:
+            logger.error(f"Erro ao extrair conteúdo bruto: {str(e)}")
+
+    return page_title, text, fallback_text
+
+
+def _alarm_handler(signum, frame):
+    raise ExtractionTimeout("Extração excedeu o tempo limite")
+
+
+def _run_task(html, title, fallback, timeout):
+    """Executa extract_page no processo do pool com um alarme como limite de tempo"""
+    use_alarm = hasattr(signal, 'setitimer')
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _alarm_handler)
+        signal.setitimer(signal.ITIMER_REAL, timeout, ALARM_REPEAT_SECONDS)
+    try:
+        return extract_page(html, title, fallback)
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _mp_context():
+    """
+    Os processos vêm de um forkserver onde houver: o pool é criado (e recriado
+    após uma tarefa travada) a partir das threads de download, e um fork de um
+    processo com threads pode herdar locks presos e travar o filho. O forkserver
+    é um processo novo, sem threads, que já carrega este módulo (trafilatura e
+    afins) uma vez e cria cada worker por fork a partir de si. Os workers importam
+    de novo o módulo principal; o agendador não inicia neles (init_scheduler).
+    Nos demais sistemas fica o método padrão da plataforma (spawn).
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context()
+
+
+def _get_executor():
+    """Retorna o pool de processos do processo atual, criando-o na primeira chamada"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(
+                    max_workers=Config.EXTRACTION_PROCESS_WORKERS,
+                    mp_context=_mp_context()
+                )
+                logger.info(f"Pool de extração iniciado com {Config.EXTRACTION_PROCESS_WORKERS} processos")
+    return _executor
+
+
+def _restart_executor(broken):
+    """Encerra os processos de um pool travado ou quebrado e libera a criação de um novo"""
+    global _executor
+    with _executor_lock:
+        if _executor is not broken:
+            # Outra thread já recriou o pool
+            return
+        _executor = None
+    for process in list((getattr(broken, '_processes', None) or {}).values()):
+        try:
+            process.terminate()
+        except Exception:
+            pass
+    broken.shutdown(wait=False, cancel_futures=True)
+    logger.warning("Pool de extração reiniciado após uma tarefa travada")
+
+
+def extract_html(html, title=False, fallback=False, timeout=None):
+    """
+    Extrai título e texto de uma página no pool de processos e aguarda o resultado
+
+    Pode ser chamada de várias threads ao mesmo tempo; com
+    Config.EXTRACTION_PROCESS_WORKERS = 0 a extração roda no próprio processo.
+
+    Args:
+        html: HTML bruto baixado (bytes)
+        title: Extrair também o título
+        fallback: Calcular o texto de fallback quando não houver texto principal
+        timeout: Tempo máximo da tarefa em segundos (padrão: Config.EXTRACTION_TASK_TIMEOUT_SECONDS)
+
+    Returns:
+        tuple: (título, texto, texto de fallback), como extract_page
+
+    Raises:
+        ExtractionTimeout: A tarefa não terminou dentro do tempo
+    """
+    timeout = timeout or Config.EXTRACTION_TASK_TIMEOUT_SECONDS
+    if Config.EXTRACTION_PROCESS_WORKERS <= 0:
+        return extract_page(html, title, fallback)
+
+    executor = _get_executor()
+    try:
+        future = executor.submit(_run_task, html, title, fallback, timeout)
+        return future.result(timeout=timeout + TIMEOUT_GRACE_SECONDS)
+    except FutureTimeoutError:
+        _restart_executor(executor)
+        raise ExtractionTimeout("Extração excedeu o tempo limite")
+    except BrokenProcessPool:
+        _restart_executor(executor)
+        raise
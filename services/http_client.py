@@ -0,0 +1,225 @@
+"""
+Camada compartilhada de download de conteúdo da web
+Todos os subsistemas que baixam páginas, feeds ou imagens de terceiros passam por
+aqui: conexões keep-alive reaproveitadas por host, limite de requisições
+simultâneas e intervalo mínimo entre requisições ao mesmo host, e limites
+rígidos de tamanho e de tempo de resposta
+"""
+
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+
+class ResponseTooLarge(requests.RequestException):
+    """Resposta maior que o limite configurado"""
+
+
+class ResponseTimeout(requests.Timeout):
+    """Resposta não terminou dentro do tempo total permitido"""
+
+
+class _HostState:
+    def __init__(self, max_concurrency):
+        self.semaphore = threading.BoundedSemaphore(max_concurrency)
+        self.next_start = 0.0
+
+
+class HostPoliteness:
+    """
+    Controla o acesso a cada host: no máximo max_concurrency requisições
+    simultâneas e pelo menos min_interval segundos entre o início de duas
+    requisições ao mesmo host
+    """
+
+    def __init__(self, max_concurrency, min_interval):
+        self.max_concurrency = max_concurrency
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def _state(self, host):
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None:
+                state = self._hosts[host] = _HostState(self.max_concurrency)
+            return state
+
+    @contextmanager
+    def slot(self, host):
+        """Aguarda uma vaga e a vez do host antes de liberar a requisição"""
+        state = self._state(host)
+        state.semaphore.acquire()
+        try:
+            with self._lock:
+                now = time.monotonic()
+                start = max(now, state.next_start)
+                state.next_start = start + self.min_interval
+            if start > now:
+                time.sleep(start - now)
+            yield
+        finally:
+            state.semaphore.release()
+
+
+_session = None
+_politeness = None
+_init_lock = threading.Lock()
+
+
+def _get_session():
+    """Retorna a sessão HTTP compartilhada, criando-a na primeira chamada"""
+    global _session, _politeness
+    if _session is None:
+        with _init_lock:
+            if _session is None:
+                session = requests.Session()
+                # Um pool de conexões keep-alive por host, do tamanho do limite por host
+                adapter = HTTPAdapter(
+                    pool_connections=Config.HTTP_POOL_HOSTS,
+                    pool_maxsize=Config.HTTP_PER_HOST_CONCURRENCY,
+                    max_retries=0
+                )
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers['User-Agent'] = Config.HTTP_USER_AGENT
+                _politeness = HostPoliteness(
+                    Config.HTTP_PER_HOST_CONCURRENCY,
+                    Config.HTTP_HOST_MIN_INTERVAL_SECONDS
+                )
+                _session = session
+    return _session
+
+
+def iter_body(response):
+    """
+    Lê o corpo de uma resposta aberta por stream() em blocos, respeitando o prazo total
+
+    Args:
+        response: Resposta retornada por stream()
+
+    Yields:
+        bytes: Blocos do corpo (já descomprimidos)
+
+    Raises:
+        ResponseTimeout: O prazo da resposta terminou antes do fim do corpo
+    """
+    for chunk in response.iter_content(CHUNK_SIZE):
+        if time.monotonic() > response.deadline:
+            raise ResponseTimeout(f"Resposta de {response.url} excedeu o tempo limite")
+        yield chunk
+
+
+def _read_limited(response, max_bytes, url):
+    """Lê o corpo da resposta em blocos respeitando o tamanho e o prazo"""
+    content_length = response.headers.get('Content-Length')
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise ResponseTooLarge(f"Resposta de {url} excede {max_bytes} bytes ({content_length})")
+
+    chunks = []
+    received = 0
+    for chunk in iter_body(response):
+        received += len(chunk)
+        if received > max_bytes:
+            raise ResponseTooLarge(f"Resposta de {url} excede {max_bytes} bytes")
+        chunks.append(chunk)
+    return b''.join(chunks)
+
+
+@contextmanager
+def stream(url, headers=None, timeout=None):
+    """
+    Abre um GET sem carregar o corpo, para quem precisa processá-lo aos poucos
+
+    A vaga do host fica ocupada até o bloco with terminar; o corpo deve ser lido
+    com iter_body(), que aplica o prazo total. Não há limite de tamanho: quem lê
+    decide quando parar.
+
+    Args:
+        url: URL a baixar
+        headers: Cabeçalhos adicionais (opcional)
+        timeout: Tempo total máximo em segundos (padrão: Config.HTTP_MAX_RESPONSE_SECONDS)
+
+    Yields:
+        requests.Response: Resposta com o corpo ainda não lido
+    """
+    timeout = timeout or Config.HTTP_MAX_RESPONSE_SECONDS
+    session = _get_session()
+    host = (urlparse(url).hostname or '').lower()
+
+    with _politeness.slot(host):
+        deadline = time.monotonic() + timeout
+        response = session.get(url, headers=headers, timeout=timeout, stream=True)
+        response.deadline = deadline
+        try:
+            yield response
+        finally:
+            response.close()
+
+
+def fetch(url, headers=None, timeout=None, max_bytes=None):
+    """
+    Faz um GET respeitando os limites por host, de tamanho e de tempo
+
+    O corpo é lido por completo dentro da vaga do host, então a resposta
+    retornada pode ser usada normalmente (status_code, headers, content, text).
+
+    Args:
+        url: URL a baixar
+        headers: Cabeçalhos adicionais (opcional)
+        timeout: Tempo total máximo em segundos (padrão: Config.HTTP_MAX_RESPONSE_SECONDS)
+        max_bytes: Tamanho máximo do corpo (padrão: Config.HTTP_MAX_RESPONSE_BYTES)
+
+    Returns:
+        requests.Response: Resposta com o corpo já carregado
+
+    Raises:
+        ResponseTooLarge: Corpo maior que max_bytes
+        ResponseTimeout: Download não terminou dentro de timeout
+        requests.RequestException: Demais erros de rede
+    """
+    max_bytes = max_bytes or Config.HTTP_MAX_RESPONSE_BYTES
+
+    with stream(url, headers=headers, timeout=timeout) as response:
+        # Corpo carregado aqui para que a conexão volte ao pool do host
+        response._content = _read_limited(response, max_bytes, url)
+    return response
+
+
+def post(url, data=None, headers=None, timeout=None, max_bytes=None):
+    """
+    Faz um POST de formulário respeitando os limites por host, de tamanho e de tempo
+
+    Args:
+        url: URL de destino
+        data: Campos do formulário
+        headers: Cabeçalhos adicionais (opcional)
+        timeout: Tempo total máximo em segundos (padrão: Config.HTTP_MAX_RESPONSE_SECONDS)
+        max_bytes: Tamanho máximo do corpo da resposta (padrão: Config.HTTP_MAX_RESPONSE_BYTES)
+
+    Returns:
+        requests.Response: Resposta com o corpo já carregado
+    """
+    timeout = timeout or Config.HTTP_MAX_RESPONSE_SECONDS
+    max_bytes = max_bytes or Config.HTTP_MAX_RESPONSE_BYTES
+    session = _get_session()
+    host = (urlparse(url).hostname or '').lower()
+
+    with _politeness.slot(host):
+        deadline = time.monotonic() + timeout
+        response = session.post(url, data=data, headers=headers, timeout=timeout, stream=True)
+        response.deadline = deadline
+        try:
+            response._content = _read_limited(response, max_bytes, url)
+        finally:
+            response.close()
+    return response
@@ -0,0 +1,205 @@
+"""
+Filtro das notícias pelas palavras-chave do tema
+Logo após a leitura do feed, o título e a descrição de cada item são comparados
+com as palavras-chave do AutomationTheme do feed. As palavras-chave de um tema
+são compiladas uma vez em um autômato Aho–Corasick, que encontra todas elas em
+uma única passada pelo texto, e o autômato fica em cache por tema até as
+palavras-chave mudarem. Itens abaixo de Config.THEME_KEYWORD_MIN_SCORE não têm
+o texto completo extraído e não chegam à geração de artigos
+"""
+
+import re
+import html
+import logging
+import threading
+import unicodedata
+from collections import deque
+from sqlalchemy import table, column, select, Integer, Text
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Uma palavra-chave no título vale mais do que na descrição
+TITLE_WEIGHT = 2
+DESCRIPTION_WEIGHT = 1
+
+# Tabelas usadas para achar as palavras-chave do tema de um feed
+automation_theme_table = table(
+    'automation_theme',
+    column('id', Integer),
+    column('keywords', Text),
+)
+rss_feed_theme_table = table(
+    'rss_feed',
+    column('id', Integer),
+    column('theme_id', Integer),
+)
+
+_TAG_RE = re.compile(r'<[^>]+>')
+_SPACE_RE = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    """Minúsculas, sem acentos, sem HTML e com espaços simples, para comparar palavras-chave"""
+    text = html.unescape(_TAG_RE.sub(' ', text or ''))
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return _SPACE_RE.sub(' ', text).strip()
+
+
+def parse_keywords(keywords):
+    """
+    Separa as palavras-chave de um tema (AutomationTheme.keywords, separadas por vírgula)
+
+    Returns:
+        list: Palavras-chave normalizadas, sem repetição, na ordem original
+    """
+    parsed = []
+    for keyword in (keywords or '').split(','):
+        keyword = normalize_text(keyword)
+        if keyword and keyword not in parsed:
+            parsed.append(keyword)
+    return parsed
+
+
+class AhoCorasick:
+    """Autômato de busca simultânea de vários padrões em um texto"""
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+
+        for index, pattern in enumerate(self.patterns):
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][char] = next_state
+                state = next_state
+            self._output[state].append(index)
+
+        # Ligações de falha em largura: o maior sufixo que também é prefixo de algum padrão
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def iter_matches(self, text):
+        """Gera (posição final, índice do padrão) de cada ocorrência no texto"""
+        state = 0
+        goto, fail, output = self._goto, self._fail, self._output
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in output[state]:
+                yield position, index
+
+
+class ThemeMatcher:
+    """Palavras-chave de um tema compiladas para pontuar itens de notícia"""
+
+    def __init__(self, keywords):
+        self.keywords = keywords
+        self.keyword_list = parse_keywords(keywords)
+        self._automaton = AhoCorasick(self.keyword_list)
+
+    def find(self, text):
+        """
+        Palavras-chave presentes no texto como palavras inteiras
+
+        Returns:
+            set: Índices das palavras-chave encontradas
+        """
+        text = normalize_text(text)
+        found = set()
+        for end, index in self._automaton.iter_matches(text):
+            start = end - len(self.keyword_list[index]) + 1
+            if start > 0 and text[start - 1].isalnum():
+                continue
+            if end + 1 < len(text) and text[end + 1].isalnum():
+                continue
+            found.add(index)
+        return found
+
+    def score(self, title, description):
+        """
+        Pontua um item pelas palavras-chave distintas no título e na descrição
+
+        Args:
+            title: Título do item
+            description: Descrição do item (HTML é ignorado)
+
+        Returns:
+            int: Soma dos pesos das palavras-chave encontradas
+        """
+        in_title = self.find(title)
+        in_description = self.find(description) - in_title
+        return len(in_title) * TITLE_WEIGHT + len(in_description) * DESCRIPTION_WEIGHT
+
+
+_matchers = {}
+_matchers_lock = threading.Lock()
+
+
+def get_theme_matcher(theme_id, keywords):
+    """
+    Retorna o matcher do tema, recompilando-o se as palavras-chave mudaram
+
+    Args:
+        theme_id: ID do AutomationTheme
+        keywords: Palavras-chave atuais do tema
+
+    Returns:
+        ThemeMatcher: Matcher do tema, ou None se o tema não tem palavras-chave
+    """
+    with _matchers_lock:
+        matcher = _matchers.get(theme_id)
+        if matcher is None or matcher.keywords != keywords:
+            matcher = _matchers[theme_id] = ThemeMatcher(keywords)
+    return matcher if matcher.keyword_list else None
+
+
+def invalidate_theme(theme_id):
+    """Descarta o matcher em cache de um tema editado ou excluído"""
+    with _matchers_lock:
+        _matchers.pop(theme_id, None)
+
+
+def matcher_for_feed(session, rss_feed_id):
+    """
+    Matcher das palavras-chave do tema de um feed
+
+    Args:
+        session: Sessão SQLAlchemy (db.session ou sessão do AutomationEngine)
+        rss_feed_id: ID do RSSFeed
+
+    Returns:
+        ThemeMatcher: Matcher do tema, ou None se o filtro está desativado ou o
+                      tema não tem palavras-chave
+    """
+    if not Config.THEME_KEYWORD_FILTER_ENABLED:
+        return None
+    row = session.execute(
+        select(automation_theme_table.c.id, automation_theme_table.c.keywords)
+        .select_from(rss_feed_theme_table.join(
+            automation_theme_table, automation_theme_table.c.id == rss_feed_theme_table.c.theme_id
+        ))
+        .where(rss_feed_theme_table.c.id == rss_feed_id)
+    ).first()
+    if not row:
+        return None
+    return get_theme_matcher(row.id, row.keywords)
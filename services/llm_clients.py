@@ -0,0 +1,126 @@
+"""
+Registro dos clientes das APIs de geração de texto (Anthropic e OpenAI)
+Cada par (provedor, chave de API) tem um único cliente, criado na primeira
+chamada e reaproveitado pelas seguintes: as conexões HTTP e o TLS continuam
+abertos entre um artigo e outro. Os clientes dos SDKs podem ser usados por
+várias threads ao mesmo tempo; o pool de conexões de cada um é limitado. Quando
+uma chave é trocada ou removida (routes/settings_routes.py) o cliente dela é
+descartado
+"""
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+import anthropic
+import openai
+from config import Config
+from models import APIType
+
+logger = logging.getLogger(__name__)
+
+# Clientes por (provedor, hash da chave), do menos para o mais usado recentemente
+_clients = OrderedDict()
+_lock = threading.Lock()
+
+
+def _key_id(api_key):
+    # A chave em si não fica como índice do registro (nem aparece nos logs)
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]
+
+
+def _connection_limits(sdk):
+    # Mesmo tipo Limits do httpx usado pelo SDK, com o pool reduzido
+    return type(sdk.DEFAULT_CONNECTION_LIMITS)(
+        max_connections=Config.LLM_CLIENT_MAX_CONNECTIONS,
+        max_keepalive_connections=Config.LLM_CLIENT_MAX_KEEPALIVE,
+        keepalive_expiry=Config.LLM_CLIENT_KEEPALIVE_SECONDS
+    )
+
+
+def _create_client(provider, api_key, asynchronous=False):
+    if provider == APIType.CLAUDE:
+        sdk, base_url = anthropic, Config.LLM_ANTHROPIC_BASE_URL
+        client_class = anthropic.AsyncAnthropic if asynchronous else anthropic.Anthropic
+    elif provider == APIType.GPT:
+        sdk, base_url = openai, Config.LLM_OPENAI_BASE_URL
+        client_class = openai.AsyncOpenAI if asynchronous else openai.OpenAI
+    else:
+        raise ValueError(f"Provedor sem cliente de geração: {provider}")
+    http_client_class = sdk.DefaultAsyncHttpxClient if asynchronous else sdk.DefaultHttpxClient
+    return client_class(
+        api_key=api_key,
+        base_url=base_url,
+        timeout=Config.LLM_CLIENT_TIMEOUT_SECONDS,
+        max_retries=Config.LLM_CLIENT_MAX_RETRIES,
+        http_client=http_client_class(limits=_connection_limits(sdk))
+    )
+
+
+def create_async_client(provider, api_key):
+    """
+    Cliente assíncrono (AsyncAnthropic ou AsyncOpenAI) com os mesmos limites dos síncronos
+
+    Não entra no registro: o pool de um cliente assíncrono pertence ao event loop
+    em que foi usado, então quem cria o cliente o fecha ao fim do loop
+    (services/generation_engine.py).
+
+    Args:
+        provider: APIType.CLAUDE ou APIType.GPT
+        api_key: Chave de API
+
+    Returns:
+        anthropic.AsyncAnthropic ou openai.AsyncOpenAI
+    """
+    return _create_client(provider, api_key, asynchronous=True)
+
+
+def get_client(provider, api_key):
+    """
+    Cliente do provedor para uma chave de API, criado apenas na primeira vez
+
+    Args:
+        provider: APIType.CLAUDE ou APIType.GPT
+        api_key: Chave de API
+
+    Returns:
+        anthropic.Anthropic ou openai.OpenAI
+    """
+    registry_key = (provider, _key_id(api_key))
+    with _lock:
+        client = _clients.get(registry_key)
+        if client is not None:
+            _clients.move_to_end(registry_key)
+            return client
+
+        client = _create_client(provider, api_key)
+        _clients[registry_key] = client
+        logger.info(f"Cliente {provider.value} criado para a chave {registry_key[1]}")
+
+        # Acima do limite, descartar o cliente usado há mais tempo
+        while len(_clients) > Config.LLM_CLIENT_REGISTRY_SIZE:
+            _clients.popitem(last=False)
+        return client
+
+
+def evict_client(provider, api_key):
+    """
+    Descarta o cliente de uma chave trocada ou removida
+
+    O cliente não é fechado aqui: gerações em andamento em outras threads
+    terminam com ele, e as conexões são fechadas quando ele deixa de ser usado.
+
+    Args:
+        provider: APIType da chave
+        api_key: Chave antiga
+
+    Returns:
+        bool: True se havia um cliente para a chave
+    """
+    if not api_key:
+        return False
+    with _lock:
+        removed = _clients.pop((provider, _key_id(api_key)), None) is not None
+    if removed:
+        logger.info(f"Cliente {provider.value} descartado para a chave {_key_id(api_key)}")
+    return removed
@@ -8,7 +8,10 @@ from datetime import datetime
 from app import db
 from models import NewsItem, Article, ArticleStatus, ArticleLog, LogType, AIModel
 from services.ai_service import generate_article_from_news
-from services.rss_service import fetch_and_process_feed
+from services.generation_engine import GenerationJob, generate_articles
+from services.rss_service import fetch_and_process_feed, fetch_all_feeds
+from services.story_clusters import mark_story_processed
+from services.url_canonical import canonical_url
 
 logger = logging.getLogger(__name__)
 
@@ -37,7 +40,7 @@ def process_news_item(news_item, ai_model, user_id, wp_config_id=None):
             ai_model=ai_model,
             is_automated=True,
             source_type="rss",
-            source_url=news_item.link,
+            source_url=canonical_url(news_item.link),
             user_id=user_id,
             wordpress_config_id=wp_config_id,
             news_item_id=news_item.id
@@ -67,8 +70,9 @@ def process_news_item(news_item, ai_model, user_id, wp_config_id=None):
                 existing_article_id=article.id  # Passar o ID do artigo já criado
             )
             
-            # Marcar a notícia como processada
+            # Marcar a notícia e as outras versões da mesma história como processadas
             news_item.is_processed = True
+            mark_story_processed(db.session, news_item)
             db.session.commit()
             
             return final_article, True, f"Artigo gerado com sucesso: {final_article.title}"
@@ -92,45 +96,121 @@ def process_news_item(news_item, ai_model, user_id, wp_config_id=None):
         logger.error(f"Erro ao criar artigo a partir da notícia: {str(e)}")
         return None, False, f"Erro ao processar notícia: {str(e)}"
 
+def process_news_items(news_items, ai_model, user_id, wp_config_id=None):
+    """
+    Processa várias notícias de uma vez, com a geração em paralelo
+    
+    Mesmo fluxo de process_news_item: um rascunho é criado para cada notícia,
+    as chamadas à IA são feitas juntas (services/generation_engine.py) e cada
+    rascunho é preenchido assim que a resposta chega; as notícias geradas
+    com sucesso são marcadas como processadas.
+    
+    Args:
+        news_items: Lista de NewsItem para processar
+        ai_model: Enum AIModel (CLAUDE ou GPT)
+        user_id: ID do usuário dono das notícias
+        wp_config_id: ID opcional da configuração WordPress
+        
+    Returns:
+        list: Tuplas (notícia, artigo criado, status de sucesso, mensagem), na ordem recebida
+    """
+    results = {}
+    jobs = []
+    
+    for news_item in news_items:
+        if news_item.is_processed:
+            results[news_item.id] = (news_item, None, False, "Esta notícia já foi processada anteriormente")
+            continue
+        
+        article = Article(
+            title=f"Reescrita (em andamento): {news_item.title[:100]}",
+            content="Este conteúdo está sendo gerado...",
+            status=ArticleStatus.DRAFT,
+            ai_model=ai_model,
+            is_automated=True,
+            source_type="rss",
+            source_url=canonical_url(news_item.link),
+            user_id=user_id,
+            wordpress_config_id=wp_config_id,
+            news_item_id=news_item.id
+        )
+        db.session.add(article)
+        db.session.flush()
+        
+        db.session.add(ArticleLog(
+            message=f"Iniciando geração de artigo a partir da notícia '{news_item.title}'",
+            log_type=LogType.INFO,
+            article_id=article.id
+        ))
+        jobs.append((article, GenerationJob(
+            ai_model, user_id, wp_config_id, news_item=news_item, existing_article_id=article.id
+        )))
+    
+    # Rascunhos gravados antes das chamadas, como no processamento individual
+    db.session.commit()
+    
+    generate_articles([job for _, job in jobs])
+    
+    for article, job in jobs:
+        news_item = job.news_item
+        if job.article:
+            # Marcar a notícia e as outras versões da mesma história como processadas
+            news_item.is_processed = True
+            mark_story_processed(db.session, news_item)
+            results[news_item.id] = (news_item, job.article, True, f"Artigo gerado com sucesso: {job.article.title}")
+        else:
+            logger.error(f"Erro ao gerar conteúdo do artigo: {job.error}")
+            
+            # Ainda assim, manter o artigo rascunho para edição manual
+            db.session.add(ArticleLog(
+                message=f"Erro ao gerar conteúdo completo: {job.error}",
+                log_type=LogType.ERROR,
+                article_id=article.id
+            ))
+            results[news_item.id] = (
+                news_item, article, False,
+                f"Erro na geração do conteúdo, mas artigo rascunho foi criado: {job.error}"
+            )
+    db.session.commit()
+    
+    return [results[news_item.id] for news_item in news_items]
+
 def fetch_process_all_feeds(user_id):
     """
     Busca todos os feeds ativos de um usuário e processa as notícias novas
     
+    Os feeds são buscados de forma concorrente por fetch_all_feeds; as
+    gravações continuam na sessão da requisição atual.
+    
     Args:
         user_id: ID do usuário proprietário dos feeds
         
     Returns:
         dict: Estatísticas de processamento
     """
-    from models import RSSFeed
-    
     stats = {
         'feeds_processed': 0,
         'feeds_with_errors': 0,
-        'new_items': 0
+        'feeds_unchanged': 0,
+        'new_items': 0,
+        'canonical_duplicates': 0,
+        'shared_contents': 0,
+        'feed_timings': []
     }
     
-    # Buscar todos os feeds ativos do usuário
-    feeds = RSSFeed.query.filter_by(user_id=user_id, is_active=True).all()
+    cycle_stats = fetch_all_feeds(user_id=user_id)
     
-    if not feeds:
+    if not cycle_stats['total_feeds']:
         logger.info(f"Nenhum feed ativo encontrado para o usuário {user_id}")
         return stats
     
-    # Processar cada feed
-    for feed in feeds:
-        try:
-            new_items, total_items = fetch_and_process_feed(feed)
-            stats['new_items'] += new_items
-            stats['feeds_processed'] += 1
-            
-            # Atualizar data de última busca
-            feed.last_fetch = datetime.utcnow()
-            db.session.commit()
-        
-        except Exception as e:
-            stats['feeds_with_errors'] += 1
-            logger.error(f"Erro ao processar feed {feed.name}: {str(e)}")
+    stats['feeds_processed'] = cycle_stats['processed_feeds']
+    stats['feeds_with_errors'] = cycle_stats['feeds_with_errors'] + cycle_stats['timed_out_feeds']
+    stats['feeds_unchanged'] = cycle_stats['unchanged_feeds']
+    stats['new_items'] = cycle_stats['new_items']
+    stats['canonical_duplicates'] = cycle_stats['canonical_duplicates']
+    stats['shared_contents'] = cycle_stats['shared_contents']
+    stats['feed_timings'] = cycle_stats['feed_timings']
     
     return stats
 
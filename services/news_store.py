@@ -0,0 +1,387 @@
+"""
+Gravação em lote de itens de notícia
+Funções compartilhadas pelos caminhos de ingestão para verificar GUIDs existentes com
+uma única consulta e inserir novos itens ignorando duplicados nas restrições únicas.
+Os links chegam na forma canônica (services/url_canonical.py), então a mesma notícia
+com parâmetros de rastreamento ou em versão AMP não é gravada duas vezes.
+Cada assinatura (RSSFeed) tem seus próprios NewsItem, mas o texto completo de um
+link fica em uma única linha de news_content referenciada por todos eles
+"""
+
+import logging
+from datetime import datetime
+from sqlalchemy import table, column, select, insert, Boolean, DateTime, Integer, String
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from config import Config
+from services.compressed_text import CompressedText
+from services.keyword_filter import matcher_for_feed
+
+logger = logging.getLogger(__name__)
+
+# Tabela news_item sem depender dos modelos Flask (usada também pelo AutomationEngine)
+news_item_table = table(
+    'news_item',
+    column('id', Integer),
+    column('title', String),
+    column('description', CompressedText),
+    column('content', CompressedText),
+    column('link', String),
+    column('guid', String),
+    column('published_date', DateTime),
+    column('is_processed', Boolean),
+    column('created_at', DateTime),
+    column('extraction_status', String),
+    column('news_content_id', Integer),
+    column('story_cluster_id', Integer),
+    column('keyword_score', Integer),
+    column('rss_feed_id', Integer),
+    column('user_id', Integer),
+)
+
+# Texto completo compartilhado por link (NewsContent)
+news_content_table = table(
+    'news_content',
+    column('id', Integer),
+    column('link', String),
+    column('content', CompressedText),
+    column('extraction_status', String),
+    column('extraction_attempts', Integer),
+    column('extraction_error', String),
+    column('extracted_at', DateTime),
+    column('created_at', DateTime),
+)
+
+# Estados da extração do texto completo (NewsContent.extraction_status, espelhado em NewsItem)
+EXTRACTION_PENDING = "pending"  # Gravado a partir do feed, aguardando o worker de extração
+EXTRACTION_DONE = "done"        # Conteúdo pronto para a geração de artigos
+EXTRACTION_FAILED = "failed"    # Tentativas esgotadas e nenhum texto aproveitável
+EXTRACTION_SKIPPED = "skipped"  # Fora das palavras-chave do tema: sem extração nem geração (só em NewsItem)
+
+# Limites das colunas de NewsItem
+TITLE_MAX_LENGTH = 256
+LINK_MAX_LENGTH = 512
+GUID_MAX_LENGTH = 512
+DESCRIPTION_MAX_LENGTH = 2000
+CONTENT_MAX_LENGTH = 10000
+
+# Quantidade de parâmetros por consulta/inserção para não estourar limites do banco
+BATCH_SIZE = 500
+
+
+def _chunks(values, size=BATCH_SIZE):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def find_existing_guids(session, guids, rss_feed_id):
+    """
+    Retorna os GUIDs que já existem em um feed em uma consulta por lote
+
+    Args:
+        session: Sessão SQLAlchemy (db.session ou sessão do AutomationEngine)
+        guids: GUIDs a verificar
+        rss_feed_id: ID do feed (assinatura) dono dos itens
+
+    Returns:
+        set: GUIDs já armazenados para o feed
+    """
+    guids = list({guid[:GUID_MAX_LENGTH] for guid in guids if guid})
+    existing = set()
+    for chunk in _chunks(guids):
+        rows = session.execute(
+            select(news_item_table.c.guid).where(
+                news_item_table.c.rss_feed_id == rss_feed_id,
+                news_item_table.c.guid.in_(chunk)
+            )
+        )
+        existing.update(row[0] for row in rows)
+    return existing
+
+
+def _legacy_guid(item):
+    """
+    GUID que o item teria antes da canonicalização dos links (o link original),
+    para reconhecer itens gravados antes dela; None se não houver diferença
+    """
+    original = item.get('original_link')
+    if original and item.get('guid') == item.get('link') and original != item['link']:
+        return original[:GUID_MAX_LENGTH]
+    return None
+
+
+def _count(stats, name, amount=1):
+    if stats is not None and amount:
+        stats[name] = stats.get(name, 0) + amount
+
+
+def filter_new_items(session, items, rss_feed_id, stats=None, seen_filter=None):
+    """
+    Descarta os itens que já existem no feed ou se repetem na própria leitura
+
+    Um item vale como existente pelo seu GUID ou pelo GUID antigo, com o link
+    original. Em stats são somados 'canonicalized_links' (links alterados pela
+    canonicalização) e 'canonical_duplicates' (itens só reconhecidos como
+    repetidos graças à forma canônica do link).
+
+    Com um filtro de GUIDs já vistos (services/seen_filter.py), só os GUIDs que
+    o filtro talvez conheça são consultados no banco; os demais são certamente novos.
+
+    Args:
+        session: Sessão SQLAlchemy
+        items: Itens normalizados de um feed
+        rss_feed_id: ID do feed de origem
+        stats: Dicionário de estatísticas da ingestão a atualizar (opcional)
+        seen_filter: SeenGuidFilter do daemon (opcional)
+
+    Returns:
+        list: Itens novos, na ordem original
+    """
+    items = list(items)
+    guids = {
+        guid[:GUID_MAX_LENGTH]
+        for item in items for guid in (item.get('guid'), _legacy_guid(item)) if guid
+    }
+    if seen_filter is not None:
+        candidates = {guid for guid in guids if seen_filter.might_contain(rss_feed_id, guid)}
+        existing = find_existing_guids(session, candidates, rss_feed_id) if candidates else set()
+        seen_filter.record_check(len(guids) - len(candidates), len(candidates), len(candidates - existing))
+    else:
+        existing = find_existing_guids(session, guids, rss_feed_id)
+
+    new_items = []
+    seen, seen_original = set(), set()
+    for item in items:
+        guid = (item.get('guid') or '')[:GUID_MAX_LENGTH]
+        legacy = _legacy_guid(item)
+        original = legacy or guid
+        if item.get('original_link') and item['original_link'] != item.get('link'):
+            _count(stats, 'canonicalized_links')
+        if guid in existing or guid in seen or (legacy and legacy in existing):
+            if original not in existing and original not in seen_original:
+                _count(stats, 'canonical_duplicates')
+            continue
+        seen.add(guid)
+        seen_original.add(original)
+        new_items.append(item)
+    return new_items
+
+
+def _insert_ignore_statement(session, target):
+    """Monta um INSERT que ignora conflitos nas restrições únicas, conforme o banco"""
+    dialect = session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        return pg_insert(target).on_conflict_do_nothing()
+    if dialect == 'sqlite':
+        return sqlite_insert(target).on_conflict_do_nothing()
+    if dialect in ('mysql', 'mariadb'):
+        return insert(target).prefix_with('IGNORE')
+    raise ValueError(f"Banco de dados sem suporte a inserção ignorando duplicados: {dialect}")
+
+
+def _select_contents(session, links):
+    contents = {}
+    for chunk in _chunks(links):
+        rows = session.execute(
+            select(
+                news_content_table.c.link,
+                news_content_table.c.id,
+                news_content_table.c.extraction_status
+            ).where(news_content_table.c.link.in_(chunk))
+        )
+        contents.update((row.link, (row.id, row.extraction_status)) for row in rows)
+    return contents
+
+
+def resolve_contents(session, links, stats=None):
+    """
+    Obtém (ou cria, com extração pendente) a linha de news_content de cada link
+
+    Um link já extraído para outro assinante é reaproveitado sem novo download.
+
+    Args:
+        session: Sessão SQLAlchemy
+        links: Links das notícias (canônicos)
+        stats: Estatísticas da ingestão; 'shared_contents' soma os links que já
+               tinham news_content (opcional)
+
+    Returns:
+        dict: link -> (id do NewsContent, estado da extração)
+    """
+    links = list({link[:LINK_MAX_LENGTH] for link in links if link})
+    contents = _select_contents(session, links)
+
+    missing = [link for link in links if link not in contents]
+    _count(stats, 'shared_contents', len(links) - len(missing))
+    if missing:
+        now = datetime.utcnow()
+        for chunk in _chunks(missing):
+            session.execute(_insert_ignore_statement(session, news_content_table).values([
+                {
+                    'link': link,
+                    'extraction_status': EXTRACTION_PENDING,
+                    'extraction_attempts': 0,
+                    'created_at': now
+                }
+                for link in chunk
+            ]))
+        contents.update(_select_contents(session, missing))
+    return contents
+
+
+def insert_news_items(session, items, rss_feed_id, user_id, stats=None):
+    """
+    Insere novos itens de notícia em lote, ignorando GUIDs duplicados
+    
+    Cada item é ligado ao NewsContent do seu link. Se o texto desse link já
+    foi extraído (por exemplo, para outro assinante do mesmo feed), o item já
+    entra pronto; caso contrário fica com a extração pendente e o texto é
+    preenchido depois por services/extraction_worker.py.
+
+    Outro processo de ingestão pode inserir o mesmo GUID entre a verificação e a
+    inserção; nesse caso a linha é ignorada pelo banco em vez de abortar o lote.
+
+    Só os itens efetivamente inseridos (não os ignorados como duplicados) entram
+    no índice de similaridade e são ligados às histórias quase iguais já
+    gravadas para o usuário (services/story_clusters.py).
+
+    Título e descrição são pontuados pelas palavras-chave do tema do feed
+    (services/keyword_filter.py); itens abaixo de Config.THEME_KEYWORD_MIN_SCORE
+    entram como 'skipped', sem NewsContent, e não são extraídos nem usados na
+    geração de artigos.
+
+    Args:
+        session: Sessão SQLAlchemy
+        items: Dicionários com title, description, content, link, guid e published_date
+        rss_feed_id: ID do feed de origem
+        user_id: ID do usuário dono do feed
+        stats: Estatísticas da ingestão a atualizar (opcional, veja resolve_contents)
+
+    Returns:
+        int: Quantidade de linhas efetivamente inseridas
+    """
+    from services.story_clusters import compute_simhash, assign_story_clusters
+
+    now = datetime.utcnow()
+    rows = []
+    seen = set()
+    for item in items:
+        guid = (item.get('guid') or '')[:GUID_MAX_LENGTH]
+        if not guid or guid in seen:
+            continue
+        seen.add(guid)
+        rows.append({
+            'title': (item.get('title') or 'Sem título')[:TITLE_MAX_LENGTH],
+            'description': (item.get('description') or '')[:DESCRIPTION_MAX_LENGTH],
+            'content': (item.get('content') or '')[:CONTENT_MAX_LENGTH],
+            'link': (item.get('link') or '')[:LINK_MAX_LENGTH],
+            'guid': guid,
+            'published_date': item.get('published_date'),
+            'is_processed': False,
+            'created_at': now,
+            'extraction_status': EXTRACTION_PENDING,
+            'news_content_id': None,
+            'story_cluster_id': None,
+            'keyword_score': None,
+            'rss_feed_id': rss_feed_id,
+            'user_id': user_id,
+        })
+
+    if not rows:
+        return 0
+
+    matcher = matcher_for_feed(session, rss_feed_id)
+    if matcher:
+        for row in rows:
+            row['keyword_score'] = matcher.score(row['title'], row['description'])
+            if row['keyword_score'] < Config.THEME_KEYWORD_MIN_SCORE:
+                row['extraction_status'] = EXTRACTION_SKIPPED
+        skipped = sum(1 for row in rows if row['extraction_status'] == EXTRACTION_SKIPPED)
+        if skipped:
+            logger.info(f"{skipped} de {len(rows)} itens fora das palavras-chave do tema")
+
+    wanted = [row for row in rows if row['extraction_status'] != EXTRACTION_SKIPPED]
+    contents = resolve_contents(session, [row['link'] for row in wanted], stats)
+    for row in wanted:
+        if row['link'] in contents:
+            row['news_content_id'], row['extraction_status'] = contents[row['link']]
+        else:
+            # Item sem link: não há o que baixar, o conteúdo do feed é usado diretamente
+            row['extraction_status'] = EXTRACTION_DONE
+
+    returning = session.get_bind().dialect.insert_returning
+    inserted = 0
+    new_items = []
+    for chunk in _chunks(rows):
+        statement = _insert_ignore_statement(session, news_item_table).values(chunk)
+        if returning:
+            # RETURNING com ON CONFLICT DO NOTHING traz apenas as linhas inseridas
+            inserted_rows = session.execute(
+                statement.returning(news_item_table.c.id, news_item_table.c.guid)
+            ).fetchall()
+        else:
+            # INSERT IGNORE (MySQL) sem RETURNING: o comando reserva um bloco contínuo de IDs,
+            # LAST_INSERT_ID() é o da primeira linha inserida e ROW_COUNT() quantas foram.
+            # Linhas do mesmo GUID gravadas por outro processo ficam fora do bloco
+            result = session.execute(statement)
+            inserted_rows = []
+            if result.rowcount and result.lastrowid:
+                inserted_rows = session.execute(
+                    select(news_item_table.c.id, news_item_table.c.guid).where(
+                        news_item_table.c.rss_feed_id == rss_feed_id,
+                        news_item_table.c.guid.in_([row['guid'] for row in chunk]),
+                        news_item_table.c.id >= result.lastrowid
+                    ).order_by(news_item_table.c.id).limit(result.rowcount)
+                ).fetchall()
+        inserted += len(inserted_rows)
+
+        by_guid = {row['guid']: row for row in chunk}
+        for item in inserted_rows:
+            row = by_guid[item.guid]
+            new_items.append((item.id, compute_simhash(' '.join((row['title'], row['description'], row['content'])))))
+
+    assign_story_clusters(session, user_id, new_items)
+    return inserted
+
+
+def store_new_items(session, items, rss_feed_id, user_id, stats=None, seen_filter=None):
+    """
+    Verifica em uma consulta quais itens já existem e insere apenas os novos (sem commit)
+
+    Args:
+        session: Sessão SQLAlchemy
+        items: Itens normalizados de um feed
+        rss_feed_id: ID do feed de origem
+        user_id: ID do usuário dono do feed
+        stats: Estatísticas da ingestão a atualizar (opcional, veja filter_new_items)
+        seen_filter: Filtro de GUIDs já vistos do daemon (opcional)
+
+    Returns:
+        int: Quantidade de itens novos inseridos
+    """
+    new_items = filter_new_items(session, items, rss_feed_id, stats, seen_filter)
+    return insert_news_items(session, new_items, rss_feed_id, user_id, stats)
+
+
+def delete_orphan_contents(session, older_than):
+    """
+    Remove textos compartilhados que não são mais referenciados por nenhum NewsItem (sem commit)
+
+    Args:
+        session: Sessão SQLAlchemy
+        older_than: Só remove linhas criadas antes desta data, para não competir
+                    com uma ingestão em andamento
+
+    Returns:
+        int: Quantidade de linhas removidas
+    """
+    referenced = select(news_item_table.c.news_content_id).where(
+        news_item_table.c.news_content_id.isnot(None)
+    )
+    result = session.execute(
+        news_content_table.delete().where(
+            news_content_table.c.created_at < older_than,
+            news_content_table.c.id.notin_(referenced)
+        )
+    )
+    return result.rowcount or 0
@@ -0,0 +1,279 @@
+"""
+Importação de feeds em lote a partir de um arquivo OPML
+As categorias do OPML (outlines que agrupam feeds ou o atributo category) viram
+temas de automação. Todos os feeds são validados em paralelo antes da gravação
+(URL acessível, feed legível, quantidade de entradas e frequência de publicação
+estimada) e os válidos são inseridos em uma única transação. O resultado traz um
+relatório por feed
+"""
+
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from xml.etree import ElementTree
+from app import db
+from config import Config
+from models import AutomationTheme, RSSFeed
+from services.feed_reader import fetch_feed
+from services.feed_scheduling import compute_poll_interval
+
+logger = logging.getLogger(__name__)
+
+# Tema dos feeds sem categoria quando nenhum tema padrão é escolhido
+DEFAULT_CATEGORY = "Importados"
+
+# Resultado da validação de cada feed no relatório
+FEED_VALID = "valid"              # Validado e inserido
+FEED_INVALID = "invalid"          # Inacessível, ilegível ou sem entradas
+FEED_DUPLICATE = "duplicate"      # URL já cadastrada para o usuário ou repetida no arquivo
+FEED_TIMEOUT = "timeout"          # Validação não terminou dentro do prazo da importação
+
+NAME_MAX_LENGTH = 128
+URL_MAX_LENGTH = 512
+
+
+class OPMLError(ValueError):
+    """Arquivo que não é um OPML legível"""
+
+
+def _category_name(outline):
+    # category="/Tecnologia/Web,/Outra": primeira categoria, último nível
+    category = (outline.get('category') or '').split(',')[0].strip().strip('/')
+    return category.split('/')[-1].strip() if category else None
+
+
+def parse_opml(data):
+    """
+    Lê os feeds de um OPML com suas categorias
+
+    Args:
+        data: Conteúdo do arquivo (bytes ou str)
+
+    Returns:
+        list: Dicionários com name, url e category (None se o feed não tem categoria)
+
+    Raises:
+        OPMLError: Arquivo não é XML ou não tem <body>
+    """
+    try:
+        root = ElementTree.fromstring(data)
+    except ElementTree.ParseError as e:
+        raise OPMLError(f"Arquivo OPML inválido: {str(e)}")
+    body = root.find('body')
+    if body is None:
+        raise OPMLError("Arquivo OPML sem <body>")
+
+    feeds = []
+
+    def visit(element, parent_category):
+        for outline in element.findall('outline'):
+            url = (outline.get('xmlUrl') or outline.get('xmlurl') or '').strip()
+            title = (outline.get('title') or outline.get('text') or '').strip()
+            if url:
+                feeds.append({
+                    'name': (title or url)[:NAME_MAX_LENGTH],
+                    'url': url,
+                    'category': _category_name(outline) or parent_category
+                })
+            else:
+                # Outline sem xmlUrl é uma pasta: o seu título é a categoria dos feeds dentro dela
+                visit(outline, title[:NAME_MAX_LENGTH] or parent_category)
+
+    visit(body, None)
+    return feeds
+
+
+def validate_feed(url, timeout=None):
+    """
+    Baixa um feed e verifica se pode ser cadastrado (etapa de rede, sem acesso ao banco)
+
+    Args:
+        url: URL do feed
+        timeout: Timeout do download em segundos (padrão: Config.OPML_IMPORT_FEED_TIMEOUT_SECONDS)
+
+    Returns:
+        dict: valid, error, item_count, poll_interval_minutes (frequência estimada
+              pelas datas de publicação), websub_hub, websub_topic e elapsed_seconds
+    """
+    started = time.monotonic()
+    report = {
+        'valid': False,
+        'error': None,
+        'item_count': 0,
+        'poll_interval_minutes': None,
+        'websub_hub': None,
+        'websub_topic': None,
+    }
+    if not url.lower().startswith(('http://', 'https://')) or len(url) > URL_MAX_LENGTH:
+        report['error'] = "URL inválida"
+    else:
+        try:
+            result = fetch_feed(url, timeout=timeout or Config.OPML_IMPORT_FEED_TIMEOUT_SECONDS)
+            report['item_count'] = result['total_entries']
+            report['websub_hub'] = result['websub_hub']
+            report['websub_topic'] = result['websub_topic']
+            if result['bozo'] and not result['entries']:
+                report['error'] = f"Feed inválido: {result['bozo_exception']}"
+            elif not result['entries']:
+                report['error'] = "Feed sem entradas"
+            else:
+                report['valid'] = True
+                interval = compute_poll_interval([item['published_date'] for item in result['entries']])
+                report['poll_interval_minutes'] = int(interval.total_seconds() // 60)
+        except Exception as e:
+            report['error'] = str(e)[:300]
+    report['elapsed_seconds'] = round(time.monotonic() - started, 3)
+    return report
+
+
+def validate_feeds(urls, max_workers=None, deadline_seconds=None):
+    """
+    Valida vários feeds em paralelo, com um prazo total
+
+    Args:
+        urls: URLs distintas
+        max_workers: Downloads simultâneos (padrão: Config.OPML_IMPORT_WORKERS)
+        deadline_seconds: Prazo total (padrão: Config.OPML_IMPORT_DEADLINE_SECONDS)
+
+    Returns:
+        dict: URL -> relatório de validate_feed, ou None se não terminou no prazo
+    """
+    max_workers = max_workers or Config.OPML_IMPORT_WORKERS
+    deadline_seconds = deadline_seconds or Config.OPML_IMPORT_DEADLINE_SECONDS
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="opml-validate")
+    try:
+        futures = {executor.submit(validate_feed, url): url for url in urls}
+        wait(futures, timeout=deadline_seconds)
+        return {
+            url: future.result() if future.done() else None
+            for future, url in futures.items()
+        }
+    finally:
+        # Não esperar pelos downloads que passaram do prazo
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _theme_for(category, themes, user_id, default_theme, created):
+    """Tema de uma categoria: existente com o mesmo nome (sem diferenciar maiúsculas) ou novo"""
+    if not category:
+        if default_theme:
+            return default_theme
+        category = DEFAULT_CATEGORY
+    key = category.lower()
+    if key not in themes:
+        # Sem palavras-chave: o filtro por tema (services/keyword_filter.py) não descarta nada
+        theme = AutomationTheme(name=category, keywords='', priority=0, is_active=True, user_id=user_id)
+        db.session.add(theme)
+        db.session.flush()  # ID do tema para os feeds, ainda dentro da transação da importação
+        themes[key] = theme
+        created.append(category)
+    return themes[key]
+
+
+def import_opml(data, user_id, default_theme_id=None):
+    """
+    Importa os feeds de um OPML para um usuário
+
+    Feeds já cadastrados pelo usuário são ignorados; os demais são validados em
+    paralelo e os válidos são gravados, com os temas novos, em uma única transação.
+
+    Args:
+        data: Conteúdo do arquivo OPML
+        user_id: ID do usuário
+        default_theme_id: Tema dos feeds sem categoria (opcional; sem ele vão para "Importados")
+
+    Returns:
+        dict: total, added, invalid, duplicate, timed_out, themes_created (nomes) e
+              feeds (relatório por feed: name, url, category, status, error, item_count,
+              poll_interval_minutes e feed_id)
+
+    Raises:
+        OPMLError: Arquivo inválido
+        ValueError: Tema padrão não encontrado
+    """
+    entries = parse_opml(data)
+
+    default_theme = None
+    if default_theme_id:
+        default_theme = AutomationTheme.query.filter_by(id=default_theme_id, user_id=user_id).first()
+        if not default_theme:
+            raise ValueError("Tema não encontrado")
+
+    existing_urls = {
+        url.strip() for (url,) in RSSFeed.query.filter_by(user_id=user_id).with_entities(RSSFeed.url)
+    }
+    pending = []
+    report = []
+    for entry in entries:
+        line = dict(entry, status=None, error=None, item_count=0, poll_interval_minutes=None, feed_id=None)
+        report.append(line)
+        if entry['url'] in existing_urls:
+            line['status'] = FEED_DUPLICATE
+            continue
+        existing_urls.add(entry['url'])
+        pending.append(line)
+
+    started = time.monotonic()
+    validations = validate_feeds([line['url'] for line in pending]) if pending else {}
+    logger.info(f"Importação OPML: {len(pending)} feeds validados em {time.monotonic() - started:.1f}s")
+
+    themes = {
+        theme.name.lower(): theme for theme in AutomationTheme.query.filter_by(user_id=user_id).all()
+    }
+    themes_created = []
+    new_feeds = []
+    try:
+        for line in pending:
+            validation = validations.get(line['url'])
+            if validation is None:
+                line['status'] = FEED_TIMEOUT
+                line['error'] = "Validação não terminou dentro do prazo"
+                continue
+            line['item_count'] = validation['item_count']
+            line['poll_interval_minutes'] = validation['poll_interval_minutes']
+            if not validation['valid']:
+                line['status'] = FEED_INVALID
+                line['error'] = validation['error']
+                continue
+
+            theme = _theme_for(line['category'], themes, user_id, default_theme, themes_created)
+            feed = RSSFeed(
+                name=line['name'],
+                url=line['url'],
+                is_active=True,
+                theme_id=theme.id,
+                user_id=user_id,
+                poll_interval_minutes=validation['poll_interval_minutes'],
+                websub_hub=validation['websub_hub'][:URL_MAX_LENGTH] if validation['websub_hub'] else None,
+                websub_topic=(validation['websub_topic'] or line['url'])[:URL_MAX_LENGTH]
+                if validation['websub_hub'] else None,
+                created_at=datetime.utcnow()
+            )
+            new_feeds.append((line, feed))
+            line['status'] = FEED_VALID
+
+        # Feeds e temas novos em uma única transação
+        db.session.add_all([feed for _, feed in new_feeds])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    for line, feed in new_feeds:
+        line['feed_id'] = feed.id
+
+    summary = {
+        'total': len(report),
+        'added': len(new_feeds),
+        'invalid': sum(1 for line in report if line['status'] == FEED_INVALID),
+        'duplicate': sum(1 for line in report if line['status'] == FEED_DUPLICATE),
+        'timed_out': sum(1 for line in report if line['status'] == FEED_TIMEOUT),
+        'themes_created': themes_created,
+        'feeds': report
+    }
+    logger.info(
+        f"Importação OPML do usuário {user_id}: {summary['added']} de {summary['total']} feeds adicionados, "
+        f"{summary['invalid']} inválidos, {summary['duplicate']} repetidos, {summary['timed_out']} fora do prazo"
+    )
+    return summary
@@ -1,18 +1,80 @@
 import os
+import time
 import logging
-import feedparser
-import trafilatura
-import html2text
-from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
 from urllib.parse import urlparse
 from app import db
+from config import Config
 from models import RSSFeed, NewsItem, Article, ArticleStatus, AIModel
+from services import http_client, extraction_cache
+from services.html_extraction import extract_html
+from services.feed_reader import (
+    fetch_feed, apply_fetch_state, scan_new_entries, apply_watermark,
+    group_feeds_by_url, shared_validators, stop_before_for, FEED_MODIFIED
+)
+from services.feed_scheduling import compute_next_poll, apply_poll_schedule
+from services.feed_health import fetch_allowed, health_after_success, health_after_failure, apply_health
+from services.news_store import filter_new_items, insert_news_items
 
 logger = logging.getLogger(__name__)
-h2t = html2text.HTML2Text()
-h2t.ignore_links = False
-h2t.ignore_images = False
-h2t.ignore_tables = False
+
+def _fetch_feed(url, etag=None, last_modified=None, previous_hash=None, stop_before=None):
+    """
+    Faz o download condicional e o parse de um feed RSS (etapa de rede, sem acesso ao banco)
+    
+    Args:
+        url: URL do feed
+        etag: ETag salvo no RSSFeed
+        last_modified: Last-Modified salvo no RSSFeed
+        previous_hash: Hash do último corpo processado
+        stop_before: Data em que a leitura do feed pode parar (feed_reader.stop_before_for)
+        
+    Returns:
+        tuple: (resultado de feed_reader.fetch_feed, tempo gasto em segundos)
+    """
+    started = time.monotonic()
+    result = fetch_feed(
+        url, etag=etag, last_modified=last_modified, previous_hash=previous_hash, stop_before=stop_before
+    )
+    return result, time.monotonic() - started
+
+def _select_new_entries(feed, entries, stats=None):
+    """
+    Seleciona as entradas do feed acima da marca d'água e descarta as que já existem no banco
+    
+    A leitura para na entrada mais nova já salva (salvo RSSFeed.full_scan) e os
+    GUIDs restantes são verificados com uma única consulta.
+    
+    Args:
+        feed: Objeto RSSFeed do banco de dados
+        entries: Itens normalizados lidos por feed_reader.fetch_feed
+        stats: Estatísticas do ciclo (news_store.filter_new_items), opcional
+        
+    Returns:
+        tuple: (itens cujo GUID ainda não foi salvo, nova marca d'água ou None)
+    """
+    items, watermark = scan_new_entries(
+        entries, feed.watermark_published_at, feed.watermark_guid, feed.full_scan
+    )
+    return filter_new_items(db.session, items, feed.id, stats), watermark
+
+def _store_entries(feed, items, stats=None):
+    """
+    Insere em lote os novos itens de notícia de um feed (sem commit)
+    
+    Os itens ficam com a extração pendente; o texto completo dos links é
+    preenchido depois por services/extraction_worker.py.
+    
+    Args:
+        feed: Objeto RSSFeed do banco de dados
+        items: Itens novos selecionados por _select_new_entries
+        stats: Estatísticas do ciclo (news_store.insert_news_items), opcional
+        
+    Returns:
+        int: Quantidade de itens inseridos
+    """
+    return insert_news_items(db.session, items, feed.id, feed.user_id, stats)
 
 def fetch_and_process_feed(feed):
     """
@@ -27,69 +89,41 @@ def fetch_and_process_feed(feed):
     logger.info(f"Buscando feed: {feed.name} ({feed.url})")
     
     try:
-        # Fazer o parse do feed
-        parsed = feedparser.parse(feed.url)
-        
-        if parsed.bozo == 1:
+        # Busca manual: feita mesmo com o circuito aberto, e o resultado atualiza a saúde do feed
+        result, elapsed = _fetch_feed(
+            feed.url, feed.etag, feed.last_modified, feed.content_hash, stop_before_for([feed])
+        )
+    except Exception as e:
+        apply_health(feed, health_after_failure(feed, e))
+        db.session.commit()
+        logger.error(f"Erro ao processar feed {feed.name}: {str(e)}")
+        raise e
+    
+    try:
+        if result['bozo']:
             # Feed inválido
-            logger.error(f"Erro ao processar feed {feed.name}: {parsed.bozo_exception}")
+            logger.error(f"Erro ao processar feed {feed.name}: {result['bozo_exception']}")
+            apply_health(feed, health_after_failure(feed, result['bozo_exception']))
+            db.session.commit()
             return 0, 0
         
-        # Processar entradas
-        new_items_count = 0
-        total_items = len(parsed.entries)
+        apply_health(feed, health_after_success(feed, elapsed))
         
-        for entry in parsed.entries:
-            # Obter GUID ou link como identificador único
-            guid = getattr(entry, 'id', entry.link)
-            
-            # Verificar se o item já existe
-            existing_item = NewsItem.query.filter_by(guid=guid).first()
-            if existing_item:
-                continue
-            
-            # Obter data de publicação (se disponível)
-            published_date = None
-            if hasattr(entry, 'published_parsed') and entry.published_parsed:
-                try:
-                    published_date = datetime(*entry.published_parsed[:6], tzinfo=timezone.utc)
-                except:
-                    pass
-            
-            # Obtendo o conteúdo
-            content = ""
-            if hasattr(entry, 'content') and entry.content:
-                content = entry.content[0].value
-            elif hasattr(entry, 'description') and entry.description:
-                content = entry.description
-            
-            # Extrair o texto completo do link
-            full_content = ""
-            try:
-                downloaded = trafilatura.fetch_url(entry.link)
-                full_content = trafilatura.extract(downloaded) or ""
-            except Exception as e:
-                logger.warning(f"Erro ao extrair conteúdo de {entry.link}: {str(e)}")
-            
-            # Se não conseguiu extrair conteúdo pelo trafilatura, usar o que já temos
-            if not full_content and content:
-                full_content = h2t.handle(content)
-            
-            # Criar novo item de notícia
-            news_item = NewsItem(
-                title=entry.title,
-                description=content[:2000] if content else "",  # Limitar tamanho da descrição
-                content=full_content[:10000] if full_content else "",  # Limitar tamanho do conteúdo
-                link=entry.link,
-                guid=guid,
-                published_date=published_date,
-                is_processed=False,
-                rss_feed_id=feed.id,
-                user_id=feed.user_id
-            )
-            
-            db.session.add(news_item)
-            new_items_count += 1
+        if result['status'] != FEED_MODIFIED:
+            # Feed sem alterações desde a última busca
+            logger.info(f"Feed {feed.name} sem alterações ({result['status']}).")
+            apply_fetch_state(feed, result)
+            apply_poll_schedule(feed, compute_next_poll(db.session, feed.id))
+            db.session.commit()
+            return 0, 0
+        
+        # Processar entradas
+        total_items = result['total_entries']
+        new_entries, watermark = _select_new_entries(feed, result['entries'])
+        new_items_count = _store_entries(feed, new_entries)
+        apply_fetch_state(feed, result)
+        apply_watermark(feed, watermark)
+        apply_poll_schedule(feed, compute_next_poll(db.session, feed.id))
         
         # Salvar no banco de dados
         db.session.commit()
@@ -115,40 +149,34 @@ def fetch_website_content(url):
     try:
         logger.info(f"Extraindo conteúdo de: {url}")
         
-        # Usar trafilatura para extrair o conteúdo
-        downloaded = trafilatura.fetch_url(url)
+        # Página já baixada e extraída recentemente: responder pelo cache
+        cached = extraction_cache.get(url)
+        if cached and cached['text'] and cached['title'] is not None:
+            return cached['title'], cached['text']
+        
+        if cached:
+            downloaded = cached['html']
+        else:
+            # Baixar a página pela camada compartilhada (pool por host e limites)
+            response = http_client.fetch(url)
+            downloaded = response.content if response.ok else None
         
         if not downloaded:
             logger.warning(f"Não foi possível buscar a URL: {url}")
             return None, None
         
-        # Extrair o título da página (se disponível)
-        title = None
-        try:
-            from bs4 import BeautifulSoup
-            soup = BeautifulSoup(downloaded, 'html.parser')
-            title_tag = soup.find('title')
-            if title_tag:
-                title = title_tag.text.strip()
-        except:
-            # Se não conseguir extrair com BeautifulSoup, continuar sem título
-            pass
-        
-        # Extrair o conteúdo principal
-        content = trafilatura.extract(downloaded)
+        # Extrair título e conteúdo principal no pool de processos de extração
+        title, content, fallback_content = extract_html(downloaded, title=True, fallback=True)
+        if cached and cached['text']:
+            # Aproveitar o texto já extraído pelo worker de notícias
+            content = cached['text']
+        extraction_cache.put(url, downloaded, title or '', content or '')
         
         if not content:
             logger.warning(f"Não foi possível extrair conteúdo de: {url}")
             
-            # Tentar extrair o conteúdo bruto como fallback
-            try:
-                if 'title_tag' in locals() and title_tag and hasattr(title_tag, 'parent'):
-                    from html2text import HTML2Text
-                    h2t = HTML2Text()
-                    h2t.ignore_links = False
-                    content = h2t.handle(str(title_tag.parent))
-            except Exception as e:
-                logger.error(f"Erro ao extrair conteúdo bruto: {str(e)}")
+            # Conteúdo bruto ao redor do título como fallback
+            content = fallback_content
         
         return title, content
     
@@ -156,43 +184,204 @@ def fetch_website_content(url):
         logger.error(f"Erro ao extrair conteúdo de {url}: {str(e)}")
         return None, None
 
-def fetch_all_feeds():
+def _apply_fetch_result(feed, result, stats, elapsed=None):
+    """
+    Processa para uma assinatura o resultado de um download de feed e faz o commit
+    
+    Args:
+        feed: Objeto RSSFeed do banco de dados
+        result: Resultado de feed_reader.fetch_feed (compartilhado entre assinaturas da mesma URL)
+        stats: Estatísticas do ciclo, atualizadas no lugar
+        elapsed: Tempo do download em segundos, para a saúde do feed
+        
+    Returns:
+        tuple: (status do feed - 'ok', 'unchanged' ou 'invalid' -, mensagem de erro ou None)
+    """
+    if result['bozo']:
+        # Feed inválido: mesmo comportamento do processamento individual
+        logger.error(f"Erro ao processar feed {feed.name}: {result['bozo_exception']}")
+        stats['processed_feeds'] += 1
+        apply_health(feed, health_after_failure(feed, result['bozo_exception']))
+        apply_poll_schedule(feed, compute_next_poll(db.session, feed.id))
+        feed.last_fetch = datetime.utcnow()
+        db.session.commit()
+        return 'invalid', str(result['bozo_exception'])
+    
+    apply_health(feed, health_after_success(feed, elapsed))
+    
+    if result['status'] != FEED_MODIFIED:
+        # 304 ou corpo idêntico: nada a parsear
+        stats['unchanged_feeds'] += 1
+        stats['processed_feeds'] += 1
+        apply_fetch_state(feed, result)
+        apply_poll_schedule(feed, compute_next_poll(db.session, feed.id))
+        feed.last_fetch = datetime.utcnow()
+        db.session.commit()
+        return 'unchanged', None
+    
+    stats['total_items'] += result['total_entries']
+    new_entries, watermark = _select_new_entries(feed, result['entries'], stats)
+    stats['new_items'] += _store_entries(feed, new_entries, stats)
+    stats['processed_feeds'] += 1
+    
+    # Salvar os validadores e a marca d'água só depois que os itens foram gravados
+    apply_fetch_state(feed, result)
+    apply_watermark(feed, watermark)
+    apply_poll_schedule(feed, compute_next_poll(db.session, feed.id))
+    
+    # Atualizar a data da última busca
+    feed.last_fetch = datetime.utcnow()
+    db.session.commit()
+    return 'ok', None
+
+def fetch_all_feeds(user_id=None, max_workers=None, deadline_seconds=None, due_only=False):
     """
-    Busca e processa todos os feeds RSS ativos
+    Busca e processa todos os feeds RSS ativos de forma concorrente
+    
+    Assinaturas de usuários diferentes para a mesma URL são agrupadas: cada URL
+    é baixada uma única vez por ciclo e o resultado é distribuído para todas as
+    assinaturas. O download roda em um pool limitado de threads; as consultas e
+    gravações no banco acontecem apenas na thread que chamou a função, usando
+    a sessão atual. Os itens novos são gravados com a extração pendente, sem
+    esperar pelo download dos links. Feeds que não terminarem dentro do prazo
+    do ciclo são abandonados e contados em 'timed_out_feeds'. URLs cujas
+    assinaturas estão todas com o circuito aberto (services/feed_health.py) não
+    são baixadas e entram em 'skipped_feeds'; falhas e prazos estourados contam
+    para abrir o circuito. Os contadores 'canonicalized_links',
+    'canonical_duplicates' e 'shared_contents' medem o efeito da URL canônica
+    (services/url_canonical.py): links reescritos, repetições só detectadas
+    graças a ela e links cujo texto já existia e não será baixado de novo.
+    
+    Args:
+        user_id: ID do usuário para limitar os feeds (opcional, padrão: todos)
+        max_workers: Número de workers de rede (padrão: Config.RSS_FETCH_WORKERS)
+        deadline_seconds: Prazo do ciclo em segundos (padrão: Config.RSS_CYCLE_DEADLINE_SECONDS)
+        due_only: Buscar apenas as URLs com alguma assinatura cujo RSSFeed.next_poll_at já chegou
     
     Returns:
-        dict: Estatísticas de processamento
+        dict: Estatísticas de processamento, incluindo o tempo de cada feed
     """
+    max_workers = max_workers or Config.RSS_FETCH_WORKERS
+    deadline_seconds = deadline_seconds or Config.RSS_CYCLE_DEADLINE_SECONDS
+    
     stats = {
         'total_feeds': 0,
+        'unique_urls': 0,
         'processed_feeds': 0,
         'feeds_with_errors': 0,
+        'unchanged_feeds': 0,
+        'timed_out_feeds': 0,
+        'skipped_feeds': 0,
         'new_items': 0,
-        'total_items': 0
+        'total_items': 0,
+        'canonicalized_links': 0,
+        'canonical_duplicates': 0,
+        'shared_contents': 0,
+        'elapsed_seconds': 0.0,
+        'feed_timings': []
     }
     
     # Buscar todos os feeds ativos
-    feeds = RSSFeed.query.filter_by(is_active=True).all()
+    query = RSSFeed.query.filter_by(is_active=True)
+    if user_id is not None:
+        query = query.filter_by(user_id=user_id)
+    if due_only:
+        due_urls = query.filter(
+            (RSSFeed.next_poll_at == None) | (RSSFeed.next_poll_at <= datetime.utcnow())
+        ).with_entities(RSSFeed.url).distinct()
+        # Levar junto as demais assinaturas das URLs vencidas, que recebem o mesmo download
+        query = query.filter(RSSFeed.url.in_(due_urls))
+    feeds = query.all()
     stats['total_feeds'] = len(feeds)
     
     if not feeds:
         logger.info("Nenhum feed ativo encontrado.")
         return stats
     
-    # Processar cada feed
-    for feed in feeds:
-        try:
-            new_items, total_items = fetch_and_process_feed(feed)
-            stats['new_items'] += new_items
-            stats['total_items'] += total_items
-            stats['processed_feeds'] += 1
+    groups = group_feeds_by_url(feeds)
+    stats['unique_urls'] = len(groups)
+    
+    cycle_started = time.monotonic()
+    deadline = cycle_started + deadline_seconds
+    timings = {}
+    
+    def finish_feed(feed, status, error=None):
+        timing = timings[feed.id]
+        timing['status'] = status
+        timing['total_seconds'] = round(time.monotonic() - timing.pop('_started'), 3)
+        if error:
+            timing['error'] = error
+        stats['feed_timings'].append(timing)
+    
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='rss-fetch')
+    pending = {}
+    try:
+        for url, group in groups.items():
+            for feed in group:
+                timings[feed.id] = {
+                    'feed_id': feed.id,
+                    'name': feed.name,
+                    'fetch_seconds': None,
+                    '_started': time.monotonic()
+                }
+            if not fetch_allowed(group):
+                # Circuito aberto: não gastar um worker com um feed que vem falhando
+                for feed in group:
+                    stats['skipped_feeds'] += 1
+                    finish_feed(feed, 'circuit_open', feed.last_error)
+                continue
+            pending[executor.submit(_fetch_feed, url, *shared_validators(group), stop_before_for(group))] = group
+        
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
             
-            # Atualizar a data da última busca
-            feed.last_fetch = datetime.utcnow()
-            db.session.commit()
-        except Exception as e:
-            stats['feeds_with_errors'] += 1
-            logger.error(f"Erro ao processar feed {feed.name}: {str(e)}")
+            done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                group = pending.pop(future)
+                try:
+                    result, elapsed = future.result()
+                except Exception as e:
+                    # Falha no download vale para todas as assinaturas da URL
+                    for feed in group:
+                        stats['feeds_with_errors'] += 1
+                        logger.error(f"Erro ao processar feed {feed.name}: {str(e)}")
+                        apply_health(feed, health_after_failure(feed, e))
+                        finish_feed(feed, 'error', str(e))
+                    db.session.commit()
+                    continue
+                
+                for feed in group:
+                    timings[feed.id]['fetch_seconds'] = round(elapsed, 3)
+                    try:
+                        finish_feed(feed, *_apply_fetch_result(feed, result, stats, elapsed))
+                    except Exception as e:
+                        db.session.rollback()
+                        stats['feeds_with_errors'] += 1
+                        logger.error(f"Erro ao processar feed {feed.name}: {str(e)}")
+                        finish_feed(feed, 'error', str(e))
+        
+        # Feeds que estouraram o prazo do ciclo
+        for future, group in pending.items():
+            future.cancel()
+            for feed in group:
+                stats['timed_out_feeds'] += 1
+                logger.warning(f"Feed {feed.name} excedeu o prazo do ciclo")
+                apply_health(feed, health_after_failure(feed, "Excedeu o prazo do ciclo"))
+                finish_feed(feed, 'timeout')
+        db.session.commit()
+    finally:
+        # Não esperar por downloads em andamento que já passaram do prazo
+        executor.shutdown(wait=False, cancel_futures=True)
     
-    logger.info(f"Processamento de feeds concluído. Estatísticas: {stats}")
-    return stats
\ No newline at end of file
+    stats['elapsed_seconds'] = round(time.monotonic() - cycle_started, 3)
+    logger.info(
+        f"Processamento de feeds concluído. {stats['processed_feeds']}/{stats['total_feeds']} feeds "
+        f"({stats['unique_urls']} URLs), {stats['new_items']} novos itens, "
+        f"{stats['unchanged_feeds']} sem alterações, {stats['feeds_with_errors']} com erros, "
+        f"{stats['skipped_feeds']} suspensos, {stats['timed_out_feeds']} fora do prazo em {stats['elapsed_seconds']}s. "
+        f"URL canônica: {stats['canonicalized_links']} links reescritos, "
+        f"{stats['canonical_duplicates']} repetições evitadas, {stats['shared_contents']} textos reaproveitados"
+    )
+    return stats
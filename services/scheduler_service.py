@@ -1,4 +1,5 @@
 import logging
+import multiprocessing
 from datetime import datetime, timedelta
 from typing import List, Optional
 
@@ -25,6 +26,11 @@ def init_scheduler(app: Flask) -> None:
     """
     global scheduler
     
+    # Worker processes (e.g. the HTML extraction pool) re-import the main module,
+    # and with it the app: only the parent process runs the scheduled jobs
+    if multiprocessing.current_process().name != 'MainProcess':
+        return
+    
     logger.info("Initializing scheduler service")
     
     # Create a scheduler without persistent jobstore to avoid pickle issues
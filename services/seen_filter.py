@@ -0,0 +1,237 @@
+"""
+Filtro Bloom dos GUIDs já gravados, mantido em memória pelo daemon
+A cada busca de feeds o daemon precisa saber quais GUIDs já existem no banco.
+O filtro guarda os pares (feed, GUID) de todos os NewsItem: o que ele não
+conhece é certamente novo e dispensa a consulta; o que ele talvez conheça é
+confirmado no banco, de modo que um falso positivo custa apenas essa consulta.
+O filtro cresce em camadas (Bloom escalável) e é gravado periodicamente em um
+arquivo compacto, de onde é recarregado na partida e completado com os
+NewsItem gravados depois (id maior que o último visto)
+"""
+
+import os
+import math
+import struct
+import hashlib
+import logging
+import threading
+from sqlalchemy import select, func
+from config import Config
+from services.news_store import news_item_table, GUID_MAX_LENGTH
+
+logger = logging.getLogger(__name__)
+
+# Cada nova camada tem o dobro da capacidade e uma taxa de erro mais apertada,
+# para que a taxa total continue abaixo da configurada
+GROWTH_FACTOR = 2
+TIGHTENING_RATIO = 0.85
+
+# Linhas de news_item lidas por vez ao carregar o filtro
+LOAD_BATCH_SIZE = 5000
+
+# Formato do arquivo: cabeçalho + (cabeçalho da camada + bits) por camada
+FILE_MAGIC = b'BAGF'
+FILE_VERSION = 1
+_FILE_HEADER = struct.Struct('<4sBdqI')
+_SLICE_HEADER = struct.Struct('<QQdIQ')
+
+
+class BloomSlice:
+    """Uma camada do filtro: vetor de bits com capacidade e taxa de erro fixas"""
+
+    def __init__(self, capacity, error_rate, num_bits=None, num_hashes=None, bits=None, count=0):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = num_bits or max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.num_hashes = num_hashes or max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bits if bits is not None else bytearray((self.num_bits + 7) // 8)
+        self.count = count
+
+    def _positions(self, digest):
+        # Hash duplo: as k posições saem de dois valores de 64 bits
+        first, second = struct.unpack('<QQ', digest)
+        for i in range(self.num_hashes):
+            yield (first + i * second) % self.num_bits
+
+    def add(self, digest):
+        for position in self._positions(digest):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, digest):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(digest))
+
+
+class SeenGuidFilter:
+    """
+    Bloom escalável dos pares (feed, GUID) já gravados em news_item
+
+    Não há falsos negativos para o que foi carregado; a fração de falsos
+    positivos fica abaixo de error_rate e é medida pelas consultas de confirmação.
+    """
+
+    def __init__(self, error_rate=None, initial_capacity=None):
+        self.error_rate = error_rate or Config.SEEN_FILTER_FALSE_POSITIVE_RATE
+        self.initial_capacity = initial_capacity or Config.SEEN_FILTER_INITIAL_CAPACITY
+        self.slices = []
+        self.last_id = 0
+        self._lock = threading.Lock()
+        self.counters = {'definitely_new': 0, 'checked': 0, 'false_positives': 0}
+
+    @staticmethod
+    def _digest(rss_feed_id, guid):
+        key = f'{rss_feed_id}\x00{guid[:GUID_MAX_LENGTH]}'.encode('utf-8')
+        return hashlib.blake2b(key, digest_size=16).digest()
+
+    def _add_digest(self, digest):
+        if not self.slices or self.slices[-1].count >= self.slices[-1].capacity:
+            level = len(self.slices)
+            self.slices.append(BloomSlice(
+                self.initial_capacity * GROWTH_FACTOR ** level,
+                self.error_rate * (1 - TIGHTENING_RATIO) * TIGHTENING_RATIO ** level
+            ))
+        self.slices[-1].add(digest)
+
+    def might_contain(self, rss_feed_id, guid):
+        """
+        Indica se o GUID pode já estar gravado para o feed
+
+        Returns:
+            bool: False se o GUID certamente é novo; True se precisa ser confirmado no banco
+        """
+        digest = self._digest(rss_feed_id, guid)
+        return any(digest in bloom for bloom in self.slices)
+
+    def record_check(self, definitely_new, checked, false_positives):
+        """Soma o resultado de uma verificação (GUIDs dispensados, consultados e não encontrados)"""
+        with self._lock:
+            self.counters['definitely_new'] += definitely_new
+            self.counters['checked'] += checked
+            self.counters['false_positives'] += false_positives
+
+    def observed_false_positive_rate(self):
+        """Fração dos GUIDs novos que o filtro mandou consultar sem necessidade (None sem dados)"""
+        with self._lock:
+            negatives = self.counters['definitely_new'] + self.counters['false_positives']
+            return self.counters['false_positives'] / negatives if negatives else None
+
+    def refresh(self, session):
+        """
+        Acrescenta os NewsItem gravados depois do último carregamento
+
+        Inclui os inseridos por outros processos (aplicação web, cron).
+
+        Args:
+            session: Sessão SQLAlchemy
+
+        Returns:
+            int: Quantidade de GUIDs acrescentados
+        """
+        added = 0
+        while True:
+            rows = session.execute(
+                select(news_item_table.c.id, news_item_table.c.rss_feed_id, news_item_table.c.guid)
+                .where(news_item_table.c.id > self.last_id)
+                .order_by(news_item_table.c.id)
+                .limit(LOAD_BATCH_SIZE)
+            ).fetchall()
+            if not rows:
+                return added
+            with self._lock:
+                for row in rows:
+                    if row.guid:
+                        self._add_digest(self._digest(row.rss_feed_id, row.guid))
+                        added += 1
+                self.last_id = rows[-1].id
+
+    @property
+    def count(self):
+        return sum(bloom.count for bloom in self.slices)
+
+    @property
+    def size_bytes(self):
+        return sum(len(bloom.bits) for bloom in self.slices)
+
+    def save(self, path):
+        """Grava o filtro em um arquivo (substituição atômica)"""
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._lock:
+            with open(temp_path, 'wb') as handle:
+                handle.write(_FILE_HEADER.pack(
+                    FILE_MAGIC, FILE_VERSION, self.error_rate, self.last_id, len(self.slices)
+                ))
+                for bloom in self.slices:
+                    handle.write(_SLICE_HEADER.pack(
+                        bloom.capacity, bloom.count, bloom.error_rate, bloom.num_hashes, bloom.num_bits
+                    ))
+                    handle.write(bloom.bits)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Lê um filtro gravado por save
+
+        Returns:
+            SeenGuidFilter: Filtro lido, ou None se o arquivo não existe, é inválido
+                            ou foi criado com outra taxa de erro
+        """
+        try:
+            with open(path, 'rb') as handle:
+                magic, version, error_rate, last_id, slice_count = _FILE_HEADER.unpack(
+                    handle.read(_FILE_HEADER.size)
+                )
+                if magic != FILE_MAGIC or version != FILE_VERSION:
+                    raise ValueError("formato desconhecido")
+                if error_rate != Config.SEEN_FILTER_FALSE_POSITIVE_RATE:
+                    logger.info("Filtro de GUIDs gravado com outra taxa de falsos positivos; será recriado")
+                    return None
+                seen_filter = cls(error_rate)
+                for _ in range(slice_count):
+                    capacity, count, slice_error, num_hashes, num_bits = _SLICE_HEADER.unpack(
+                        handle.read(_SLICE_HEADER.size)
+                    )
+                    bits = bytearray(handle.read((num_bits + 7) // 8))
+                    if len(bits) != (num_bits + 7) // 8:
+                        raise ValueError("arquivo truncado")
+                    seen_filter.slices.append(BloomSlice(capacity, slice_error, num_bits, num_hashes, bits, count))
+                if seen_filter.slices:
+                    seen_filter.initial_capacity = seen_filter.slices[0].capacity
+                seen_filter.last_id = last_id
+                return seen_filter
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Filtro de GUIDs inválido em {path}, será recriado: {str(e)}")
+            return None
+
+
+def load_seen_filter(session, path=None):
+    """
+    Carrega o filtro do arquivo (ou cria um novo) e o completa com o banco
+
+    Args:
+        session: Sessão SQLAlchemy
+        path: Arquivo do filtro (padrão: Config.SEEN_FILTER_PATH)
+
+    Returns:
+        SeenGuidFilter: Filtro pronto para uso
+    """
+    path = path or Config.SEEN_FILTER_PATH
+    seen_filter = SeenGuidFilter.load(path)
+    if seen_filter is not None:
+        max_id = session.execute(select(func.max(news_item_table.c.id))).scalar() or 0
+        if max_id < seen_filter.last_id:
+            # Banco recriado ou restaurado: o arquivo não corresponde mais às linhas
+            logger.info("Filtro de GUIDs à frente do banco; será recriado")
+            seen_filter = None
+    seen_filter = seen_filter or SeenGuidFilter()
+    loaded = seen_filter.count
+    added = seen_filter.refresh(session)
+    logger.info(
+        f"Filtro de GUIDs: {loaded} lidos de {path}, {added} carregados do banco "
+        f"({seen_filter.size_bytes / 1024:.0f} KB)"
+    )
+    return seen_filter
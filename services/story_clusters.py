@@ -0,0 +1,242 @@
+"""
+Agrupamento de notícias quase duplicadas
+Feeds diferentes costumam repetir a mesma matéria de agência com GUID e link
+próprios. Na gravação, cada NewsItem recebe um SimHash de 64 bits dos shingles
+(sequências de palavras) do título e do texto, guardado na tabela story_fingerprint dividido em 8 faixas de
+8 bits. Como duas notícias com até 7 bits de diferença têm pelo menos uma faixa
+idêntica, os candidatos vêm de uma consulta indexada pelas faixas, sem varrer as
+notícias, e o índice é atualizado a cada inserção e podado fora da janela de
+agrupamento. A geração de artigos usa apenas um representante por história.
+"""
+
+import re
+import hashlib
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import table, column, select, update, or_, bindparam, BigInteger, DateTime, Integer
+from config import Config
+from services.news_store import news_item_table, BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+SIMHASH_BITS = 64
+BAND_COUNT = 8
+BAND_BITS = SIMHASH_BITS // BAND_COUNT
+BAND_MASK = (1 << BAND_BITS) - 1
+
+# Índice de similaridade (StoryFingerprint): uma linha por faixa de cada notícia
+story_fingerprint_table = table(
+    'story_fingerprint',
+    column('id', Integer),
+    column('band', Integer),
+    column('simhash', BigInteger),
+    column('news_item_id', Integer),
+    column('user_id', Integer),
+    column('created_at', DateTime),
+)
+
+_TAG_RE = re.compile(r'<[^>]+>')
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _chunks(values, size=BATCH_SIZE):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def compute_simhash(text):
+    """
+    Calcula o SimHash de 64 bits de um texto a partir dos seus shingles
+
+    Cada shingle tem Config.STORY_SHINGLE_SIZE palavras seguidas: textos sobre o
+    mesmo assunto com as mesmas palavras soltas não ficam parecidos, só os que
+    repetem trechos. Textos com menos de Config.STORY_MIN_SHINGLES shingles (um
+    título com uma linha de resumo, por exemplo) não têm informação suficiente
+    para comparar e ficam fora do agrupamento.
+
+    Args:
+        text: Texto (HTML é ignorado)
+
+    Returns:
+        int: SimHash com sinal (cabe em BIGINT) ou None se o texto for curto demais
+    """
+    words = _WORD_RE.findall(_TAG_RE.sub(' ', text or '').lower())
+    size = max(Config.STORY_SHINGLE_SIZE, 1)
+    shingles = Counter(' '.join(words[start:start + size]) for start in range(len(words) - size + 1))
+    if sum(shingles.values()) < max(Config.STORY_MIN_SHINGLES, 1):
+        return None
+
+    weights = [0] * SIMHASH_BITS
+    for shingle, count in shingles.items():
+        value = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += count if value >> bit & 1 else -count
+
+    simhash = sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+    return simhash - (1 << SIMHASH_BITS) if simhash >> (SIMHASH_BITS - 1) else simhash
+
+
+def hamming_distance(a, b):
+    """Quantidade de bits diferentes entre dois SimHash"""
+    return bin((a ^ b) & ((1 << SIMHASH_BITS) - 1)).count('1')
+
+
+def simhash_bands(simhash):
+    """Chaves das faixas do SimHash (posição da faixa e valor na mesma chave inteira)"""
+    return [band << BAND_BITS | (simhash >> (band * BAND_BITS) & BAND_MASK) for band in range(BAND_COUNT)]
+
+
+def _find_candidates(session, user_id, bands):
+    """Busca pelas faixas indexadas as notícias do usuário que podem ser a mesma história"""
+    fingerprint = story_fingerprint_table
+    candidates = {}
+    for chunk in _chunks(sorted(bands)):
+        rows = session.execute(
+            select(
+                fingerprint.c.news_item_id, fingerprint.c.simhash, fingerprint.c.band,
+                news_item_table.c.story_cluster_id, news_item_table.c.is_processed
+            )
+            .select_from(fingerprint.join(news_item_table, news_item_table.c.id == fingerprint.c.news_item_id))
+            .where(fingerprint.c.user_id == user_id, fingerprint.c.band.in_(chunk))
+        )
+        for row in rows:
+            candidates.setdefault(row.news_item_id, row)
+    return candidates
+
+
+def assign_story_clusters(session, user_id, news_items):
+    """
+    Liga notícias recém-gravadas à história de uma notícia anterior quase igual (sem commit)
+
+    A notícia entra na história da candidata mais próxima (até
+    Config.STORY_SIMHASH_MAX_DISTANCE bits de diferença) entre as notícias do
+    mesmo usuário gravadas nos últimos Config.STORY_CLUSTER_WINDOW_DAYS dias,
+    incluindo as do próprio lote. Se essa história já virou artigo, a notícia
+    já entra como processada. As faixas das notícias novas são então
+    adicionadas ao índice.
+
+    Args:
+        session: Sessão SQLAlchemy (db.session ou sessão do AutomationEngine)
+        user_id: ID do usuário dono das notícias
+        news_items: Pares (id do NewsItem, SimHash) das notícias novas
+
+    Returns:
+        int: Quantidade de notícias ligadas a uma história existente
+    """
+    fingerprint = story_fingerprint_table
+    now = datetime.utcnow()
+
+    # Podar o índice: fora da janela as notícias não são mais comparadas
+    session.execute(
+        fingerprint.delete().where(
+            fingerprint.c.created_at < now - timedelta(days=Config.STORY_CLUSTER_WINDOW_DAYS)
+        )
+    )
+
+    news_items = sorted((item_id, simhash) for item_id, simhash in news_items if simhash is not None)
+    if not news_items:
+        return 0
+
+    bands = {band for _, simhash in news_items for band in simhash_bands(simhash)}
+    candidates = _find_candidates(session, user_id, bands)
+
+    # Índice em memória: faixa -> notícias; notícia -> (SimHash, história, processada)
+    buckets = {}
+    known = {}
+    for item_id, row in candidates.items():
+        known[item_id] = (row.simhash, row.story_cluster_id or item_id, bool(row.is_processed))
+        for band in simhash_bands(row.simhash):
+            buckets.setdefault(band, []).append(item_id)
+
+    max_distance = min(Config.STORY_SIMHASH_MAX_DISTANCE, BAND_COUNT - 1)
+    assignments = []
+    for item_id, simhash in news_items:
+        best = None
+        for band in simhash_bands(simhash):
+            for other_id in buckets.get(band, ()):
+                if other_id >= item_id:
+                    continue
+                distance = hamming_distance(simhash, known[other_id][0])
+                if distance <= max_distance and (best is None or (distance, other_id) < best):
+                    best = (distance, other_id)
+
+        if best is None:
+            cluster_id, processed = item_id, False
+        else:
+            _, cluster_id, processed = known[best[1]]
+            assignments.append({'item_id': item_id, 'cluster_id': cluster_id, 'processed': processed})
+
+        known[item_id] = (simhash, cluster_id, processed)
+        for band in simhash_bands(simhash):
+            buckets.setdefault(band, []).append(item_id)
+
+    if assignments:
+        session.execute(
+            update(news_item_table)
+            .where(news_item_table.c.id == bindparam('item_id'))
+            .values(story_cluster_id=bindparam('cluster_id'), is_processed=bindparam('processed')),
+            assignments
+        )
+        logger.info(f"{len(assignments)} notícias agrupadas em histórias já existentes")
+
+    rows = [
+        {'band': band, 'simhash': simhash, 'news_item_id': item_id, 'user_id': user_id, 'created_at': now}
+        for item_id, simhash in news_items
+        for band in simhash_bands(simhash)
+    ]
+    for chunk in _chunks(rows):
+        session.execute(fingerprint.insert().values(chunk))
+    return len(assignments)
+
+
+def story_key(news_item):
+    """Identificador da história de uma notícia (ORM ou linha de consulta)"""
+    return news_item.story_cluster_id or news_item.id
+
+
+def one_per_story(news_items):
+    """
+    Mantém apenas a primeira notícia de cada história, preservando a ordem
+
+    Args:
+        news_items: NewsItem ou linhas com id e story_cluster_id
+
+    Returns:
+        list: Representantes, um por história
+    """
+    seen = set()
+    representatives = []
+    for news_item in news_items:
+        key = story_key(news_item)
+        if key not in seen:
+            seen.add(key)
+            representatives.append(news_item)
+    return representatives
+
+
+def mark_story_processed(session, news_item):
+    """
+    Marca como processadas as outras notícias da mesma história (sem commit)
+
+    Chamado depois de gerar o artigo do representante, para que as outras
+    versões da matéria não sejam reescritas de novo.
+
+    Args:
+        session: Sessão SQLAlchemy
+        news_item: NewsItem ou linha com id e story_cluster_id
+
+    Returns:
+        int: Quantidade de outras notícias marcadas
+    """
+    key = story_key(news_item)
+    result = session.execute(
+        update(news_item_table)
+        .where(
+            or_(news_item_table.c.id == key, news_item_table.c.story_cluster_id == key),
+            news_item_table.c.id != news_item.id,
+            news_item_table.c.is_processed == False
+        )
+        .values(is_processed=True)
+    )
+    return result.rowcount or 0
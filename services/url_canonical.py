@@ -0,0 +1,153 @@
+"""
+Forma canônica das URLs de notícias
+A mesma notícia chega com parâmetros de rastreamento diferentes (utm_*, fbclid...),
+fragmentos, variantes AMP ou http/https. A URL canônica remove essas diferenças e é
+usada como identidade do NewsItem, como link do texto compartilhado, como chave do
+cache de extração e como Article.source_url. Páginas baixadas podem ainda declarar
+a sua URL canônica em <link rel="canonical">, lida por find_canonical_link
+"""
+
+import re
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode, urljoin
+
+# Parâmetros de rastreamento que não mudam o conteúdo da página
+TRACKING_PREFIXES = ('utm_', 'mc_', 'pk_', 'hsa_', 'at_')
+TRACKING_PARAMS = {
+    'fbclid', 'gclid', 'dclid', 'gbraid', 'wbraid', 'msclkid', 'yclid', 'igshid', 'twclid',
+    '_ga', '_gl', '_hsenc', '_hsmi', 'ref_src', 'ref_url', 'cmpid', 'ncid', 'ocid',
+    'sr_share', 'smid', 'spm', 'mkt_tok', 'trk', 'xtor',
+}
+
+# Parâmetros que apenas pedem a versão AMP da página
+AMP_PARAMS = {'amp', 'amp_js_v', 'amp_gsa', 'usqp'}
+
+# Portas padrão omitidas da URL
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# Caches AMP que embutem a URL original no caminho
+_AMP_CACHE_HOST_SUFFIX = '.cdn.ampproject.org'
+_AMP_CACHE_PATH_RE = re.compile(r'^/[a-z](?:/s)?/(.+)$')
+_GOOGLE_AMP_PATH_RE = re.compile(r'^/amp/(s/)?(.+)$')
+
+_AMP_PATH_SUFFIX_RE = re.compile(r'/amp/?$')
+_AMP_EXTENSION_RE = re.compile(r'\.amp(\.html?)?$')
+
+# <link rel="canonical" href="..."> no início do documento
+HTML_HEAD_BYTES = 256 * 1024
+_LINK_TAG_RE = re.compile(r'<link\b[^>]*>', re.IGNORECASE)
+_ATTRIBUTE_RE = re.compile(r'([a-zA-Z:-]+)\s*=\s*("[^"]*"|\'[^\']*\'|[^\s>]+)')
+
+
+def _unwrap_amp_cache(host, path):
+    """Recupera a URL original de um link do cache AMP do Google, ou None"""
+    if host.endswith(_AMP_CACHE_HOST_SUFFIX):
+        match = _AMP_CACHE_PATH_RE.match(path)
+        if match:
+            secure = path[2:5] == '/s/'
+            return ('https://' if secure else 'http://') + match.group(1)
+    if host in ('www.google.com', 'google.com'):
+        match = _GOOGLE_AMP_PATH_RE.match(path)
+        if match:
+            return ('https://' if match.group(1) else 'http://') + match.group(2)
+    return None
+
+
+def _is_ignored_param(name, value):
+    name = name.lower()
+    if name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES) or name in AMP_PARAMS:
+        return True
+    return name == 'outputtype' and value.lower() == 'amp'
+
+
+def canonical_url(url):
+    """
+    Normaliza a URL de uma notícia
+
+    Esquema e host em minúsculas, sem porta padrão, sem fragmento, sem parâmetros
+    de rastreamento nem de AMP, com os parâmetros restantes em ordem e com as
+    variantes AMP mais comuns (cache AMP, host amp., caminho /amp e .amp.html)
+    trocadas pela página normal. O esquema é mantido para que o link continue
+    baixável; url_key o ignora para comparar http e https.
+
+    Args:
+        url: URL original
+
+    Returns:
+        str: URL canônica (o próprio valor, sem espaços, se não for uma URL http/https)
+    """
+    url = (url or '').strip()
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parts.hostname:
+        return url
+
+    host = parts.hostname.lower().rstrip('.')
+    path = parts.path or '/'
+    unwrapped = _unwrap_amp_cache(host, path)
+    if unwrapped:
+        return canonical_url(unwrapped + (f'?{parts.query}' if parts.query else ''))
+
+    if host.startswith('amp.') and host.count('.') > 1:
+        host = host[4:]
+    netloc = host
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port and port != DEFAULT_PORTS[scheme]:
+        netloc = f'{host}:{port}'
+    if parts.username:
+        netloc = f'{parts.username}{":" + parts.password if parts.password else ""}@{netloc}'
+
+    if _AMP_PATH_SUFFIX_RE.search(path):
+        path = _AMP_PATH_SUFFIX_RE.sub('', path) or '/'
+    path = _AMP_EXTENSION_RE.sub(lambda match: match.group(1) or '', path)
+
+    query = sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not _is_ignored_param(name, value)
+    )
+    return urlunsplit((scheme, netloc, path, urlencode(query), ''))
+
+
+def url_key(url):
+    """
+    Chave de comparação de uma URL: a forma canônica sem o esquema
+
+    Returns:
+        str: URL canônica sem 'http:'/'https:' (ex.: '//exemplo.com/noticia')
+    """
+    canonical = canonical_url(url)
+    scheme, _, rest = canonical.partition(':')
+    return rest if scheme in DEFAULT_PORTS and rest.startswith('//') else canonical
+
+
+def find_canonical_link(html, base_url):
+    """
+    URL canônica declarada por uma página em <link rel="canonical">
+
+    Args:
+        html: HTML baixado (bytes ou str); só o início do documento é examinado
+        base_url: URL de onde a página foi baixada, para resolver links relativos
+
+    Returns:
+        str: URL canônica declarada (já normalizada), ou None se não houver
+    """
+    if not html:
+        return None
+    if isinstance(html, (bytes, bytearray, memoryview)):
+        html = bytes(html[:HTML_HEAD_BYTES]).decode('utf-8', errors='ignore')
+    else:
+        html = html[:HTML_HEAD_BYTES]
+
+    for tag in _LINK_TAG_RE.findall(html):
+        attributes = {
+            name.lower(): value.strip('"\'').strip()
+            for name, value in _ATTRIBUTE_RE.findall(tag)
+        }
+        if 'canonical' not in attributes.get('rel', '').lower().split() or not attributes.get('href'):
+            continue
+        link = urljoin(base_url, attributes['href'])
+        if urlsplit(link).scheme.lower() in DEFAULT_PORTS:
+            return canonical_url(link)
+    return None
@@ -0,0 +1,250 @@
+"""
+Recebimento de feeds por push (WebSub)
+Quando um feed anuncia um hub (<link rel="hub"> ou cabeçalho Link, guardado em
+RSSFeed.websub_hub pela leitura do feed), a aplicação pede ao hub a assinatura
+do tópico. O hub confirma a intenção com um GET na rota de callback e, a partir
+daí, entrega cada atualização do feed com um POST na mesma rota; o conteúdo
+recebido passa pelo mesmo caminho de gravação da busca periódica
+(news_store.store_new_items). Uma assinatura vale para todos os assinantes da
+mesma URL e é renovada antes do fim do prazo concedido pelo hub
+"""
+
+import hmac
+import hashlib
+import logging
+import secrets
+from datetime import datetime, timedelta
+from app import db
+from config import Config
+from models import RSSFeed
+from services import http_client
+from services.feed_reader import parse_feed_body, scan_new_entries, apply_watermark, group_feeds_by_url
+from services.news_store import store_new_items
+
+logger = logging.getLogger(__name__)
+
+# Caminho da rota de callback (routes/automation_routes.py)
+CALLBACK_PATH = '/automation/websub/{feed_id}'
+
+# Estados da assinatura (RSSFeed.websub_state)
+WEBSUB_PENDING = "pending"  # Pedido enviado, aguardando a verificação do hub
+WEBSUB_ACTIVE = "active"    # Verificada pelo hub, válida até websub_lease_expires_at
+WEBSUB_DENIED = "denied"    # Recusada pelo hub
+
+# Algoritmos aceitos no cabeçalho X-Hub-Signature
+SIGNATURE_ALGORITHMS = {
+    'sha1': hashlib.sha1,
+    'sha256': hashlib.sha256,
+    'sha384': hashlib.sha384,
+    'sha512': hashlib.sha512,
+}
+
+# Pedidos recusados só são repetidos depois deste prazo
+DENIED_RETRY_HOURS = 24
+
+
+def is_enabled():
+    """WebSub ativo e com o endereço público da aplicação configurado"""
+    return Config.WEBSUB_ENABLED and bool(Config.WEBSUB_CALLBACK_BASE_URL)
+
+
+def callback_url(feed_id):
+    """URL de callback entregue ao hub para a assinatura de um feed"""
+    return Config.WEBSUB_CALLBACK_BASE_URL + CALLBACK_PATH.format(feed_id=feed_id)
+
+
+def _subscriptions(url):
+    """Assinaturas ativas de uma URL de feed"""
+    return RSSFeed.query.filter(RSSFeed.url == url, RSSFeed.is_active == True).all()
+
+
+def _update_subscriptions(url, **values):
+    """Copia o estado da assinatura WebSub para todas as assinaturas da URL (sem commit)"""
+    RSSFeed.query.filter(RSSFeed.url == url).update(values, synchronize_session='fetch')
+
+
+def subscribe(feed):
+    """
+    Pede ao hub a assinatura (ou a renovação) do tópico de um feed (com commit)
+
+    O hub responde 202 e confirma depois, com um GET no callback (verify_intent).
+
+    Args:
+        feed: RSSFeed cujo ID identifica o callback da URL
+
+    Returns:
+        bool: True se o hub aceitou o pedido
+    """
+    secret = feed.websub_secret or secrets.token_hex(20)
+    topic = feed.websub_topic or feed.url
+
+    # Gravar antes do pedido: o hub pode verificar a intenção antes de responder ao POST
+    values = {'websub_secret': secret, 'websub_topic': topic, 'websub_requested_at': datetime.utcnow()}
+    if feed.websub_state != WEBSUB_ACTIVE:
+        values['websub_state'] = WEBSUB_PENDING
+    _update_subscriptions(feed.url, **values)
+    db.session.commit()
+
+    try:
+        response = http_client.post(feed.websub_hub, data={
+            'hub.mode': 'subscribe',
+            'hub.topic': topic,
+            'hub.callback': callback_url(feed.id),
+            'hub.lease_seconds': str(Config.WEBSUB_LEASE_SECONDS),
+            'hub.secret': secret,
+        })
+        accepted = response.status_code in (202, 204)
+        error = None if accepted else f"HTTP {response.status_code}: {response.text[:200]}"
+    except Exception as e:
+        accepted, error = False, str(e)
+
+    if accepted:
+        logger.info(f"Assinatura WebSub pedida para {topic} em {feed.websub_hub}")
+    else:
+        # O pedido é repetido depois de Config.WEBSUB_RETRY_MINUTES
+        logger.warning(f"Hub {feed.websub_hub} recusou a assinatura de {topic}: {error}")
+    return accepted
+
+
+def _needs_subscription(feed, now):
+    if feed.websub_state == WEBSUB_ACTIVE and feed.websub_lease_expires_at:
+        return feed.websub_lease_expires_at - now < timedelta(seconds=Config.WEBSUB_RENEW_BEFORE_SECONDS)
+    if not feed.websub_requested_at:
+        return True
+    wait = timedelta(hours=DENIED_RETRY_HOURS) if feed.websub_state == WEBSUB_DENIED \
+        else timedelta(minutes=Config.WEBSUB_RETRY_MINUTES)
+    return now - feed.websub_requested_at >= wait
+
+
+def renew_subscriptions():
+    """
+    Assina os feeds que anunciam um hub e renova as assinaturas perto do fim do prazo
+
+    Uma assinatura por URL, com o callback da assinatura de menor ID.
+
+    Returns:
+        dict: Estatísticas (requested, failed, active)
+    """
+    stats = {'requested': 0, 'failed': 0, 'active': 0}
+    if not is_enabled():
+        return stats
+
+    now = datetime.utcnow()
+    feeds = RSSFeed.query.filter(
+        RSSFeed.is_active == True,
+        RSSFeed.websub_hub.isnot(None)
+    ).order_by(RSSFeed.id).all()
+
+    for url, group in group_feeds_by_url(feeds).items():
+        owner = group[0]
+        if not _needs_subscription(owner, now):
+            stats['active'] += 1
+            continue
+        if subscribe(owner):
+            stats['requested'] += 1
+        else:
+            stats['failed'] += 1
+
+    if stats['requested'] or stats['failed']:
+        logger.info(
+            f"WebSub: {stats['requested']} assinaturas pedidas, {stats['failed']} com erro, "
+            f"{stats['active']} ativas"
+        )
+    return stats
+
+
+def verify_intent(feed, args):
+    """
+    Responde à verificação de intenção do hub (GET no callback) e faz o commit
+
+    Args:
+        feed: RSSFeed do callback
+        args: Parâmetros da requisição (hub.mode, hub.topic, hub.challenge, hub.lease_seconds)
+
+    Returns:
+        tuple: (status HTTP, corpo da resposta)
+    """
+    mode = args.get('hub.mode')
+    topic = args.get('hub.topic')
+    if topic != (feed.websub_topic or feed.url):
+        return 404, ''
+
+    if mode == 'denied':
+        _update_subscriptions(feed.url, websub_state=WEBSUB_DENIED, websub_lease_expires_at=None)
+        db.session.commit()
+        logger.warning(f"Hub recusou a assinatura WebSub de {topic}: {args.get('hub.reason', '')}")
+        return 200, ''
+
+    if mode != 'subscribe' or feed.websub_state not in (WEBSUB_PENDING, WEBSUB_ACTIVE) \
+            or not args.get('hub.challenge'):
+        return 404, ''
+
+    try:
+        lease_seconds = int(args.get('hub.lease_seconds') or Config.WEBSUB_LEASE_SECONDS)
+    except ValueError:
+        lease_seconds = Config.WEBSUB_LEASE_SECONDS
+    _update_subscriptions(
+        feed.url,
+        websub_state=WEBSUB_ACTIVE,
+        websub_lease_expires_at=datetime.utcnow() + timedelta(seconds=lease_seconds)
+    )
+    db.session.commit()
+    logger.info(f"Assinatura WebSub confirmada para {topic} ({lease_seconds}s)")
+    return 200, args['hub.challenge']
+
+
+def valid_signature(secret, body, signature):
+    """
+    Confere o cabeçalho X-Hub-Signature ('algoritmo=hex') de uma notificação
+
+    Returns:
+        bool: True se a assinatura confere com a chave da assinatura
+    """
+    algorithm, _, digest = (signature or '').partition('=')
+    hash_function = SIGNATURE_ALGORITHMS.get(algorithm.strip().lower())
+    if not secret or not hash_function or not digest:
+        return False
+    expected = hmac.new(secret.encode('utf-8'), body, hash_function).hexdigest()
+    return hmac.compare_digest(expected, digest.strip().lower())
+
+
+def handle_notification(feed, body, content_type, signature):
+    """
+    Grava as entradas entregues pelo hub para todas as assinaturas da URL e faz o commit
+
+    Notificações sem assinatura válida são ignoradas (a resposta ao hub continua
+    2xx, como pede a especificação).
+
+    Args:
+        feed: RSSFeed do callback
+        body: Corpo do POST (o feed com as entradas novas ou alteradas)
+        content_type: Cabeçalho Content-Type da notificação
+        signature: Cabeçalho X-Hub-Signature
+
+    Returns:
+        dict: Estatísticas (accepted, entries, new_items)
+    """
+    stats = {'accepted': False, 'entries': 0, 'new_items': 0}
+    if feed.websub_state != WEBSUB_ACTIVE or not valid_signature(feed.websub_secret, body, signature):
+        logger.warning(f"Notificação WebSub ignorada para {feed.url}: assinatura ausente ou inválida")
+        return stats
+
+    items, bozo, bozo_exception = parse_feed_body(body, feed.websub_topic or feed.url, content_type)
+    items = list(items)
+    if bozo and not items:
+        logger.warning(f"Notificação WebSub inválida para {feed.url}: {bozo_exception}")
+        return stats
+
+    stats.update(accepted=True, entries=len(items))
+    now = datetime.utcnow()
+    for subscription in _subscriptions(feed.url):
+        new_items, watermark = scan_new_entries(
+            items, subscription.watermark_published_at, subscription.watermark_guid, subscription.full_scan
+        )
+        stats['new_items'] += store_new_items(db.session, new_items, subscription.id, subscription.user_id)
+        apply_watermark(subscription, watermark)
+        subscription.websub_last_push_at = now
+    db.session.commit()
+
+    logger.info(f"WebSub: {stats['new_items']} novos itens de {stats['entries']} entregues para {feed.url}")
+    return stats
@@ -6,6 +6,7 @@ import base64
 
 from models import Article, ArticleStatus, LogType, ArticleLog, WordPressConfig
 from app import db
+from services import http_client
 
 logger = logging.getLogger(__name__)
 
@@ -284,7 +285,7 @@ class WordPressService:
         
         try:
             # Download the image
-            image_response = requests.get(image_url, timeout=10)
+            image_response = http_client.fetch(image_url, timeout=10)
             if image_response.status_code != 200:
                 logger.warning(f"Failed to download image: {image_response.status_code}")
                 return None
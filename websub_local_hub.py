@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+"""
+Hub WebSub local para testar o recebimento de feeds por push sem depender de um hub público
+Aceita pedidos de assinatura, verifica a intenção no callback como um hub real
+e, a cada aviso de publicação, baixa o tópico e o entrega assinado (HMAC) a todos
+os assinantes confirmados. Para usar, o feed de teste deve anunciar
+<atom:link rel="hub" href="http://127.0.0.1:8090/"/> e a aplicação deve rodar com
+WEBSUB_ENABLED=true e WEBSUB_CALLBACK_BASE_URL apontando para ela.
+
+Uso:
+    python websub_local_hub.py
+
+    # Avisar o hub de que o feed mudou (como faria o publicador)
+    curl -d hub.mode=publish -d hub.url=http://127.0.0.1:8000/feed.xml http://127.0.0.1:8090/
+
+Variáveis de ambiente:
+    WEBSUB_HUB_PORT: Porta do hub (padrão: 8090)
+"""
+
+import os
+import sys
+import hmac
+import hashlib
+import secrets
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs
+import requests
+
+# Assinaturas confirmadas: (callback, tópico) -> chave HMAC
+subscriptions = {}
+lock = threading.Lock()
+
+
+def verify(callback, topic, secret, lease_seconds):
+    """Confirma a intenção do assinante com um GET no callback, como um hub real"""
+    challenge = secrets.token_hex(16)
+    try:
+        response = requests.get(callback, params={
+            'hub.mode': 'subscribe',
+            'hub.topic': topic,
+            'hub.challenge': challenge,
+            'hub.lease_seconds': lease_seconds,
+        }, timeout=10)
+    except requests.RequestException as e:
+        print(f"❌ Callback {callback} inacessível: {e}")
+        return
+    if response.status_code == 200 and response.text == challenge:
+        with lock:
+            subscriptions[(callback, topic)] = secret
+        print(f"✅ Assinatura confirmada: {topic} -> {callback}")
+    else:
+        print(f"❌ Verificação recusada por {callback}: HTTP {response.status_code}")
+
+
+def publish(topic):
+    """Baixa o tópico e entrega o conteúdo a todos os assinantes confirmados"""
+    try:
+        content = requests.get(topic, timeout=10)
+    except requests.RequestException as e:
+        print(f"❌ Tópico {topic} inacessível: {e}")
+        return
+    with lock:
+        targets = [(callback, secret) for (callback, subscribed), secret in subscriptions.items() if subscribed == topic]
+    for callback, secret in targets:
+        headers = {'Content-Type': content.headers.get('Content-Type', 'application/rss+xml')}
+        if secret:
+            signature = hmac.new(secret.encode('utf-8'), content.content, hashlib.sha256).hexdigest()
+            headers['X-Hub-Signature'] = f'sha256={signature}'
+        response = requests.post(callback, data=content.content, headers=headers, timeout=30)
+        print(f"📤 {topic} entregue a {callback}: HTTP {response.status_code}")
+
+
+class HubHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        form = {name: values[0] for name, values in parse_qs(self.rfile.read(length).decode('utf-8')).items()}
+        mode = form.get('hub.mode')
+
+        if mode == 'subscribe' and form.get('hub.callback') and form.get('hub.topic'):
+            self.send_response(202)
+            self.end_headers()
+            threading.Thread(target=verify, args=(
+                form['hub.callback'], form['hub.topic'], form.get('hub.secret'), form.get('hub.lease_seconds', '86400')
+            ), daemon=True).start()
+        elif mode == 'publish' and (form.get('hub.url') or form.get('hub.topic')):
+            self.send_response(204)
+            self.end_headers()
+            threading.Thread(target=publish, args=(form.get('hub.url') or form['hub.topic'],), daemon=True).start()
+        else:
+            self.send_response(400)
+            self.end_headers()
+
+
+def main():
+    port = int(os.environ.get('WEBSUB_HUB_PORT', '8090'))
+    server = ThreadingHTTPServer(('127.0.0.1', port), HubHandler)
+    print(f"🛰️ Hub WebSub local em http://127.0.0.1:{port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)